@@ -0,0 +1,3 @@
+"""
+Benchmarks and load tests. Each module is runnable with ``python -m benchmarks.<name>``.
+"""
@@ -0,0 +1,62 @@
+"""
+Image uploads per worker: sync gthread worker against one ASGI (uvicorn) worker.
+
+    python -m benchmarks.async_uploads [--concurrency 64] [--latency 0.2] [--threads 4]
+
+S3 and SNS are replaced by the in-process stand-ins from product.standins, each call
+sleeping ``--latency`` seconds like a remote endpoint would. Both servers run a single
+worker process, so ``in_flight`` (throughput x mean latency, Little's law) is the number
+of uploads one worker keeps in progress at once.
+"""
+# Python imports
+import argparse
+import json
+import sys
+
+# Project imports
+from benchmarks.common import Server, create_owner, drive, manage, multipart, png_bytes, request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per stand-in S3/SNS call")
+    parser.add_argument("--threads", type=int, default=4, help="Threads of the sync worker")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    env = {
+        "DJANGO_AWS_CLIENT_FACTORY": "product.standins.client",
+        "STANDIN_LATENCY": str(args.latency),
+        "S3_BUCKET": "benchmark",
+        "SNS_TOPIC_ARN": "benchmark",
+        "GUNICORN_WORKERS": "1",
+        "GUNICORN_ACCESSLOG": "",
+    }
+    manage("migrate", "--noinput")
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", "config/gunicorn.py",
+                "--bind", "127.0.0.1:{}".format(args.port)]
+    servers = {
+        "wsgi": dict(env, GUNICORN_THREADS=str(args.threads)),
+        "asgi": dict(env, GUNICORN_APP="config.asgi:application",
+                     GUNICORN_WORKER_CLASS="uvicorn.workers.UvicornWorker"),
+    }
+
+    body, content_type = multipart({"image": ("image.png", png_bytes(), "image/png")})
+    results = {}
+    for name, server_env in servers.items():
+        with Server(gunicorn, args.port, **server_env) as server:
+            auth, product_id = create_owner(server.url, "{}-uploads@example.com".format(name))
+            url = "{}/v1/product/{}/image".format(server.url, product_id)
+            headers = dict(auth, **{"Content-Type": content_type})
+            result = drive(lambda: request("POST", url, body, headers), args.concurrency, args.duration)
+        result["in_flight"] = round(result["throughput"] * result["mean_ms"] / 1000, 1)
+        results[name] = result
+        print("{:<5} {}".format(name, json.dumps(result)), file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
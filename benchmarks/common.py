@@ -0,0 +1,202 @@
+"""
+Helpers shared by the benchmarks: starting servers and driving HTTP load against them.
+"""
+# Python imports
+import base64
+import collections
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Counter, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SETTINGS = "benchmarks.settings"
+
+
+def environment(**extra):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=SETTINGS, PYTHONPATH=str(BASE_DIR))
+    env.update(extra)
+    return env
+
+
+def manage(*args, **env):
+    subprocess.run([sys.executable, "manage.py", *args], cwd=BASE_DIR, env=environment(**env), check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+class Server:
+    """
+    A server process started from a command line, stopped when the context exits.
+    """
+
+    def __init__(self, command, port, **env):
+        self.command = command
+        self.port = port
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.port)
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.command, cwd=BASE_DIR, env=environment(**self.env),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(self.url + "/healthz", timeout=1).read()
+                return self
+            except (urllib.error.URLError, ConnectionError):
+                if self.process.poll() is not None:
+                    raise RuntimeError("{} exited with {}".format(self.command, self.process.returncode))
+                time.sleep(0.2)
+        self.__exit__()
+        raise RuntimeError("{} did not become ready".format(self.command))
+
+    def __exit__(self, *exc):
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def request(method, url, body=None, headers=None, timeout=30):
+    """
+    Perform one HTTP request and return ``(status, latency_seconds, body_bytes, response_headers)``.
+    """
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            content = resp.read()
+            return resp.status, time.perf_counter() - started, content, dict(resp.headers)
+    except urllib.error.HTTPError as e:
+        return e.code, time.perf_counter() - started, e.read(), dict(e.headers)
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return 0, time.perf_counter() - started, b"", {}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarise(samples, elapsed):
+    """
+    Summarise ``(status, latency, queries)`` samples taken over ``elapsed`` seconds.
+    """
+    latencies = [latency for _, latency, _ in samples]
+    queries = [count for _, _, count in samples if count is not None]
+    # 408 is what the views answer when an unexpected exception escapes
+    errors = sum(1 for status, _, _ in samples if not status or status >= 500 or status == 408)
+    return {
+        "requests": len(samples),
+        "throughput": round(len(samples) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "queries": round(sum(queries) / len(queries), 2) if queries else None,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+    }
+
+
+def drive(call, concurrency, duration):
+    """
+    Run ``call()`` (returning a ``request`` tuple) from ``concurrency`` threads for ``duration`` seconds
+    and summarise throughput, latency percentiles and the error rate.
+    """
+    latencies: List[float] = []
+    statuses: Counter[int] = collections.Counter()
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def loop():
+        while time.monotonic() < deadline:
+            status, latency, *_ = call()
+            with lock:
+                latencies.append(latency)
+                statuses[status] += 1
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(loop)
+    elapsed = time.monotonic() - started
+    # 408 is what the views answer when an unexpected exception escapes
+    errors = sum(count for status, count in statuses.items() if not status or status >= 500 or status == 408)
+
+    return {
+        "requests": len(latencies),
+        "throughput": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def multipart(files, fields=None):
+    """
+    Encode ``{field: (file_name, bytes, content_type)}`` and ``{field: value}`` as multipart/form-data.
+    Returns ``(body, content_type_header)``.
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for field, value in (fields or {}).items():
+        parts.append("--{}\r\nContent-Disposition: form-data; name=\"{}\"\r\n\r\n{}\r\n".format(
+            boundary, field, value).encode())
+    for field, (file_name, content, content_type) in files.items():
+        parts.append(
+            "--{}\r\nContent-Disposition: form-data; name=\"{}\"; filename=\"{}\"\r\nContent-Type: {}\r\n\r\n".format(
+                boundary, field, file_name, content_type).encode() + content + b"\r\n")
+    parts.append("--{}--\r\n".format(boundary).encode())
+    return b"".join(parts), "multipart/form-data; boundary={}".format(boundary)
+
+
+def png_bytes(size=16):
+    from PIL import Image
+
+    stream = io.BytesIO()
+    Image.new("RGB", (size, size)).save(stream, "PNG")
+    return stream.getvalue()
+
+
+def basic_auth(username, password):
+    token = base64.b64encode("{}:{}".format(username, password).encode()).decode()
+    return {"Authorization": "Basic {}".format(token)}
+
+
+def create_owner(url, username, password="benchmark-password"):
+    """
+    Register (or reuse) a user through the API and create one product owned by it.
+    Returns ``(auth_headers, product_id)``.
+    """
+    headers = {"Content-Type": "application/json"}
+    request("POST", url + "/v1/user/", json.dumps({
+        "first_name": "bench", "last_name": "user", "username": username, "password": password,
+    }).encode(), headers)
+    auth = basic_auth(username, password)
+    status, _, body, _ = request("POST", url + "/v1/product/", json.dumps({
+        "name": "bench", "description": "bench", "sku": uuid.uuid4().hex[:20], "manufacturer": "bench",
+        "quantity": 1,
+    }).encode(), dict(headers, **auth))
+    if status != 201:
+        raise RuntimeError("Couldn't create benchmark product: {} {}".format(status, body[:200]))
+    return auth, json.loads(body)["id"]
@@ -0,0 +1,98 @@
+"""
+Start up import cost of a settings profile, measured with ``python -X importtime``.
+
+    python -m benchmarks.import_time [--settings config.settings.api] [--repeat 5]
+
+A fresh interpreter imports ``config.wsgi`` and the whole URLconf, which is what a worker
+does before it can serve its first request. Exits non-zero when the median import time goes
+over the profile's budget in ``import_budget.json`` or when a module listed there as lazy
+(boto3, Pillow, the swagger and account apps) shows up at start up.
+"""
+# Python imports
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Project imports
+from benchmarks.common import BASE_DIR
+
+BUDGET_FILE = Path(__file__).resolve().parent / "import_budget.json"
+
+# Production settings refuse to load without these; the values are never used.
+PLACEHOLDER_ENV = {
+    "DJANGO_SECRET_KEY": "import-time",
+    "DJANGO_AWS_ACCESS_KEY_ID": "import-time",
+    "DJANGO_AWS_SECRET_ACCESS_KEY": "import-time",
+    "DJANGO_AWS_STORAGE_BUCKET_NAME": "import-time",
+    "DJANGO_ADMIN_URL": "admin/",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "SENDGRID_API_KEY": "import-time",
+}
+
+STARTUP = """
+import json, sys
+import config.wsgi
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps(sorted(sys.modules)))
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure(settings_module):
+    """
+    Import the app once in a fresh interpreter.
+    Returns ``(total_ms, loaded_modules, {module: cumulative_ms})`` for top level imports.
+    """
+    env = dict(PLACEHOLDER_ENV, **os.environ)
+    env["DJANGO_SETTINGS_MODULE"] = settings_module
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP], cwd=BASE_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    total_us, top_level = 0, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total_us += int(self_us)
+        if not indent:
+            top_level[name] = int(cumulative_us) / 1000
+    return total_us / 1000, set(json.loads(result.stdout.splitlines()[-1])), top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--settings", default="config.settings.api")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top level imports to show")
+    args = parser.parse_args()
+
+    budget = json.loads(BUDGET_FILE.read_text())[args.settings]
+    runs = [measure(args.settings) for _ in range(args.repeat)]
+    median_ms = statistics.median(total for total, _, _ in runs)
+    _, modules, top_level = runs[-1]
+    eager = sorted(name for name in budget["lazy_modules"] if name in modules)
+
+    report = {
+        "settings": args.settings,
+        "median_ms": round(median_ms, 1),
+        "budget_ms": budget["max_ms"],
+        "eager_lazy_modules": eager,
+        "slowest": dict(sorted(top_level.items(), key=lambda item: -item[1])[:args.top]),
+    }
+    print(json.dumps(report, indent=2))
+
+    if eager:
+        sys.exit("Modules that should load lazily were imported at start up: {}".format(", ".join(eager)))
+    if median_ms > budget["max_ms"]:
+        sys.exit("Start up import time {:.0f}ms is over the {}ms budget".format(median_ms, budget["max_ms"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Per-request middleware overhead of the JSON API with the full stack against the lean route.
+
+    python -m benchmarks.middleware_overhead [--requests 5000]
+
+Requests go through Django's test client in-process, so the numbers are handler + middleware
++ view time without any network. "full" is the stack every path used to get (no
+ROUTED_MIDDLEWARE routes); "lean" is the configured routing.
+"""
+# Python imports
+import argparse
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+STATIC_PATHS = [("GET", "/healthz"), ("POST", "/v1/user/login")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+    from django.test import Client, override_settings
+
+    results = {}
+    variants: Tuple[Tuple[str, Optional[List[str]]], ...] = (("full", []), ("lean", None))
+    for name, routes in variants:
+        overrides = {} if routes is None else {"ROUTED_MIDDLEWARE": routes}
+        with override_settings(**overrides):
+            client = Client()
+            # Send a session cookie like a browser-ish client would; the full stack loads it lazily.
+            client.cookies["sessionid"] = "benchmark"
+            timings = {}
+            for method, path in STATIC_PATHS:
+                call = getattr(client, method.lower())
+                for _ in range(100):
+                    call(path, content_type="application/json")
+                started = time.perf_counter()
+                for _ in range(args.requests):
+                    call(path, content_type="application/json")
+                timings["{} {}".format(method, path)] = round((time.perf_counter() - started) / args.requests * 1e6, 1)
+            results[name] = timings
+
+    results["saved_us"] = {path: round(results["full"][path] - results["lean"][path], 1) for path in results["lean"]}
+    print(json.dumps({"us_per_request": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Rows per second of the import_products command against the benchmark database.
+
+    python -m benchmarks.product_import [--rows 100000] [--batch-sizes 100,1000,5000] [--method bulk_create]
+
+Writes ``--rows`` generated products (1% of them invalid) to a CSV file, imports it once per
+batch size for a fresh owner and reports the command's own throughput. Point
+BENCHMARK_DATABASE_URL at PostgreSQL to compare ``--method copy``.
+"""
+# Python imports
+import argparse
+import csv
+import io
+import json
+import os
+import tempfile
+import uuid
+
+# Project imports
+from benchmarks.common import manage
+
+
+def write_rows(path, rows, prefix):
+    with open(path, "w", newline="") as output:
+        writer = csv.writer(output)
+        writer.writerow(["name", "description", "sku", "manufacturer", "quantity"])
+        for i in range(rows):
+            # Every hundredth row has an out of range quantity and is rejected
+            writer.writerow(["product {}".format(i), "description of product {}".format(i),
+                             "{}{:012d}".format(prefix, i), "manufacturer {}".format(i % 50),
+                             101 if i % 100 == 99 else i % 100])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-sizes", default="100,1000,5000")
+    parser.add_argument("--method", default="bulk_create", choices=["bulk_create", "copy"])
+    args = parser.parse_args()
+
+    manage("migrate", "--noinput")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+
+    from webapp.users.models import User
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+            prefix = uuid.uuid4().hex[:8]
+            owner = User.objects.create_user(username="import-{}@example.com".format(prefix), password=prefix,
+                                             first_name="import", last_name="owner")
+            path = os.path.join(directory, "{}.csv".format(prefix))
+            write_rows(path, args.rows, prefix)
+
+            output = io.StringIO()
+            call_command("import_products", owner.username, path, "--batch-size", str(batch_size),
+                         "--method", args.method, stdout=output)
+            summary = json.loads(output.getvalue())
+            results.append({"batch_size": batch_size, **{key: summary[key] for key in (
+                "imported", "rejected", "seconds", "rows_per_second")}})
+
+    print(json.dumps({"rows": args.rows, "method": args.method, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
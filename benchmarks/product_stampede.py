@@ -0,0 +1,103 @@
+"""
+Database queries per cache miss when many requests read the same product at once.
+
+    python -m benchmarks.product_stampede [--concurrency 200] [--rounds 20]
+
+Each round invalidates one product's cache entry and releases ``--concurrency`` threads at
+it together, the way a hot product's readers pile up after an update. "cache-aside" is a plain
+get / query / set; "single-flight" is ``product.cache.get_product_data``. Queries are counted on
+every thread's connection, so ``queries_per_miss`` near 1 means the stampede was coalesced.
+"""
+# Python imports
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Project imports
+from benchmarks.common import manage, percentile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    manage("migrate", "--noinput")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test import override_settings
+
+    from product.cache import get_product_data, invalidate_product, product_key
+    from product.models import Product
+    from webapp.users.models import User
+
+    owner, _ = User.objects.get_or_create(username="stampede@example.com",
+                                          defaults={"first_name": "stampede", "last_name": "owner"})
+    product, _ = Product.objects.get_or_create(sku="stampede", defaults={
+        "owner_user": owner, "name": "name", "description": "description", "manufacturer": "manufacturer",
+        "quantity": 1})
+
+    def cache_aside(product_id):
+        cache = caches[settings.PRODUCT_CACHE_ALIAS]
+        product_data = cache.get(product_key(product_id))
+        if product_data is None:
+            product_data = Product.objects.filter(id=product_id).values().first()
+            cache.set(product_key(product_id), product_data, settings.PRODUCT_CACHE_TIMEOUT)
+        return product_data
+
+    shared = {
+        "BACKEND": "webapp.cache.shared.SharedMemoryCache",
+        "LOCATION": os.path.join(tempfile.mkdtemp(), "stampede-cache"),
+    }
+    results = {}
+    with override_settings(CACHES={**settings.CACHES, "shared": shared}):
+        for name, read in (("cache-aside", cache_aside), ("single-flight", get_product_data)):
+            queries = []
+            latencies = []
+            lock = threading.Lock()
+
+            def reader(barrier):
+                count = [0]
+
+                def counter(execute, sql, params, many, context):
+                    count[0] += 1
+                    return execute(sql, params, many, context)
+
+                barrier.wait()
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    read(product.id)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    queries.append(count[0])
+                connection.close()
+
+            for _ in range(args.rounds):
+                invalidate_product(product.id)
+                barrier = threading.Barrier(args.concurrency)
+                threads = [threading.Thread(target=reader, args=(barrier,)) for _ in range(args.concurrency)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            results[name] = {
+                "queries_per_miss": round(sum(queries) / args.rounds, 2),
+                "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            }
+
+    print(json.dumps({"concurrency": args.concurrency, "rounds": args.rounds, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
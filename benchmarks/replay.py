@@ -0,0 +1,243 @@
+"""
+Replays requests captured by webapp.utils.capture against a running server.
+
+    python -m benchmarks.replay CAPTURE [CAPTURE ...] [--target http://127.0.0.1:8000] [--speed 1] [--read-only]
+
+CAPTURE is an NDJSON file or a directory of them (rotated files included). Requests go out at
+their captured offsets divided by ``--speed``; 0 sends them as fast as ``--concurrency`` allows.
+
+Captured users, products and images are rewritten to rows of a synthetic dataset
+(``manage.py generate_dataset``) keeping their skew: the busiest captured user becomes the
+synthetic user owning the most products, that user's busiest product the synthetic product with
+the most images, and so on. The dataset is read through the ORM, so the settings (the benchmark
+settings and BENCHMARK_DATABASE_URL by default) must point at the target's database, and every
+synthetic user's password is ``--password``. Bodies are rebuilt from their captured shape with
+fresh values. Deletes remove dataset rows for good; ``--read-only`` skips every unsafe request.
+
+The report has throughput, latency percentiles, queries per request and error rates per URL name
+next to the captured latency and statuses, and how far sends fell behind the schedule.
+"""
+# Python imports
+import argparse
+import collections
+import json
+import os
+import random
+import string
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Counter, DefaultDict, Dict, List, Optional
+
+# Project imports
+from benchmarks.common import basic_auth, multipart, percentile, png_bytes, request, summarise
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+ANONYMOUS_VIEWS = ("user:register", "user:login")
+
+
+def read_capture(paths):
+    """
+    Every record in the capture files under ``paths``, oldest first.
+    """
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("*.ndjson*")) if path.is_dir() else [path])
+    records: List[Dict[str, Any]] = []
+    for path in files:
+        with path.open() as lines:
+            records.extend(json.loads(line) for line in lines if line.strip())
+    return sorted(records, key=lambda record: record["ts"])
+
+
+def ranked(counter):
+    return [key for key, _ in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))]
+
+
+class Rewriter:
+    """
+    Maps the captured users, products and images onto dataset rows of the same popularity rank.
+    """
+
+    def __init__(self, records, password):
+        from django.db.models import Count
+
+        from product.models import Product, ProductImage
+        from webapp.users.models import User
+
+        self.password = password
+        clients = collections.Counter(record["client"] for record in records if record["client"])
+        products: DefaultDict[str, Counter[Any]] = collections.defaultdict(collections.Counter)
+        images: DefaultDict[Any, Counter[Any]] = collections.defaultdict(collections.Counter)
+        for record in records:
+            product_id = record["params"].get("id")
+            if product_id is not None and record["client"]:
+                products[record["client"]][product_id] += 1
+                if "image_id" in record["params"]:
+                    images[product_id][record["params"]["image_id"]] += 1
+
+        users = list(User.objects.annotate(products=Count("product")).order_by("-products", "id")
+                     .values_list("id", "username")[:len(clients)])
+        if clients and not users:
+            raise RuntimeError("The database has no users, run manage.py generate_dataset first")
+        self.users = {client: users[rank % len(users)] for rank, client in enumerate(ranked(clients))}
+        self.products: Dict[Any, Optional[int]] = {}
+        self.images: Dict[Any, Optional[int]] = {}
+        for client, counter in products.items():
+            owned = list(Product.objects.filter(owner_user_id=self.users[client][0])
+                         .annotate(images=Count("productimage")).order_by("-images", "id")
+                         .values_list("id", flat=True)[:len(counter)])
+            for rank, product_id in enumerate(ranked(counter)):
+                self.products[product_id] = owned[rank % len(owned)] if owned else None
+        for product_id, counter in images.items():
+            mapped = self.products.get(product_id)
+            stored = list(ProductImage.objects.filter(product_id=mapped).order_by("image_id")
+                          .values_list("image_id", flat=True)[:len(counter)]) if mapped is not None else []
+            for rank, image_id in enumerate(ranked(counter)):
+                self.images[image_id] = stored[rank % len(stored)] if stored else None
+
+    def params(self, record):
+        """
+        The record's path parameters on dataset rows, ``None`` when one has no counterpart.
+        """
+        params = dict(record["params"])
+        if "userId" in params:
+            params["userId"] = self.users[record["client"]][0] if record["client"] else None
+        if "id" in params:
+            params["id"] = self.products.get(params["id"])
+        if "image_id" in params:
+            params["image_id"] = self.images.get(params["image_id"])
+        return None if None in params.values() else params
+
+    def fill(self, shape, rng, client, key=None):
+        """
+        A fresh value of the captured ``shape``; the user's name and password for credentials.
+        """
+        if isinstance(shape, dict):
+            return {field: self.fill(value, rng, client, field) for field, value in shape.items()}
+        if isinstance(shape, list):
+            return [self.fill(shape[0], rng, client)] if shape else []
+        if key == "password":
+            return self.password
+        if key == "username":
+            return self.users[client][1] if client else "{}@replay.example.com".format(token(rng, 16))
+        if shape.startswith("str:"):
+            return token(rng, int(shape[4:]))
+        return {"int": lambda: rng.randint(0, 100), "float": rng.random, "bool": lambda: rng.random() < 0.5,
+                "null": lambda: None}.get(shape, lambda: None)()
+
+
+def token(rng, length):
+    return "".join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(length))
+
+
+def build(record, rewriter, target, rng):
+    """
+    ``(method, url, body, headers)`` replaying ``record``, or ``None`` when it can't be mapped.
+    """
+    from django.urls import reverse
+
+    params = rewriter.params(record)
+    if params is None:
+        return None
+    # Registration picks a new username rather than one of the dataset's
+    client = None if record["view"] == "user:register" else record["client"]
+    url = target + reverse(record["view"], kwargs=params)
+    if record["query"]:
+        url += "?" + urllib.parse.urlencode(rewriter.fill(record["query"], rng, client))
+    headers = {}
+    if client and record["view"] not in ANONYMOUS_VIEWS:
+        headers.update(basic_auth(rewriter.users[client][1], rewriter.password))
+
+    body = None
+    shape = record["body"]
+    if isinstance(shape, dict) and any(isinstance(value, dict) and "file" in value for value in shape.values()):
+        files = {field: ("image.png", png_bytes(), "image/png") for field, value in shape.items()
+                 if isinstance(value, dict) and "file" in value}
+        fields = rewriter.fill({field: value for field, value in shape.items() if field not in files}, rng, client)
+        body, headers["Content-Type"] = multipart(files, fields)
+    elif shape is not None:
+        body = json.dumps(rewriter.fill(shape, rng, client)).encode()
+        headers["Content-Type"] = "application/json"
+    return record["method"], url, body, headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("capture", nargs="+", help="Capture files or directories")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed, 0 for as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=64, help="Most requests in flight")
+    parser.add_argument("--password", default="dataset-password", help="generate_dataset's --password")
+    parser.add_argument("--read-only", action="store_true", help="Skip POST, PUT, PATCH and DELETE")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    import django
+
+    django.setup()
+
+    records = read_capture(args.capture)
+    if args.read_only:
+        records = [record for record in records if record["method"] in SAFE_METHODS]
+    if not records:
+        sys.exit("Nothing to replay")
+    rewriter = Rewriter(records, args.password)
+    rng = random.Random(args.seed)
+    requests = [(record, build(record, rewriter, args.target.rstrip("/"), rng)) for record in records]
+    skipped = collections.Counter(record["view"] for record, built in requests if built is None)
+
+    samples = collections.defaultdict(list)
+    lags = []
+    lock = threading.Lock()
+
+    def send(view, built, due):
+        lag = time.monotonic() - due
+        status, latency, _, headers = request(*built)
+        queries = headers.get("X-DB-Queries")
+        with lock:
+            lags.append(max(lag, 0.0))
+            samples[view].append((status, latency, int(queries) if queries is not None else None))
+
+    first = records[0]["ts"]
+    started = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for record, built in requests:
+            if built is None:
+                continue
+            due = started + ((record["ts"] - first) / args.speed if args.speed else 0)
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, record["view"], built, due)
+    elapsed = time.monotonic() - started
+
+    captured = collections.defaultdict(list)
+    for record in records:
+        captured[record["view"]].append(record)
+    report = {
+        "records": len(records),
+        "speed": args.speed,
+        "seconds": round(elapsed, 1),
+        "lag_p99_ms": round(percentile(lags, 0.99) * 1000, 2),
+        "views": {},
+    }
+    for view in sorted(captured):
+        result = summarise(samples[view], elapsed) if samples[view] else {}
+        result["skipped"] = skipped[view]
+        result["captured"] = {
+            "p50_ms": percentile([record["duration_ms"] for record in captured[view]], 0.50),
+            "p99_ms": percentile([record["duration_ms"] for record in captured[view]], 0.99),
+            "statuses": dict(collections.Counter(str(record["status"]) for record in captured[view])),
+        }
+        result["statuses"] = dict(collections.Counter(str(status) for status, _, _ in samples[view]))
+        report["views"][view] = result
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""
+Throughput, latency percentiles, queries per request and error rates of realistic request mixes.
+
+    python -m benchmarks.scenarios [--scenario mixed] [--concurrency 16] [--duration 10] [--save-baseline]
+
+A gunicorn server is started on the benchmark settings (SQLite, or a local PostgreSQL through
+BENCHMARK_DATABASE_URL) with the S3/SNS stand-ins from product.standins. Every client thread
+registers its own user, then runs the scenario's weighted mix of operations on the products and
+images it created. Queries per request are read from the X-DB-Queries header that
+webapp.db.middleware.QueryCountMiddleware adds under the benchmark settings.
+
+The results are compared with ``scenarios_baseline.json``: the run exits non-zero when an
+operation's throughput drops or its p99 grows by more than ``--tolerance``, or when it runs more
+queries or fails more often than in the baseline. ``--save-baseline`` records this run instead.
+Latencies only compare on the machine that recorded the baseline; queries per request compare
+anywhere.
+"""
+# Python imports
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List
+
+# Project imports
+from benchmarks.common import Server, basic_auth, manage, multipart, png_bytes, request, summarise
+
+BASELINE_FILE = Path(__file__).resolve().parent / "scenarios_baseline.json"
+PASSWORD = "benchmark-password"
+# Operations with fewer requests in either run have their throughput and p99 left out of the comparison
+MIN_REQUESTS = 200
+
+# Relative weights of the operations in each mix
+SCENARIOS = {
+    "auth": {"register": 1, "login": 6, "user_get": 3},
+    "catalog": {"product_create": 2, "product_get": 5, "product_update": 2, "product_delete": 1},
+    "images": {"image_upload": 3, "image_list": 5, "image_delete": 2},
+    "mixed": {"login": 2, "user_get": 1, "product_create": 1, "product_get": 8, "product_update": 1,
+              "product_delete": 1, "image_upload": 1, "image_list": 4, "image_delete": 1},
+}
+
+
+class Client:
+    """
+    One simulated user: its credentials and the products and images it created.
+    """
+
+    def __init__(self, url, username, seed):
+        self.url = url
+        self.username = username
+        self.auth = basic_auth(username, PASSWORD)
+        self.rng = random.Random(seed)
+        self.user_id = None
+        self.products = []
+        self.images = []
+
+    def call(self, method, path, data=None, auth=True):
+        headers = dict(self.auth) if auth else {}
+        if data is not None:
+            data = json.dumps(data).encode()
+            headers["Content-Type"] = "application/json"
+        return request(method, self.url + path, data, headers)
+
+    def register(self):
+        status, _, body, _ = self.call("POST", "/v1/user/", {
+            "first_name": "bench", "last_name": "user", "username": self.username, "password": PASSWORD,
+        }, auth=False)
+        if status != 201:
+            raise RuntimeError("Couldn't register {}: {} {}".format(self.username, status, body[:200]))
+        self.user_id = json.loads(body)["id"]
+
+
+def product_body():
+    return {"name": "bench", "description": "bench product", "sku": uuid.uuid4().hex[:20],
+            "manufacturer": "bench", "quantity": 1}
+
+
+# Operations take a Client and return (operation, request result). The ones that need a product
+# create one first when the client has none, and are recorded as product_create.
+
+def register(client):
+    return "register", client.call("POST", "/v1/user/", {
+        "first_name": "bench", "last_name": "user", "username": "{}@example.com".format(uuid.uuid4().hex),
+        "password": PASSWORD,
+    }, auth=False)
+
+
+def login(client):
+    return "login", client.call("POST", "/v1/user/login", {"username": client.username, "password": PASSWORD},
+                                auth=False)
+
+
+def user_get(client):
+    return "user_get", client.call("GET", "/v1/user/{}".format(client.user_id))
+
+
+def product_create(client):
+    result = client.call("POST", "/v1/product/", product_body())
+    if result[0] == 201:
+        client.products.append(json.loads(result[2])["id"])
+    return "product_create", result
+
+
+def product_get(client):
+    if not client.products:
+        return product_create(client)
+    return "product_get", client.call("GET", "/v1/product/{}".format(client.rng.choice(client.products)))
+
+
+def product_update(client):
+    if not client.products:
+        return product_create(client)
+    return "product_update", client.call("PATCH", "/v1/product/{}".format(client.rng.choice(client.products)),
+                                         {"quantity": client.rng.randint(0, 100)})
+
+
+def product_delete(client):
+    if not client.products:
+        return product_create(client)
+    product_id = client.products.pop(client.rng.randrange(len(client.products)))
+    client.images = [image for image in client.images if image[0] != product_id]
+    return "product_delete", client.call("DELETE", "/v1/product/{}".format(product_id))
+
+
+IMAGE, IMAGE_CONTENT_TYPE = multipart({"image": ("image.png", png_bytes(), "image/png")})
+
+
+def image_upload(client):
+    if not client.products:
+        return product_create(client)
+    product_id = client.rng.choice(client.products)
+    result = request("POST", "{}/v1/product/{}/image".format(client.url, product_id), IMAGE,
+                     dict(client.auth, **{"Content-Type": IMAGE_CONTENT_TYPE}))
+    if result[0] == 201:
+        client.images.append((product_id, json.loads(result[2])["image_id"]))
+    return "image_upload", result
+
+
+def image_list(client):
+    if not client.products:
+        return product_create(client)
+    return "image_list", client.call("GET", "/v1/product/{}/image".format(client.rng.choice(client.products)))
+
+
+def image_delete(client):
+    if not client.images:
+        return image_upload(client)
+    product_id, image_id = client.images.pop(client.rng.randrange(len(client.images)))
+    return "image_delete", client.call("DELETE", "/v1/product/{}/image/{}".format(product_id, image_id))
+
+
+OPERATIONS = {operation.__name__: operation for operation in (
+    register, login, user_get, product_create, product_get, product_update, product_delete,
+    image_upload, image_list, image_delete)}
+
+
+def run(url, scenario, concurrency, duration, seed):
+    """
+    Drive one scenario from ``concurrency`` clients for ``duration`` seconds.
+    Returns a summary per operation and for all of them together.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    clients = [Client(url, "{}-{}-{}@example.com".format(scenario, run_id, index), seed + index)
+               for index in range(concurrency)]
+    for client in clients:
+        client.register()
+        product_create(client)
+
+    operations, weights = zip(*SCENARIOS[scenario].items())
+    samples: List[list] = [[] for _ in clients]
+    deadline = time.monotonic() + duration
+
+    def loop(client, collected):
+        while time.monotonic() < deadline:
+            name, (status, latency, _, headers) = OPERATIONS[client.rng.choices(operations, weights)[0]](client)
+            queries = headers.get("X-DB-Queries")
+            collected.append((name, status, latency, int(queries) if queries is not None else None))
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=loop, args=(client, collected)) for client, collected in zip(clients, samples)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    by_operation: Dict[str, list] = {}
+    for name, *sample in (sample for collected in samples for sample in collected):
+        by_operation.setdefault(name, []).append(sample)
+    results = {name: summarise(by_operation[name], elapsed) for name in sorted(by_operation)}
+    results["total"] = summarise([sample for name in by_operation for sample in by_operation[name]], elapsed)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of ``results`` against ``baseline`` (both ``{scenario: {operation: summary}}``).
+    """
+    regressions = []
+    for scenario, operations in results.items():
+        for name, now in operations.items():
+            before = baseline.get(scenario, {}).get(name)
+            if before is None:
+                continue
+            where = "{} {}".format(scenario, name)
+            # Rare operations get too few samples for a meaningful rate or p99
+            if min(now["requests"], before["requests"]) >= MIN_REQUESTS:
+                if now["throughput"] < before["throughput"] * (1 - tolerance):
+                    regressions.append("{}: throughput {} req/s, baseline {}".format(
+                        where, now["throughput"], before["throughput"]))
+                if now["p99_ms"] > before["p99_ms"] * (1 + tolerance):
+                    regressions.append("{}: p99 {}ms, baseline {}ms".format(where, now["p99_ms"], before["p99_ms"]))
+            # Averages move a little with the mix; a redundant query per request moves them by 1
+            if None not in (now["queries"], before["queries"]) and now["queries"] > before["queries"] + 0.5:
+                regressions.append("{}: {} queries per request, baseline {}".format(
+                    where, now["queries"], before["queries"]))
+            if now["error_rate"] > before["error_rate"] + 0.01:
+                regressions.append("{}: error rate {}, baseline {}".format(
+                    where, now["error_rate"], before["error_rate"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run, repeatable; all of them by default")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per gunicorn worker")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Fraction throughput may drop and p99 may grow before it counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run to --baseline")
+    args = parser.parse_args()
+
+    env = {
+        "DJANGO_AWS_CLIENT_FACTORY": "product.standins.client",
+        "S3_BUCKET": "benchmark",
+        "SNS_TOPIC_ARN": "benchmark",
+        "GUNICORN_WORKERS": str(args.workers),
+        "GUNICORN_THREADS": str(args.threads),
+        "GUNICORN_ACCESSLOG": "",
+    }
+    manage("migrate", "--noinput")
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", "config/gunicorn.py",
+                "--bind", "127.0.0.1:{}".format(args.port)]
+
+    config = {"concurrency": args.concurrency, "duration": args.duration, "workers": args.workers,
+              "threads": args.threads}
+    results = {}
+    with Server(gunicorn, args.port, **env) as server:
+        for scenario in args.scenario or SCENARIOS:
+            results[scenario] = run(server.url, scenario, args.concurrency, args.duration, args.seed)
+            print("{:<8} {}".format(scenario, json.dumps(results[scenario]["total"])), file=sys.stderr)
+
+    report = {"config": config, "scenarios": results}
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+    elif not args.baseline.exists():
+        print("No baseline at {}, record one with --save-baseline".format(args.baseline), file=sys.stderr)
+    else:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["config"] != config:
+            print("Baseline was recorded with {}".format(json.dumps(baseline["config"])), file=sys.stderr)
+        report["regressions"] = compare(results, baseline["scenarios"], args.tolerance)
+    print(json.dumps(report, indent=2))
+
+    if report.get("regressions"):
+        sys.exit("{} regressions against {}".format(len(report["regressions"]), args.baseline))
+
+
+if __name__ == "__main__":
+    main()
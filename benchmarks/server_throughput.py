@@ -0,0 +1,45 @@
+"""
+Throughput of the Django development server against the gunicorn configuration.
+
+    python -m benchmarks.server_throughput [--concurrency 32] [--duration 10]
+
+Both servers are started on the benchmark settings and driven with the same mix of
+``/healthz`` and a database backed ``/v1/product/<id>`` lookup.
+"""
+# Python imports
+import argparse
+import itertools
+import json
+import sys
+
+# Project imports
+from benchmarks.common import Server, drive, manage, request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    manage("migrate", "--noinput")
+    servers = {
+        "runserver": [sys.executable, "manage.py", "runserver", "--noreload", "127.0.0.1:{}".format(args.port)],
+        "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "config/gunicorn.py",
+                     "--bind", "127.0.0.1:{}".format(args.port)],
+    }
+
+    results = {}
+    for name, command in servers.items():
+        with Server(command, args.port) as server:
+            paths = itertools.cycle(["/healthz", "/v1/product/1"])
+            results[name] = drive(lambda: request("GET", server.url + next(paths)), args.concurrency, args.duration)
+        print("{:<10} {}".format(name, json.dumps(results[name])), file=sys.stderr)
+
+    results["speedup"] = round(results["gunicorn"]["throughput"] / max(results["runserver"]["throughput"], 0.1), 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Settings for locally started benchmark servers: the test settings on a file backed database
+(SQLite by default, or whatever BENCHMARK_DATABASE_URL points at) so separate server
+processes and the load generator share it.
+
+Unlike the tests, the caches and the password hashers are the ones production runs with, so
+timings include cache hits and a real password hash: the shared memory segment per node, and
+a per-process cache as "default" unless BENCHMARK_CACHE_URL names a shared one such as Redis.
+"""
+from config.settings import base
+from config.settings.test import *  # noqa
+from config.settings.test import DATABASES, env
+
+ALLOWED_HOSTS = ["*"]
+
+DATABASES["default"].update(env.db("BENCHMARK_DATABASE_URL", default="sqlite:///benchmark.sqlite3"))
+
+PASSWORD_HASHERS = base.PASSWORD_HASHERS
+
+# The test settings swap both caches for DummyCache, which would leave every cached path uncached
+CACHES = {
+    "default": env.cache("BENCHMARK_CACHE_URL", default="locmemcache://"),
+    "shared": {
+        "BACKEND": "webapp.cache.shared.SharedMemoryCache",
+        "LOCATION": env("SHARED_CACHE_PATH", default=str(base.BASE_DIR / ".shared-cache" / "benchmark")),
+        "TIMEOUT": 60,
+        "OPTIONS": {
+            "SLOTS": env.int("SHARED_CACHE_SLOTS", default=4096),
+            "SLOT_SIZE": env.int("SHARED_CACHE_SLOT_SIZE", default=4096),
+        },
+    },
+}
+
+# Queries per request, reported by benchmarks.scenarios
+QUERY_COUNT_HEADER = True
@@ -0,0 +1,26 @@
+"""
+ASGI config for webapp project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g. gunicorn with uvicorn workers:
+
+    GUNICORN_APP=config.asgi:application GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker \
+        gunicorn -c config/gunicorn.py
+
+Under ASGI the image upload/delete and product delete endpoints are served by the
+coroutines in ``product.async_views``.
+"""
+import os
+import sys
+from pathlib import Path
+
+from django.core.asgi import get_asgi_application
+
+# This allows easy placement of apps within the interior
+# webapp directory.
+BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
+sys.path.append(str(BASE_DIR / "webapp"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.production")
+os.environ.setdefault("DJANGO_ASYNC_VIEWS", "True")
+
+application = get_asgi_application()
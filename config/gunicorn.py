@@ -0,0 +1,78 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn -c config/gunicorn.py
+
+The application is imported once in the master (``preload_app``) so workers fork with Django,
+the URLconf and the views already loaded. Anything holding a socket is reset in ``post_fork``.
+Every value can be overridden with the matching ``GUNICORN_*`` environment variable.
+"""
+import multiprocessing
+import os
+
+_cpus = multiprocessing.cpu_count()
+
+# Set GUNICORN_APP=config.asgi:application with GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker for ASGI.
+wsgi_app = os.environ.get("GUNICORN_APP", "config.wsgi:application")
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# gthread workers: requests mostly wait on Postgres, S3 and SNS, so a few threads per
+# process add concurrency without paying for another copy of the app per request slot.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("GUNICORN_WORKERS", _cpus * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", max(2, _cpus)))
+preload_app = True
+
+# Recycle workers so slow leaks (image uploads) never reach the OOM killer. The jitter
+# keeps workers from restarting at the same moment.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+backlog = int(os.environ.get("GUNICORN_BACKLOG", 2048))
+
+# An empty GUNICORN_ACCESSLOG turns the access log off.
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None
+errorlog = os.environ.get("GUNICORN_ERRORLOG", "-")
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def when_ready(server):
+    """
+    Build the SKU filter once in the master; workers inherit it with the rest of the preloaded app.
+    """
+    from django.db import connections
+
+    from product.skus import sku_filter
+
+    try:
+        sku_filter()
+    except Exception as e:
+        server.log.warning("Couldn't build the SKU filter, workers build their own: %s", e)
+    finally:
+        connections.close_all()
+
+
+def post_fork(server, worker):
+    """
+    Drop every connection inherited from the master so each worker opens its own.
+    """
+    from django.core.cache import caches
+    from django.db import connections
+
+    from product import aws, resilience
+    from webapp.db.pool import close_pools
+    from webapp.ratelimit.middleware import reset_buckets
+    from webapp.utils.memory import install_snapshot_handler
+
+    connections.close_all()
+    close_pools()
+    for cache in caches.all():
+        cache.close()
+    aws.reset_clients()
+    resilience.reset()
+    reset_buckets()
+    # Make sure the tracemalloc signal is handled by every worker, not only the master.
+    install_snapshot_handler()
@@ -0,0 +1,31 @@
+"""
+API-only profile: the production settings without the apps that only the HTML account
+pages and the API docs need. Serves /v1/ and /healthz and starts noticeably faster.
+"""
+from .production import *  # noqa
+from .production import INSTALLED_APPS
+
+# APPS
+# ------------------------------------------------------------------------------
+NON_API_APPS = [
+    "django.contrib.admin",
+    "crispy_forms",
+    "crispy_bootstrap5",
+    "allauth",
+    "allauth.account",
+    "allauth.socialaccount",
+    "rest_framework.authtoken",
+    "drf_spectacular",
+    "drf_yasg",
+]
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in NON_API_APPS]
+
+# URLS
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#root-urlconf
+ROOT_URLCONF = "config.urls_api"
+
+# AUTHENTICATION
+# ------------------------------------------------------------------------------
+# https://docs.djangoproject.com/en/dev/ref/settings/#authentication-backends
+AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
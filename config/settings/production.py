@@ -10,12 +10,26 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["vaibhavmahajan.in"])
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)  # noqa F405
+# Ignored by the pooled backends (postgrespool://), where the pool owns connection lifetime
+for alias in ["default"] + DATABASE_REPLICAS:  # noqa F405
+    DATABASES[alias]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)  # noqa F405
 
 # CACHES
 # ------------------------------------------------------------------------------
-CACHES = {
+# Hot keys are served from a per-process tier in front of Redis; writes are broadcast over
+# Redis pub/sub so every worker evicts its copy (webapp.cache.tiered).
+CACHES.update({  # noqa F405
     "default": {
+        "BACKEND": "webapp.cache.tiered.TieredCache",
+        "LOCATION": "redis",
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("CACHE_L1_MAX_ENTRIES", default=1024),
+            "L1_TIMEOUT": env.int("CACHE_L1_TIMEOUT", default=5),
+            "BROADCAST": "webapp.cache.broadcast.RedisBroadcast",
+            "BROADCAST_LOCATION": env("REDIS_URL"),
+        },
+    },
+    "redis": {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": env("REDIS_URL"),
         "OPTIONS": {
@@ -24,8 +38,14 @@ CACHES = {
             # https://github.com/jazzband/django-redis#memcached-exceptions-behavior
             "IGNORE_EXCEPTIONS": True,
         },
-    }
-}
+    },
+})
+# Let one worker per cluster refresh an expired hot entry
+SINGLE_FLIGHT_LOCK_ALIAS = "redis"
+# Idempotency markers must be seen by every worker at once, not through a per-process tier
+IDEMPOTENCY_CACHE_ALIAS = "redis"
+# Rate limit buckets shared by every worker
+RATELIMIT_REDIS_URL = env("RATELIMIT_REDIS_URL", default=env("REDIS_URL"))
 
 # SECURITY
 # ------------------------------------------------------------------------------
@@ -20,6 +20,18 @@ TEST_RUNNER = "django.test.runner.DiscoverRunner"
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
 PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
 
+# CACHES
+# ------------------------------------------------------------------------------
+# Nothing is cached between tests (row ids repeat after every rollback); tests that exercise
+# a cache configure one themselves.
+CACHES["default"] = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}  # noqa F405
+CACHES["shared"] = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}  # noqa F405
+
+# RATE LIMITING
+# ------------------------------------------------------------------------------
+# Buckets outlive a test; the rate limiting tests turn it on and reset them.
+RATELIMIT_ENABLED = False
+
 # EMAIL
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
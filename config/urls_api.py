@@ -0,0 +1,13 @@
+"""
+URLconf of the API-only settings profile (config.settings.api): the JSON API and the
+health check, without the swagger pages and account views.
+"""
+from django.urls import include, path
+
+from webapp.users.views import Health
+
+urlpatterns = [
+    path("healthz", Health.as_view(), name="health"),
+    path("v1/user/", include("webapp.users.urls", namespace="user")),
+    path("v1/product/", include("product.urls", namespace="product")),
+]
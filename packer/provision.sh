@@ -34,9 +34,9 @@ pip3 install --upgrade pip
 pip3 install -r requirements/local.txt
 
 # webapp system service
-sudo cp packer/webapp.service /etc/systemd/system/
+sudo cp packer/webapp-migrate.service packer/webapp.service /etc/systemd/system/
 sudo systemctl daemon-reload
-sudo systemctl enable webapp.service
+sudo systemctl enable webapp-migrate.service webapp.service
 sudo systemctl start webapp.service
 
 sudo /opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl -a fetch-config -m ec2 -c file://home/ec2-user/webapp/packer/cloudwatch-config.json -s
@@ -0,0 +1,285 @@
+"""
+Async variants of the S3/SNS bound product endpoints, served under ASGI (``config/asgi.py``).
+
+Image upload/delete and product delete spend most of their time waiting on S3 and SNS.
+Here that wait happens on an event loop: ORM access runs through ``sync_to_async`` and the
+blocking boto3 calls run on a dedicated thread pool (``AWS_IO_THREADS``), so one process keeps
+many uploads in flight. Every other method on these routes is handed to the regular rest
+framework view. Responses are the same as the synchronous views.
+"""
+# Python imports
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Django imports
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from statsd.defaults.django import statsd
+
+# Rest framework imports
+from rest_framework import exceptions, status
+
+# Project imports
+from .cache import bump_generations
+from .models import Product, ProductImage
+from .resilience import CircuitOpen
+from .views import (
+    ProductGetView,
+    ProductImageGetDeleteView,
+    ProductImageGetPostView,
+    delete_image,
+    delete_image_batch,
+    image_batches,
+    send_to_sns_topic,
+    upload_failure_status,
+    upload_image,
+)
+from webapp.users.utils import json_response
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def io_executor():
+    """
+    Thread pool for blocking S3/SNS calls, created on first use so forked workers get their own.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(settings.AWS_IO_THREADS, thread_name_prefix="aws-io")
+    return _executor
+
+
+async def run_io(func, *args, **kwargs):
+    """
+    Run a blocking network call on the I/O pool without blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def authenticate(request, view_class):
+    """
+    Run the view's rest framework authenticators and return ``(user, None)``, or ``(None, response)``
+    with the 401 rest framework would have sent.
+    """
+    authenticators = [authentication() for authentication in view_class.authentication_classes]
+    for authenticator in authenticators:
+        try:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            return None, _unauthorized(e.detail, authenticators)
+        if result is not None:
+            return result[0], None
+    return None, _unauthorized(exceptions.NotAuthenticated.default_detail, authenticators)
+
+
+def _unauthorized(detail, authenticators):
+    http_response = JsonResponse({"detail": str(detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if authenticators:
+        http_response["WWW-Authenticate"] = authenticators[0].authenticate_header(None)
+    return http_response
+
+
+@sync_to_async
+def _get_product(product_id):
+    return Product.objects.select_related("owner_user").filter(id=product_id).first()
+
+
+@sync_to_async
+def _create_image_row(product, file_name):
+    with transaction.atomic():
+        image = ProductImage(product=product, file_name=file_name)
+        image.save()
+        image.s3_bucket_path = "{}/{}/{}".format(product.id, image.image_id, image.file_name)
+        image.save()
+        bump_generations(product.owner_user_id, ProductImage)
+    return image
+
+
+@sync_to_async
+def _image_data(image_id):
+    return ProductImage.objects.filter(image_id=image_id).values().first()
+
+
+@sync_to_async
+def _get_image(image_id, product):
+    return ProductImage.objects.filter(image_id=image_id, product=product).first()
+
+
+@sync_to_async
+def _image_keys(product):
+    return list(ProductImage.objects.filter(product=product).values_list("s3_bucket_path", flat=True))
+
+
+@sync_to_async
+def _delete(instance, owner_id, *models):
+    with transaction.atomic():
+        instance.delete()
+        bump_generations(owner_id, *models)
+
+
+async def create_image(request, *args, **kwargs):
+    """
+    Async ``ProductImageGetPostView.create``: the S3 upload and the SNS notification run on the
+    I/O pool, and the notification overlaps with reading back the stored row.
+    """
+    try:
+        statsd.incr("image_create")
+        user, error = await authenticate(request, ProductImageGetPostView)
+        if error:
+            return error
+
+        product = await _get_product(kwargs['id'])
+        if product is None:
+            return json_response(False, "Product {} does not exist".format(kwargs['id']), status.HTTP_404_NOT_FOUND)
+
+        if not product.owner_user_id == user.id:
+            return json_response(False, "You are not allowed to Update this product's data",
+                                 status.HTTP_403_FORBIDDEN)
+
+        if not request.FILES.get("image", False):
+            return json_response(False, "Please select image as form-data", status.HTTP_400_BAD_REQUEST)
+
+        # Pillow is only needed here, keep it out of process start up
+        from PIL import Image
+
+        try:
+            file_stream = request.FILES["image"].read()
+            Image.open(request.FILES["image"])
+        except Exception as e:
+            return json_response(False, "Invalid image : {}".format(str(e)), status.HTTP_400_BAD_REQUEST)
+
+        image = await _create_image_row(product, request.FILES["image"].name)
+        username = product.owner_user.username
+
+        try:
+            await run_io(upload_image, image.s3_bucket_path, file_stream)
+        except Exception as e:
+            # The row must not outlive an upload that never happened, or it would show in the image list
+            await _delete(image, product.owner_user_id, ProductImage)
+            if isinstance(e, CircuitOpen):
+                # Nothing reached S3, leave the 503 to the handler below
+                raise
+            await run_io(send_to_sns_topic, image.s3_bucket_path, image.file_name, False, str(e), username)
+            return json_response(False, str(e), upload_failure_status(e))
+
+        data, _ = await asyncio.gather(
+            _image_data(image.image_id),
+            run_io(send_to_sns_topic, image.s3_bucket_path, image.file_name, True, "Image Uploaded", username),
+        )
+        return json_response(True, "Image Uploaded successfully", status.HTTP_201_CREATED, data, log_level="info")
+    except CircuitOpen as e:
+        return json_response(False, str(e), status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": e.retry_after})
+    except Exception as e:
+        return json_response(False, str(e), status.HTTP_408_REQUEST_TIMEOUT)
+
+
+async def delete_product_image(request, *args, **kwargs):
+    """
+    Async ``ProductImageGetDeleteView.delete``: once S3 confirms the delete the row is deleted,
+    and the SNS notification goes out after that has committed.
+    """
+    try:
+        statsd.incr("image_delete")
+        user, error = await authenticate(request, ProductImageGetDeleteView)
+        if error:
+            return error
+
+        product = await _get_product(kwargs['id'])
+        if product is None:
+            return json_response(False, "Product {} does not exist".format(kwargs['id']), status.HTTP_404_NOT_FOUND)
+
+        image = await _get_image(kwargs['image_id'], product)
+        if image is None:
+            return json_response(False, "Image id associated with this product does not exist",
+                                 status.HTTP_404_NOT_FOUND)
+
+        if not product.owner_user_id == user.id:
+            return json_response(False, "You are not allowed to delete this product's data",
+                                 status.HTTP_403_FORBIDDEN)
+
+        username = product.owner_user.username
+        try:
+            await run_io(delete_image, image.s3_bucket_path)
+        except CircuitOpen:
+            # Nothing reached S3, leave the 503 to the handler below
+            raise
+        except Exception as e:
+            await run_io(send_to_sns_topic, image.s3_bucket_path, image.file_name, False, str(e), username)
+            return json_response(False, str(e), upload_failure_status(e))
+
+        await _delete(image, product.owner_user_id, ProductImage)
+        await run_io(send_to_sns_topic, image.s3_bucket_path, image.file_name, True, "Image Deleted", username)
+        return json_response(True, "Image deleted successfully", status.HTTP_204_NO_CONTENT, show_data=True,
+                             log_level="info")
+    except CircuitOpen as e:
+        return json_response(False, str(e), status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": e.retry_after})
+    except Exception as e:
+        return json_response(False, str(e), status.HTTP_408_REQUEST_TIMEOUT)
+
+
+async def delete_product(request, *args, **kwargs):
+    """
+    Async ``ProductGetView.delete``: once the database delete has committed, every
+    ``delete_objects`` batch is sent at once. As in the synchronous view, S3 failures are logged
+    and ignored.
+    """
+    try:
+        statsd.incr("product_delete")
+        user, error = await authenticate(request, ProductGetView)
+        if error:
+            return error
+
+        product = await _get_product(kwargs['id'])
+        if product is None:
+            return json_response(False, "Product {} does not exist".format(kwargs['id']), status.HTTP_404_NOT_FOUND)
+
+        if not product.owner_user_id == user.id:
+            return json_response(False, "You are not allowed to delete this product's data",
+                                 status.HTTP_403_FORBIDDEN)
+
+        keys = await _image_keys(product)
+
+        logger.info("Deleting product")
+        await _delete(product, product.owner_user_id, Product, ProductImage)
+        try:
+            await asyncio.gather(*(run_io(delete_image_batch, batch) for batch in image_batches(keys)))
+        except Exception as e:
+            logger.error("Couldn't delete Images from S3, deleted product only : {}".format(str(e)))
+        return json_response(True, "Product deleted successfully", status.HTTP_204_NO_CONTENT, show_data=True,
+                             log_level="info")
+    except Exception as e:
+        return json_response(False, str(e), status.HTTP_408_REQUEST_TIMEOUT)
+
+
+def async_variant(view_class, **handlers):
+    """
+    Build a coroutine view that serves the given methods with ``handlers`` and hands every other
+    method to ``view_class`` in a thread.
+    """
+    sync_view = view_class.as_view()
+
+    async def view(request, *args, **kwargs):
+        handler = handlers.get(request.method.lower())
+        if handler is None:
+            return await sync_to_async(sync_view)(request, *args, **kwargs)
+        return await handler(request, *args, **kwargs)
+
+    view.csrf_exempt = True  # type: ignore[attr-defined]
+    # The handlers open their own transactions; Django refuses ATOMIC_REQUESTS around coroutines.
+    return transaction.non_atomic_requests(view)
+
+
+product_get_view = async_variant(ProductGetView, delete=delete_product)
+image_create_view = async_variant(ProductImageGetPostView, post=create_image)
+image_get_view = async_variant(ProductImageGetDeleteView, delete=delete_product_image)
@@ -0,0 +1,77 @@
+# Python imports
+import os
+import threading
+from typing import Any, Dict
+
+import environ
+
+# Django imports
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_clients: Dict[tuple, Any] = {}
+_lock = threading.Lock()
+
+
+def _create_client(service_name, **kwargs):
+    factory = getattr(settings, "AWS_CLIENT_FACTORY", None)
+    if factory:
+        return import_string(factory)(service_name, **kwargs)
+    # boto3 takes ~100ms to import, so only pay for it once a client is needed
+    import boto3
+
+    use_profile = environ.Env().bool("USE_PROFILE", default=False)
+    if use_profile:
+        return boto3.Session(profile_name='dev').client(service_name, **kwargs)
+    return boto3.client(service_name, **kwargs)
+
+
+def get_client(service_name, **kwargs):
+    """
+    Return a boto3 client for the service, created once per process and then reused.
+    boto3 clients are thread safe, so every thread of a worker shares the same connection pool.
+    """
+    key = (service_name, tuple(sorted(kwargs.items())))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = _create_client(service_name, config=client_config(service_name), **kwargs)
+    return client
+
+
+def client_config(service_name):
+    """
+    Short socket timeouts and no botocore retries; ``product.resilience`` retries within a deadline.
+    """
+    from botocore.config import Config
+
+    return Config(connect_timeout=settings.AWS_CONNECT_TIMEOUT, read_timeout=settings.AWS_READ_TIMEOUTS[service_name],
+                  retries={"total_max_attempts": 1})
+
+
+def client_kwargs(service_name):
+    if service_name == "sns":
+        return {"region_name": os.getenv("AWS_REGION")}
+    return {}
+
+
+def s3_client():
+    return get_client("s3", **client_kwargs("s3"))
+
+
+def sns_client():
+    return get_client("sns", **client_kwargs("sns"))
+
+
+def bucket_name():
+    return environ.Env().str("S3_BUCKET")
+
+
+def reset_clients():
+    """
+    Drop every cached client. Called after fork so workers never share sockets with the master.
+    """
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,116 @@
+# Python imports
+import random
+import socket
+
+# Django imports
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+# Project imports
+from .models import Product
+from webapp.cache import negative
+from webapp.cache.singleflight import cached
+from webapp.db.routers import primary_reads
+
+
+def product_key(product_id):
+    return "product:{}".format(product_id)
+
+
+def get_product_data(product_id):
+    """
+    The product row as a dict, like ``Product.objects.filter(id=...).values().first()``, cached in
+    ``PRODUCT_CACHE_ALIAS`` for ``PRODUCT_CACHE_TIMEOUT`` seconds. ``None`` when it does not exist.
+
+    Concurrent misses for the same product share a single query, and an expired entry keeps being
+    served for ``PRODUCT_CACHE_STALE_TIMEOUT`` seconds while one caller refreshes it. Ids found
+    missing are remembered by ``webapp.cache.negative``. Misses read the primary: a row cached from
+    a lagging replica would outlive the write that invalidated it.
+    """
+    if negative.is_known_missing(Product, product_id):
+        return None
+
+    def load():
+        with primary_reads():
+            return Product.objects.filter(id=product_id).values().first()
+
+    lock_alias = settings.SINGLE_FLIGHT_LOCK_ALIAS
+    product_data = cached(
+        caches[settings.PRODUCT_CACHE_ALIAS],
+        product_key(product_id),
+        load,
+        timeout=settings.PRODUCT_CACHE_TIMEOUT,
+        stale_timeout=settings.PRODUCT_CACHE_STALE_TIMEOUT,
+        lock_cache=caches[lock_alias] if lock_alias else None,
+        # PRODUCT_CACHE_ALIAS is per node, so is the refresh: a worker never waits on another node's
+        lock_scope=socket.gethostname(),
+    )
+    if product_data is None:
+        negative.remember_missing(Product, product_id)
+    return product_data
+
+
+def invalidate_product(product_id):
+    caches[settings.PRODUCT_CACHE_ALIAS].delete(product_key(product_id))
+
+
+def generation_key(owner_id, model):
+    return "generation:{}:{}".format(model._meta.label_lower, owner_id)
+
+
+def get_generation(owner_id, model):
+    """
+    The current generation of the owner's rows of ``model``. A missing counter starts at a random
+    value, so lists cached before it was evicted can never be read again.
+    """
+    cache = caches[settings.LIST_CACHE_ALIAS]
+    key = generation_key(owner_id, model)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, random.getrandbits(62), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(owner_id, model):
+    cache = caches[settings.LIST_CACHE_ALIAS]
+    try:
+        cache.incr(generation_key(owner_id, model))
+    except ValueError:
+        # Nothing was cached under the old generation, the next read starts a new one
+        pass
+
+
+def bump_generations(owner_id, *models):
+    """
+    Retire every list cached for the owner's rows of ``models``. Called by every write, inside its
+    transaction: once right away and once more on commit, so a list cached from the old rows
+    while the transaction was open is retired too.
+    """
+    def bump():
+        for model in models:
+            bump_generation(owner_id, model)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def cached_list(owner_id, model, name, compute):
+    """
+    ``compute()`` cached for ``LIST_CACHE_TIMEOUT`` seconds under the owner's current generation
+    of ``model``. ``name`` tells apart the lists of one owner, e.g. one per product. A miss runs
+    ``compute()`` against the primary, so a list read from a replica that has not replayed the
+    write behind the last ``bump_generations`` is never cached under the new generation.
+    """
+    generation = get_generation(owner_id, model)
+    if generation is None:
+        return compute()
+    cache = caches[settings.LIST_CACHE_ALIAS]
+    key = "list:{}:{}:{}:{}".format(model._meta.label_lower, owner_id, generation, name)
+    result = cache.get(key)
+    if result is None:
+        with primary_reads():
+            result = compute()
+        cache.set(key, result, settings.LIST_CACHE_TIMEOUT)
+    return result
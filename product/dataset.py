@@ -0,0 +1,129 @@
+"""
+Synthetic users, products and images for scale testing, used by the ``generate_dataset`` command.
+
+Every row is derived from ``(seed, kind, chunk)`` alone, so a dataset is identical however many
+processes write it and in whatever order their chunks finish. Rows get explicit ids counted from
+the tables' current maximum, which lets products and images point at their parents without
+reading them back.
+
+Owners and products are picked with a power law: index ``floor(n * u ** skew)`` for a uniform
+``u``, so with the default skew of 3 a quarter of the owners hold most of the products and a few
+products carry most of the images, like a real catalog.
+"""
+# Python imports
+import random
+
+# Django imports
+from django.db import transaction
+from django.utils import timezone
+
+# Project imports
+from .models import Product, ProductImage
+from webapp.cache import negative
+from webapp.db.bulk import copy_rows
+from webapp.users.models import User
+
+WORDS = [
+    "alpha", "amber", "arc", "aurora", "basic", "bold", "bright", "canyon", "cedar", "classic", "cloud",
+    "coral", "core", "delta", "drift", "echo", "ember", "flex", "flint", "fusion", "glacier", "harbor",
+    "horizon", "iron", "jade", "lumen", "lunar", "maple", "matrix", "nova", "onyx", "orbit", "pixel",
+    "prime", "pulse", "quartz", "ridge", "sierra", "solar", "sonic", "spark", "summit", "terra", "titan",
+    "ultra", "vector", "velvet", "vertex", "vista", "zenith",
+]
+KINDS = ["cable", "camera", "charger", "chair", "desk", "drone", "headset", "keyboard", "lamp", "monitor",
+         "mouse", "phone", "printer", "router", "speaker", "tablet", "watch"]
+FIRST_NAMES = ["Alex", "Ana", "Chen", "Dana", "Eli", "Fatima", "Hiro", "Ivan", "Jo", "Kai", "Lena", "Maya",
+               "Noor", "Omar", "Priya", "Quinn", "Rosa", "Sam", "Tariq", "Uma", "Vik", "Wen", "Yara", "Zoe"]
+LAST_NAMES = ["Ahmed", "Brown", "Costa", "Dubois", "Evans", "Fischer", "Garcia", "Ito", "Jensen", "Kim",
+              "Lopez", "Mahajan", "Novak", "Okafor", "Patel", "Rossi", "Silva", "Tanaka", "Wang", "Yilmaz"]
+MANUFACTURERS = ["{} {}".format(word.capitalize(), suffix) for word in WORDS for suffix in ("Labs", "Works")]
+EXTENSIONS = ["jpg", "jpg", "jpg", "png", "png", "webp"]
+
+
+def skewed_index(rng, n, skew):
+    return min(int(n * rng.random() ** skew), n - 1)
+
+
+def chunk_rng(seed, kind, chunk):
+    return random.Random("{}:{}:{}".format(seed, kind, chunk))
+
+
+def first_ids(using="default"):
+    """
+    The first free id of every table, where generated rows start.
+    """
+    return {model._meta.model_name: (model.objects.using(using).order_by("-pk").values_list("pk", flat=True)
+                                     .first() or 0) + 1
+            for model in (User, Product, ProductImage)}
+
+
+def user_rows(plan, start, count):
+    rng = chunk_rng(plan["seed"], "user", start)
+    now = plan["now"]
+    for index in range(start, start + count):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield {
+            "id": plan["ids"]["user"] + index, "password": plan["password"], "last_login": None,
+            "is_superuser": False, "first_name": first_name, "last_name": last_name,
+            "username": "{}.{}.{}@s{}.example.com".format(first_name, last_name, index, plan["seed"]).lower(),
+            "is_staff": False, "is_active": True, "account_created": now, "account_updated": now,
+        }
+
+
+def product_rows(plan, start, count):
+    rng = chunk_rng(plan["seed"], "product", start)
+    now = plan["now"]
+    for index in range(start, start + count):
+        name = "{} {} {}".format(rng.choice(WORDS).capitalize(), rng.choice(WORDS).capitalize(), rng.choice(KINDS))
+        yield {
+            "id": plan["ids"]["product"] + index,
+            "owner_user_id": plan["ids"]["user"] + skewed_index(rng, plan["users"], plan["skew"]),
+            "name": name, "description": "{} with {} finish".format(name, rng.choice(WORDS)),
+            "sku": "S{}-{}".format(plan["seed"], index),
+            # A few popular manufacturers make most products
+            "manufacturer": MANUFACTURERS[skewed_index(rng, len(MANUFACTURERS), 2)],
+            "quantity": rng.randint(0, 100), "date_added": now, "date_last_updated": now,
+        }
+
+
+def image_rows(plan, start, count):
+    rng = chunk_rng(plan["seed"], "image", start)
+    now = plan["now"]
+    for index in range(start, start + count):
+        product_id = plan["ids"]["product"] + skewed_index(rng, plan["products"], plan["skew"])
+        image_id = plan["ids"]["productimage"] + index
+        file_name = "image-{}.{}".format(index, rng.choice(EXTENSIONS))
+        yield {
+            "image_id": image_id, "product_id": product_id, "file_name": file_name, "date_created": now,
+            "s3_bucket_path": "{}/{}/{}".format(product_id, image_id, file_name),
+        }
+
+
+ROWS = {User: user_rows, Product: product_rows, ProductImage: image_rows}
+
+
+def write_chunk(plan, model, start, count):
+    """
+    Generate and write one chunk of ``model`` rows in a transaction. Returns the number written.
+    """
+    rows = list(ROWS[model](plan, start, count))
+    using = plan["using"]
+    with transaction.atomic(using=using):
+        if plan["method"] == "copy":
+            columns = list(rows[0])
+            copy_rows(model, columns, ([row[column] for column in columns] for row in rows), using=using)
+        else:
+            # bulk_create would overwrite the auto_now(_add) timestamps, which is fine here
+            model.objects.using(using).bulk_create([model(**row) for row in rows], batch_size=len(rows))
+        if model is not ProductImage:
+            # Nothing sends post_save, so do what the receivers would
+            negative.forget_missing_many(model, [row["id"] for row in rows])
+    return len(rows)
+
+
+def plan_dataset(users, products, images, seed, password_hash, skew=3.0, method="bulk_create", using="default"):
+    return {
+        "users": users, "products": products, "images": images, "seed": seed, "password": password_hash,
+        "skew": skew, "method": method, "using": using, "ids": first_ids(using),
+        "now": timezone.now().isoformat(),
+    }
@@ -0,0 +1,67 @@
+"""
+NDJSON export of an owner's catalog: one line per product, holding the product's columns and an
+``images`` list of its image rows.
+
+Products and images are read with two ``iterator(chunk_size=...)`` queries ordered by product id
+and merged as they stream (server-side cursors on PostgreSQL), so memory use depends on the chunk
+size, not on the size of the catalog. Served by ``ProductExportView`` and the ``export_products``
+management command.
+"""
+# Python imports
+import zlib
+from typing import Any, Iterator
+
+# Rest framework imports
+from rest_framework.utils.encoders import JSONEncoder
+
+# Project imports
+from .models import Product, ProductImage
+
+
+def export_lines(owner_id, chunk_size=2000, using="default"):
+    """
+    Yield the owner's products as NDJSON lines (bytes, newline terminated), in id order.
+    """
+    products: Iterator[Any] = (Product.objects.using(using).filter(owner_user_id=owner_id).order_by("id")
+                               .values().iterator(chunk_size=chunk_size))
+    images = (ProductImage.objects.using(using).filter(product__owner_user_id=owner_id)
+              .order_by("product_id", "image_id").values().iterator(chunk_size=chunk_size))
+    encoder = JSONEncoder(separators=(",", ":"))
+
+    image = next(images, None)
+    for product in products:
+        # Images of products deleted while the export ran are skipped
+        while image is not None and image["product_id"] < product["id"]:
+            image = next(images, None)
+        product["images"] = []
+        while image is not None and image["product_id"] == product["id"]:
+            product["images"].append(image)
+            image = next(images, None)
+        yield encoder.encode(product).encode() + b"\n"
+
+
+def buffered(chunks, size=64 * 1024):
+    """
+    Join small chunks into ones of about ``size`` bytes, so the server writes whole buffers.
+    """
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Gzip a stream of byte chunks on the fly.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
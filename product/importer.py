@@ -0,0 +1,190 @@
+"""
+Bulk import of products from CSV or NDJSON, used by the ``import_products`` management command.
+
+Rows are read as a stream and handled in batches of ``batch_size``: each batch is validated a
+column at a time with the same rules as ``ProductSerializer`` (required strings within the model's
+``max_length``, an integer ``quantity`` between 0 and 100, SKUs unique in the file and the table,
+checked with one query per batch), then written in one transaction with ``bulk_create`` or, on
+PostgreSQL, ``COPY``. Rejected rows and progress go to a report file as NDJSON, so a bad row
+never stops an import.
+"""
+# Python imports
+import csv
+import json
+import re
+import time
+from typing import Dict, List, cast
+
+# Django imports
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+# Project imports
+from .cache import bump_generations
+from .models import Product
+from webapp.cache import negative
+from webapp.db.bulk import copy_rows
+
+STRING_FIELDS = ("name", "description", "sku", "manufacturer")
+INTEGER = re.compile(r"^\s*-?\d+\s*$")
+QUANTITY_MIN, QUANTITY_MAX = 0, 100
+
+
+def read_rows(stream, fmt):
+    """
+    Yield ``(line_number, row)`` from a text stream; ``row`` is ``None`` for an unreadable line.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            value = None
+        yield line_number, value if isinstance(value, dict) else None
+
+
+def parse_quantity(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and INTEGER.match(value):
+        return int(value)
+    return None
+
+
+def validate_batch(rows, taken_skus):
+    """
+    Errors of every row (an empty dict for a valid one), checked one column at a time. Valid
+    quantities are converted to ``int`` in place. ``taken_skus`` holds the SKUs already in the table
+    or earlier in the import.
+    """
+    errors: List[Dict[str, str]] = [{} for _ in rows]
+    present = [row if row is not None else {} for row in rows]
+
+    for name in STRING_FIELDS:
+        max_length = cast(int, getattr(Product._meta.get_field(name), "max_length"))
+        for row_errors, value in zip(errors, (row.get(name) for row in present)):
+            if not isinstance(value, str) or not value.strip():
+                row_errors[name] = "This field is required."
+            elif len(value) > max_length:
+                row_errors[name] = "Ensure this field has no more than {} characters.".format(max_length)
+
+    for row_errors, row in zip(errors, present):
+        quantity = parse_quantity(row.get("quantity"))
+        if quantity is None:
+            row_errors["quantity"] = "A valid integer is required."
+        elif not QUANTITY_MIN <= quantity <= QUANTITY_MAX:
+            row_errors["quantity"] = "Ensure this value is between {} and {}.".format(QUANTITY_MIN, QUANTITY_MAX)
+        else:
+            row["quantity"] = quantity
+
+    batch_skus = set()
+    for row_errors, row in zip(errors, present):
+        sku = row.get("sku")
+        if "sku" in row_errors:
+            continue
+        if sku in taken_skus or sku in batch_skus:
+            row_errors["sku"] = "Product with this SKU {} already exist".format(sku)
+        batch_skus.add(sku)
+    # Unreadable lines only get one error
+    return [row_errors if row is not None else {"row": "Not a valid JSON object."}
+            for row, row_errors in zip(rows, errors)]
+
+
+class ProductImporter:
+    """
+    Imports rows for one owner, writing rejects and progress lines to ``report``.
+    """
+
+    def __init__(self, owner_id, batch_size=1000, method="bulk_create", report=None, using="default"):
+        if method == "copy" and connections[using].vendor != "postgresql":
+            raise ValueError("COPY needs PostgreSQL, use bulk_create")
+        self.owner_id = owner_id
+        self.batch_size = batch_size
+        self.method = method
+        self.report = report
+        self.using = using
+        self.seen_skus = set()
+        self.stats = {"read": 0, "imported": 0, "rejected": 0}
+        self.started = 0.0
+
+    def run(self, rows):
+        self.started = time.monotonic()
+        batch = []
+        for line_number, row in rows:
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = []
+        if batch:
+            self.import_batch(batch)
+        bump_generations(self.owner_id, Product)
+        return dict(self.stats, seconds=round(self.elapsed(), 3), rows_per_second=round(self.rate(), 1))
+
+    def import_batch(self, batch):
+        rows = [row for _, row in batch]
+        skus = {row.get("sku") for row in rows if row is not None and isinstance(row.get("sku"), str)}
+        taken = self.seen_skus | set(
+            Product.objects.using(self.using).filter(sku__in=skus - self.seen_skus).values_list("sku", flat=True))
+        errors = validate_batch(rows, taken)
+        valid = [row for row, row_errors in zip(rows, errors) if not row_errors]
+
+        try:
+            self.write(valid)
+        except IntegrityError:
+            # A SKU was written by someone else since the check; check again and retry once
+            taken |= set(Product.objects.using(self.using).filter(
+                sku__in=[row["sku"] for row in valid]).values_list("sku", flat=True))
+            errors = validate_batch(rows, taken)
+            valid = [row for row, row_errors in zip(rows, errors) if not row_errors]
+            self.write(valid)
+
+        self.seen_skus.update(row["sku"] for row in valid)
+        for (line_number, row), row_errors in zip(batch, errors):
+            if row_errors:
+                self.log({"type": "reject", "line": line_number, "row": row, "errors": row_errors})
+        self.stats["read"] += len(batch)
+        self.stats["imported"] += len(valid)
+        self.stats["rejected"] += len(batch) - len(valid)
+        self.log(dict(self.stats, type="progress", rows_per_second=round(self.rate(), 1)))
+
+    def write(self, rows):
+        if not rows:
+            return
+        with transaction.atomic(using=self.using):
+            if self.method == "copy":
+                ids = self.copy(rows)
+            else:
+                products = Product.objects.using(self.using).bulk_create([
+                    Product(owner_user_id=self.owner_id, **{name: row[name] for name in STRING_FIELDS},
+                            quantity=row["quantity"]) for row in rows
+                ], batch_size=self.batch_size)
+                ids = [product.id for product in products]
+            # bulk_create and COPY send no post_save, so do what the receivers would
+            negative.forget_missing_many(Product, ids)
+
+    def copy(self, rows):
+        """
+        Write rows with ``COPY ... FROM STDIN`` and return their new ids.
+        """
+        now = timezone.now().isoformat()
+        copy_rows(Product, ["owner_user_id", *STRING_FIELDS, "quantity", "date_added", "date_last_updated"],
+                  ([self.owner_id, *(row[name] for name in STRING_FIELDS), row["quantity"], now, now] for row in rows),
+                  using=self.using)
+        return list(Product.objects.using(self.using).filter(
+            sku__in=[row["sku"] for row in rows]).values_list("id", flat=True))
+
+    def log(self, entry):
+        if self.report is not None:
+            self.report.write(json.dumps(entry, default=str) + "\n")
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def rate(self):
+        return self.stats["read"] / max(self.elapsed(), 1e-9)
@@ -0,0 +1,41 @@
+# Python imports
+import sys
+
+# Django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Project imports
+from product.export import buffered, export_lines, gzip_chunks
+from webapp.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Stream a user's products with their images as NDJSON, like GET /v1/product/export."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Owner whose catalog is exported")
+        parser.add_argument("--output", "-o", help="File to write, standard output by default")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+        parser.add_argument("--chunk-size", type=int, default=settings.EXPORT_CHUNK_SIZE,
+                            help="Rows fetched per database round trip")
+        parser.add_argument("--database", default="default", help="Database alias to read from")
+
+    def handle(self, *args, **options):
+        owner_id = User.objects.using(options["database"]).filter(
+            username=options["username"]).values_list("id", flat=True).first()
+        if owner_id is None:
+            raise CommandError("User {} does not exist".format(options["username"]))
+
+        chunks = buffered(export_lines(owner_id, options["chunk_size"], options["database"]))
+        if options["gzip"]:
+            chunks = gzip_chunks(chunks)
+        output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
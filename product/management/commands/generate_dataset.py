@@ -0,0 +1,84 @@
+# Python imports
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+# Django imports
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+# Project imports
+from product.dataset import plan_dataset, write_chunk
+from product.models import Product, ProductImage
+from webapp.db.bulk import reset_sequences
+from webapp.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic synthetic dataset of users, products and images for scale testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--products", type=int, default=100000)
+        parser.add_argument("--images", type=int, default=200000)
+        parser.add_argument("--seed", type=int, default=0, help="Same seed, same dataset")
+        parser.add_argument("--skew", type=float, default=3.0,
+                            help="Power law exponent of products per owner and images per product, 1 is uniform")
+        parser.add_argument("--password", default="dataset-password", help="Password of every generated user")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Rows written per transaction")
+        parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                            help="Writer processes; SQLite always uses one")
+        parser.add_argument("--method", choices=["bulk_create", "copy"], default="bulk_create",
+                            help="How chunks are written; copy needs PostgreSQL")
+        parser.add_argument("--database", default="default", help="Database alias to write to")
+
+    def handle(self, *args, **options):
+        if options["products"] and not options["users"] or options["images"] and not options["products"]:
+            raise CommandError("Products need users and images need products")
+        using = options["database"]
+        vendor = connections[using].vendor
+        if options["method"] == "copy" and vendor != "postgresql":
+            raise CommandError("COPY needs PostgreSQL, use bulk_create")
+        workers = 1 if vendor == "sqlite" else max(options["workers"], 1)
+
+        # Hashed once: every user shares the password, and hashing millions would take hours
+        plan = plan_dataset(options["users"], options["products"], options["images"], options["seed"],
+                            make_password(options["password"]), options["skew"], options["method"], using)
+        if workers > 1:
+            # Forked writers must open their own connections, not share the parent's sockets
+            connections.close_all()
+        context = multiprocessing.get_context("fork")
+        executor: Union[ProcessPoolExecutor, _InProcess] = (
+            ProcessPoolExecutor(workers, mp_context=context) if workers > 1 else _InProcess())
+        with executor as pool:
+            # Parents first, each table finishes before the next one references it
+            for model, total in ((User, plan["users"]), (Product, plan["products"]),
+                                 (ProductImage, plan["images"])):
+                started = time.monotonic()
+                chunks = [(start, min(options["chunk_size"], total - start))
+                          for start in range(0, total, options["chunk_size"])]
+                written = sum(pool.map(write_chunk, *zip(*[(plan, model, start, count) for start, count in chunks]))
+                              if chunks else [])
+                elapsed = time.monotonic() - started
+                self.stdout.write("{}: {} rows in {:.1f}s ({:.0f} rows/s)".format(
+                    model._meta.verbose_name_plural, written, elapsed, written / max(elapsed, 1e-9)))
+        reset_sequences([User, Product, ProductImage], using)
+
+
+class _InProcess:
+    """
+    ``ProcessPoolExecutor`` stand-in that runs every call in this process.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @staticmethod
+    def map(func, *iterables):
+        return map(func, *iterables)
@@ -0,0 +1,48 @@
+# Python imports
+import io
+import json
+import sys
+
+# Django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# Project imports
+from product.importer import ProductImporter, read_rows
+from webapp.users.models import User
+
+
+class Command(BaseCommand):
+    help = "Import products for one owner from a CSV or NDJSON file, in validated batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username", help="Owner of the imported products")
+        parser.add_argument("path", help="CSV or NDJSON file, - for standard input")
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            help="Input format, guessed from the file extension by default")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows validated and written together")
+        parser.add_argument("--method", choices=["bulk_create", "copy"], default="bulk_create",
+                            help="How batches are written; copy needs PostgreSQL")
+        parser.add_argument("--report", help="NDJSON file for rejected rows and progress, <path>.report.ndjson "
+                                             "by default")
+        parser.add_argument("--database", default="default", help="Database alias to write to")
+
+    def handle(self, *args, **options):
+        owner_id = User.objects.using(options["database"]).filter(
+            username=options["username"]).values_list("id", flat=True).first()
+        if owner_id is None:
+            raise CommandError("User {} does not exist".format(options["username"]))
+
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.endswith(".csv") else "ndjson")
+        report_path = options["report"] or ("import.report.ndjson" if path == "-" else path + ".report.ndjson")
+        try:
+            importer = ProductImporter(owner_id, options["batch_size"], options["method"], using=options["database"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="") if path == "-" else \
+            open(path, encoding="utf-8", newline="")
+        with stream, open(report_path, "w") as report:
+            importer.report = report
+            summary = importer.run(read_rows(stream, fmt))
+        self.stdout.write(json.dumps(dict(summary, report=report_path)))
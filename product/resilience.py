@@ -0,0 +1,206 @@
+"""
+Timeouts, retries and circuit breaking for the S3 and SNS calls.
+
+Every call goes through ``call(service, operation, **params)``:
+
+* the clients use short socket timeouts (``AWS_CONNECT_TIMEOUT`` and ``AWS_READ_TIMEOUTS`` per
+  service, see ``aws.client_config``) with botocore's own retries turned off, and each operation
+  has a deadline (``AWS_DEADLINES``) that bounds the call and its retries together;
+* a failed call is retried at most ``AWS_MAX_ATTEMPTS - 1`` times, only if the retry can finish
+  before the deadline and only while the process wide retry budget allows it: every call earns
+  ``AWS_RETRY_BUDGET_RATIO`` of a retry, up to a reserve of ``AWS_RETRY_BUDGET_RESERVE``, so a
+  failing endpoint never sees more than a few percent of extra traffic;
+* each service has a circuit breaker. ``AWS_BREAKER_FAILURES`` failures in a row open it, and
+  while open calls fail at once with ``CircuitOpen``. After ``AWS_BREAKER_RESET`` seconds a single
+  probe call is let through (half-open); its outcome closes or reopens the breaker.
+
+Only failures that say something about the endpoint (timeouts, connection errors, throttling and
+5xx) count against the breaker or are retried; a missing key or a bad request does not.
+Breaker state is gauged in statsd as ``aws.<service>.circuit`` (0 closed, 1 half-open, 2 open)
+with ``aws.<service>.rejected``, ``aws.<service>.retry`` and ``aws.retry_budget_exhausted`` counters.
+"""
+# Python imports
+import math
+import random
+import threading
+import time
+
+# Django imports
+from django.conf import settings
+from statsd.defaults.django import statsd
+
+# Project imports
+from . import aws
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+# Error codes AWS answers with when the endpoint, not the request, is the problem
+RETRYABLE_CODES = {
+    "InternalError", "InternalFailure", "RequestTimeout", "RequestTimeoutException", "ServiceUnavailable",
+    "SlowDown", "Throttling", "ThrottlingException", "TooManyRequestsException",
+}
+
+
+class CircuitOpen(Exception):
+    """
+    Raised instead of calling a service whose breaker is open.
+    """
+
+    def __init__(self, service, retry_after):
+        super().__init__("{} is unavailable, retry in {} seconds".format(service, retry_after))
+        self.service = service
+        self.retry_after = retry_after
+
+
+def is_retryable(error):
+    """
+    True for failures of the endpoint rather than of the request.
+    """
+    # Only reached once a client exists, which has imported botocore already; importing it with
+    # this module would put it back on every worker's startup path
+    from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+
+    if isinstance(error, ClientError):
+        code = error.response.get("Error", {}).get("Code")
+        status_code = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+        return code in RETRYABLE_CODES or status_code >= 500
+    return isinstance(error, (ConnectionError, HTTPClientError))
+
+
+class CircuitBreaker:
+    """
+    Consecutive failure breaker with a single half-open probe.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raise ``CircuitOpen`` unless the call may go ahead. Moves an open breaker whose reset
+        timeout has passed to half-open and lets the caller be its probe.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == OPEN and remaining <= 0:
+                self._set_state(HALF_OPEN)
+                return
+        # Open, or half-open with the probe still in flight
+        statsd.incr("aws.{}.rejected".format(self.name))
+        raise CircuitOpen(self.name, max(math.ceil(remaining), 1))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        statsd.gauge("aws.{}.circuit".format(self.name), state)
+
+
+class RetryBudget:
+    """
+    Allows a retry for every ``1 / ratio`` calls, plus a reserve of ``reserve`` retries.
+    """
+
+    def __init__(self, ratio, reserve):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.balance + self.ratio, self.reserve)
+
+    def withdraw(self):
+        with self._lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+_breakers = {}
+_budget = None
+_lock = threading.Lock()
+
+
+def breaker(service):
+    with _lock:
+        if service not in _breakers:
+            _breakers[service] = CircuitBreaker(service, settings.AWS_BREAKER_FAILURES, settings.AWS_BREAKER_RESET)
+        return _breakers[service]
+
+
+def retry_budget():
+    global _budget
+    with _lock:
+        if _budget is None:
+            _budget = RetryBudget(settings.AWS_RETRY_BUDGET_RATIO, settings.AWS_RETRY_BUDGET_RESERVE)
+        return _budget
+
+
+def reset():
+    """
+    Forget every breaker and the retry budget. Called after fork and between tests.
+    """
+    global _budget
+    with _lock:
+        _breakers.clear()
+        _budget = None
+
+
+def call(service, operation, **params):
+    """
+    Call ``operation`` of the S3 or SNS client with deadlines, budgeted retries and the service's breaker.
+    """
+    circuit = breaker(service)
+    budget = retry_budget()
+    budget.deposit()
+    client = aws.get_client(service, **aws.client_kwargs(service))
+    deadline = time.monotonic() + settings.AWS_DEADLINES.get("{}.{}".format(service, operation),
+                                                             settings.AWS_DEADLINE)
+    attempt = 1
+    while True:
+        circuit.before_call()
+        try:
+            result = getattr(client, operation)(**params)
+        except Exception as e:
+            if not is_retryable(e):
+                # The endpoint answered, the request was at fault
+                circuit.record_success()
+                raise
+            circuit.record_failure()
+            # Full jitter backoff
+            backoff = random.uniform(0, settings.AWS_RETRY_BACKOFF * 2 ** (attempt - 1))
+            worst_case = backoff + settings.AWS_CONNECT_TIMEOUT + settings.AWS_READ_TIMEOUTS[service]
+            if attempt >= settings.AWS_MAX_ATTEMPTS or time.monotonic() + worst_case > deadline:
+                raise
+            if not budget.withdraw():
+                statsd.incr("aws.retry_budget_exhausted")
+                raise
+            statsd.incr("aws.{}.retry".format(service))
+            time.sleep(backoff)
+            attempt += 1
+        else:
+            circuit.record_success()
+            return result
@@ -1,3 +1,6 @@
+# Python imports
+from typing import Any, Dict
+
 # Rest framework imports
 from rest_framework import serializers
 
@@ -9,6 +12,8 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
+        # The views check SKU uniqueness through product.skus and the unique constraint
+        extra_kwargs: Dict[str, Dict[str, Any]] = {'sku': {'validators': []}}
 
 
 class ProductImageSerializer(serializers.ModelSerializer):
@@ -21,3 +26,5 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['name', 'description', 'sku', 'quantity', 'manufacturer']
+        # The views check SKU uniqueness through product.skus and the unique constraint
+        extra_kwargs: Dict[str, Dict[str, Any]] = {'sku': {'validators': []}}
@@ -0,0 +1,30 @@
+# Django imports
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# Project imports
+from .cache import invalidate_product
+from .models import Product
+from .skus import add_sku
+from webapp.cache import negative
+
+
+@receiver(post_save, sender=Product)
+def forget_missing_product(sender, instance, created, **kwargs):
+    if created:
+        negative.forget_missing(Product, instance.id)
+
+
+@receiver(post_save, sender=Product)
+def add_product_sku(sender, instance, **kwargs):
+    add_sku(instance.sku)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def drop_cached_product(sender, instance, **kwargs):
+    product_id = instance.id
+    # Once now, and again after commit in case a request cached the old row in between
+    invalidate_product(product_id)
+    transaction.on_commit(lambda: invalidate_product(product_id))
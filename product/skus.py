@@ -0,0 +1,84 @@
+"""
+A per-process Bloom filter of every product SKU, so the writes that must reject a duplicate SKU
+only query for it when it might exist.
+
+The filter is built from the table the first time it is needed and every saved product's SKU is
+added to it as the row is written (see ``product.signals``). A SKU the filter has never seen can
+still exist, written by another worker or directly in the database; that case is caught by the
+unique constraint, and the views turn the ``IntegrityError`` into the usual 400.
+"""
+# Python imports
+import logging
+import threading
+import time
+
+# Django imports
+from django.conf import settings
+from statsd.defaults.django import statsd
+
+# Project imports
+from .models import Product
+from webapp.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+_filter = None
+_lock = threading.Lock()
+
+
+def sku_filter():
+    """
+    The process wide filter, built from a streamed ``values_list`` on first use.
+    """
+    global _filter
+    if _filter is None:
+        with _lock:
+            if _filter is None:
+                started = time.monotonic()
+                bloom = BloomFilter(max(Product.objects.count() * 2, settings.SKU_FILTER_CAPACITY),
+                                    settings.SKU_FILTER_ERROR_RATE)
+                for sku in Product.objects.values_list("sku", flat=True).iterator(chunk_size=5000):
+                    bloom.add(sku)
+                logger.info("Built SKU filter with {} SKUs in {:.0f}ms".format(
+                    bloom.count, (time.monotonic() - started) * 1000))
+                _filter = bloom
+    return _filter
+
+
+def reset_sku_filter():
+    global _filter
+    with _lock:
+        _filter = None
+
+
+def add_sku(sku):
+    """
+    Add a SKU once a row carries it. Done as the row is written rather than on commit: a SKU
+    from a rolled back write only costs one extra query later, a missing one nothing at all.
+    """
+    if _filter is not None:
+        _filter.add(sku)
+
+
+def sku_taken(sku):
+    """
+    True when a product already has ``sku``. Queries the database only if the filter says it may.
+    """
+    if sku not in sku_filter():
+        statsd.incr("sku_filter.negative")
+        return False
+    statsd.incr("sku_filter.positive")
+    return Product.objects.filter(sku=sku).exists()
+
+
+def is_sku_conflict(error):
+    """
+    Whether an ``IntegrityError`` comes from the unique SKU constraint. PostgreSQL names the
+    violated constraint (``<table>_<column>_key`` for the ``UNIQUE`` created with the table), SQLite
+    only reports the column in a fixed message.
+    """
+    table, column = Product._meta.db_table, Product._meta.get_field("sku").column
+    diag = getattr(error.__cause__, "diag", None)
+    if diag is not None:
+        return diag.constraint_name == "{}_{}_key".format(table, column)
+    return str(error) == "UNIQUE constraint failed: {}.{}".format(table, column)
@@ -0,0 +1,93 @@
+"""
+In-process stand-ins for the S3 and SNS clients used by the views.
+
+Select them with ``DJANGO_AWS_CLIENT_FACTORY=product.standins.client`` (see ``product.aws``).
+``STANDIN_LATENCY`` (seconds) and ``STANDIN_ERROR_RATE`` (0..1) inject delay and failures into
+every call, which is what the load and fault-injection tests use to imitate a slow or degraded endpoint.
+A botocore ``config`` passed to the factory is honoured like a real client would: a call slower than
+its ``read_timeout`` gives up after that long with ``ReadTimeoutError``.
+"""
+# Python imports
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+from botocore.exceptions import ClientError, ReadTimeoutError
+
+
+class StandInClient:
+    """
+    Records every call and sleeps ``latency`` seconds before answering.
+    A fraction ``error_rate`` of calls fail with a ``ClientError`` like a throttled AWS endpoint.
+    """
+    service_name: Optional[str] = None
+
+    def __init__(self, latency=0.0, error_rate=0.0, config=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.read_timeout = config.read_timeout if config is not None else None
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _call(self, operation, **params):
+        with self._lock:
+            self.calls.append((operation, params))
+        if self.read_timeout is not None and self.latency > self.read_timeout:
+            time.sleep(self.read_timeout)
+            raise ReadTimeoutError(endpoint_url="standin://{}".format(self.service_name))
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise ClientError({"Error": {"Code": "ServiceUnavailable", "Message": "Injected failure"}}, operation)
+
+    def operations(self):
+        return [operation for operation, _ in self.calls]
+
+
+class StandInS3(StandInClient):
+    service_name = "s3"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call("put_object", Bucket=Bucket, Key=Key)
+        self.objects[(Bucket, Key)] = Body
+        return {"ETag": '"{}"'.format(hash(Body))}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call("delete_object", Bucket=Bucket, Key=Key)
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call("delete_objects", Bucket=Bucket, Delete=Delete)
+        for obj in Delete["Objects"]:
+            self.objects.pop((Bucket, obj["Key"]), None)
+        return {"Deleted": Delete["Objects"]}
+
+
+class StandInSNS(StandInClient):
+    service_name = "sns"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = []
+
+    def publish(self, TopicArn, Message, **kwargs):
+        self._call("publish", TopicArn=TopicArn)
+        self.messages.append(Message)
+        return {"MessageId": str(len(self.messages))}
+
+
+def client(service_name, **kwargs):
+    """
+    Client factory for ``AWS_CLIENT_FACTORY``, configured from the environment.
+    """
+    latency = float(os.environ.get("STANDIN_LATENCY", 0))
+    error_rate = float(os.environ.get("STANDIN_ERROR_RATE", 0))
+    classes = {"s3": StandInS3, "sns": StandInSNS}
+    return classes[service_name](latency=latency, error_rate=error_rate, config=kwargs.get("config"))
@@ -1,3 +1,604 @@
-from django.test import TestCase
+# Python imports
+import base64
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import warnings
+from typing import TYPE_CHECKING, Any, Dict, List, Tuple
+from unittest import mock
 
-# Create your tests here.
+from botocore.exceptions import ClientError, ReadTimeoutError
+from PIL import Image
+
+# Django imports
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.client import AsyncRequestFactory, encode_multipart
+from django.urls import reverse
+
+# Project imports
+from product import aws, dataset, resilience, skus
+from product.cache import cached_list, get_product_data, product_key
+from product.importer import validate_batch
+from product.async_views import image_create_view, image_get_view, product_get_view
+from product.models import Product, ProductImage
+from product.standins import StandInClient
+from webapp.db import routers
+from webapp.db.routers import ReplicaRouter
+from webapp.users.models import User
+from webapp.utils.idempotency import IN_PROGRESS, idempotency_key, idempotent
+
+warnings.filterwarnings("ignore")
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "product-tests"}
+
+
+def png_file(name="image.png"):
+    stream = io.BytesIO()
+    Image.new("RGB", (2, 2)).save(stream, "PNG")
+    return SimpleUploadedFile(name, stream.getvalue(), content_type="image/png")
+
+
+def asgi_request(method, path, **kwargs):
+    """
+    Build an ASGI request. Django 4.0's FakePayload refuses the chunked reads the multipart
+    parser makes, so the body is buffered like ASGIHandler does with a real request.
+    """
+    request = getattr(AsyncRequestFactory(), method)(path, **kwargs)
+    request._stream = io.BytesIO(request._stream.read())
+    return request
+
+
+if TYPE_CHECKING:
+    _Base = TestCase
+else:
+    _Base = object
+
+
+class StandInTestMixin(_Base):
+    """
+    Points the S3/SNS clients at the in-process stand-ins from product.standins.
+    """
+    auth: Dict[str, Any]
+    async_auth: Dict[str, Any]
+
+    def setUp(self):
+        super().setUp()
+        aws.reset_clients()
+        self.addCleanup(aws.reset_clients)
+        resilience.reset()
+        self.addCleanup(resilience.reset)
+        standins = override_settings(AWS_CLIENT_FACTORY="product.standins.client")
+        standins.enable()
+        self.addCleanup(standins.disable)
+        environment = mock.patch.dict(os.environ, {"S3_BUCKET": "test", "SNS_TOPIC_ARN": "test"})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                              first_name="owner", last_name="user")
+        self.product = Product.objects.create(owner_user=self.owner, name="name", description="description",
+                                              sku="sku-1", manufacturer="manufacturer", quantity=1)
+        token = base64.b64encode(b"owner@example.com:testpassword").decode()
+        self.auth = {"HTTP_AUTHORIZATION": "Basic {}".format(token)}
+        self.async_auth = {"authorization": "Basic {}".format(token)}
+
+
+class AsyncProductViewsTestCase(StandInTestMixin, TestCase):
+    async def test_create_image_uploads_and_notifies(self):
+        request = asgi_request("post", reverse("product:image_create", kwargs={"id": self.product.id}),
+                               data={"image": png_file()}, **self.async_auth)
+        response = await image_create_view(request, id=self.product.id)
+
+        self.assertEqual(response.status_code, 201)
+        image = await sync_to_async(ProductImage.objects.get)()
+        self.assertEqual(list(aws.s3_client().objects),
+                         [("test", "{}/{}/image.png".format(self.product.id, image.image_id))])
+        self.assertEqual(aws.sns_client().operations(), ["publish"])
+
+    async def test_failed_upload_leaves_no_image_row(self):
+        aws.s3_client().error_rate = 1
+        request = asgi_request("post", reverse("product:image_create", kwargs={"id": self.product.id}),
+                               data={"image": png_file()}, **self.async_auth)
+        response = await image_create_view(request, id=self.product.id)
+
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(await sync_to_async(ProductImage.objects.exists)())
+        self.assertEqual(aws.sns_client().operations(), ["publish"])
+
+    async def test_create_image_requires_credentials(self):
+        request = asgi_request("post", reverse("product:image_create", kwargs={"id": self.product.id}),
+                               data={"image": png_file()})
+        response = await image_create_view(request, id=self.product.id)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(aws.s3_client().calls, [])
+
+    async def test_delete_image_and_product(self):
+        create_image = sync_to_async(ProductImage.objects.create)
+        image = await create_image(product=self.product, file_name="a.png", s3_bucket_path="a")
+        response = await image_get_view(asgi_request("delete", "/", **self.async_auth), id=self.product.id,
+                                        image_id=image.image_id)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await sync_to_async(ProductImage.objects.exists)())
+
+        await create_image(product=self.product, file_name="b.png", s3_bucket_path="b")
+        response = await product_get_view(asgi_request("delete", "/", **self.async_auth), id=self.product.id)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(await sync_to_async(Product.objects.exists)())
+        self.assertEqual(aws.s3_client().operations(), ["delete_object", "delete_objects"])
+
+    async def test_other_methods_use_sync_view(self):
+        response = await product_get_view(asgi_request("get", "/"), id=self.product.id)
+        self.assertEqual(response.status_code, 200)
+
+
+class TransactionScopeTestCase(StandInTestMixin, TransactionTestCase):
+    """
+    Runs the synchronous views against a real transaction manager, recording whether a
+    transaction was open at every S3/SNS call.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.calls: List[Tuple[str, bool]] = []
+        call = StandInClient._call
+
+        def record(client, operation, **params):
+            self.calls.append((operation, connection.in_atomic_block))
+            return call(client, operation, **params)
+
+        patcher = mock.patch.object(StandInClient, "_call", record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_no_network_call_inside_transaction(self):
+        response = self.client.post(reverse("product:image_create", kwargs={"id": self.product.id}),
+                                    data={"image": png_file()}, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        image = ProductImage.objects.get()
+
+        response = self.client.delete(reverse("product:image_get", kwargs={"id": self.product.id,
+                                                                           "image_id": image.image_id}), **self.auth)
+        self.assertEqual(response.status_code, 204)
+
+        ProductImage.objects.create(product=self.product, file_name="b.png", s3_bucket_path="b")
+        response = self.client.delete(reverse("product:product_get", kwargs={"id": self.product.id}), **self.auth)
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual([operation for operation, _ in self.calls],
+                         ["put_object", "publish", "delete_object", "publish", "delete_objects"])
+        self.assertEqual([operation for operation, in_transaction in self.calls if in_transaction], [])
+
+    def test_product_delete_rolled_back_keeps_images(self):
+        ProductImage.objects.create(product=self.product, file_name="b.png", s3_bucket_path="b")
+        with mock.patch.object(Product, "delete", side_effect=RuntimeError("database unavailable")):
+            response = self.client.delete(reverse("product:product_get", kwargs={"id": self.product.id}),
+                                          **self.auth)
+
+        self.assertEqual(response.status_code, 408)
+        self.assertEqual(self.calls, [])
+
+
+@override_settings(CACHES={"default": LOCMEM, "shared": LOCMEM})
+class ProductCacheTestCase(StandInTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+
+    def test_get_is_served_from_cache_until_product_changes(self):
+        url = reverse("product:product_get", kwargs={"id": self.product.id})
+        self.assertEqual(self.client.get(url, **self.auth).json()["quantity"], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, **self.auth).json()["quantity"], 1)
+
+        response = self.client.patch(url, data={"quantity": 2}, content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(url, **self.auth).json()["quantity"], 2)
+
+        self.client.delete(url, **self.auth)
+        self.assertEqual(self.client.get(url, **self.auth).status_code, 404)
+
+    def test_image_list_is_cached_until_owner_images_change(self):
+        url = reverse("product:image_create", kwargs={"id": self.product.id})
+        self.assertEqual(self.client.get(url, **self.auth).json(), [])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, **self.auth).json(), [])
+
+        response = self.client.post(url, data={"image": png_file()}, **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([image["file_name"] for image in self.client.get(url, **self.auth).json()], ["image.png"])
+
+        image_id = ProductImage.objects.get().image_id
+        self.client.delete(reverse("product:image_get", kwargs={"id": self.product.id, "image_id": image_id}),
+                           **self.auth)
+        self.assertEqual(self.client.get(url, **self.auth).json(), [])
+
+    @override_settings(DATABASE_REPLICAS=["lagging"])
+    def test_cache_is_filled_from_the_primary(self):
+        # A replica view sends its reads to "lagging"; a fill read there would fail, not just be stale
+        with mock.patch.object(routers, "healthy_replicas", return_value=["lagging"]), routers.replica_reads():
+            self.assertEqual(ReplicaRouter().db_for_read(Product), "lagging")
+            self.assertEqual(get_product_data(self.product.id)["quantity"], 1)
+            images = cached_list(self.owner.id, ProductImage, "all", lambda: list(ProductImage.objects.values()))
+        self.assertEqual(images, [])
+        self.assertEqual(caches["shared"].get(product_key(self.product.id))[0]["quantity"], 1)
+
+
+class SkuFilterTestCase(StandInTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        skus.reset_sku_filter()
+        self.addCleanup(skus.reset_sku_filter)
+
+    def create(self, sku):
+        return self.client.post(reverse("product:product_create"), **self.auth, content_type="application/json",
+                                data={"name": "name", "description": "description", "sku": sku,
+                                      "manufacturer": "manufacturer", "quantity": 1})
+
+    def test_new_sku_skips_the_uniqueness_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create("sku-2")
+        self.assertEqual(response.status_code, 201)
+        probes = [query["sql"] for query in queries if query["sql"].startswith("SELECT 1") and "sku" in query["sql"]]
+        self.assertEqual(probes, [])
+        self.assertTrue(skus.sku_taken("sku-2"))
+
+    def test_known_sku_is_rejected(self):
+        response = self.create("sku-1")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Product.objects.filter(sku="sku-1").count(), 1)
+
+    def test_sku_missing_from_filter_is_caught_by_constraint(self):
+        skus.sku_filter()
+        # bulk_create sends no post_save, like a row written by another worker
+        Product.objects.bulk_create([Product(owner_user=self.owner, name="name", description="description",
+                                             sku="sku-3", manufacturer="manufacturer", quantity=1)])
+        self.assertFalse("sku-3" in skus.sku_filter())
+        response = self.create("sku-3")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Product.objects.filter(sku="sku-3").count(), 1)
+
+    def test_only_the_unique_constraint_is_a_sku_conflict(self):
+        fields: Dict[str, Any] = {"owner_user": self.owner, "name": "name", "description": "description",
+                                  "manufacturer": "manufacturer", "quantity": 1}
+        with self.assertRaises(IntegrityError) as duplicate, transaction.atomic():
+            Product.objects.create(sku="sku-1", **fields)
+        self.assertTrue(skus.is_sku_conflict(duplicate.exception))
+        # Mentions the sku column, but is not the unique constraint
+        with self.assertRaises(IntegrityError) as missing, transaction.atomic():
+            Product.objects.create(**dict(fields, sku=None))
+        self.assertFalse(skus.is_sku_conflict(missing.exception))
+
+
+class CircuitBreakerTestCase(TestCase):
+    def test_half_open_lets_one_probe_through(self):
+        now = [0.0]
+        breaker = resilience.CircuitBreaker("s3", failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        with self.assertRaises(resilience.CircuitOpen) as raised:
+            breaker.before_call()
+        self.assertEqual(raised.exception.retry_after, 10)
+
+        now[0] = 11
+        breaker.before_call()
+        self.assertEqual(breaker.state, resilience.HALF_OPEN)
+        with self.assertRaises(resilience.CircuitOpen):
+            breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, resilience.OPEN)
+
+        now[0] = 22
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, resilience.CLOSED)
+
+    def test_retry_budget_refills_with_calls(self):
+        budget = resilience.RetryBudget(ratio=0.5, reserve=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+
+@override_settings(AWS_MAX_ATTEMPTS=1, AWS_BREAKER_FAILURES=2, AWS_BREAKER_RESET=30)
+class FaultInjectionTestCase(StandInTestMixin, TestCase):
+    """
+    Degrades the S3 stand-in and checks what the views and the resilience layer make of it.
+    """
+
+    def upload(self):
+        return self.client.post(reverse("product:image_create", kwargs={"id": self.product.id}),
+                                data={"image": png_file()}, **self.auth)
+
+    def test_open_breaker_fails_fast_with_503(self):
+        aws.s3_client().error_rate = 1
+        self.assertEqual(self.upload().status_code, 502)
+        self.assertEqual(self.upload().status_code, 502)
+        self.assertEqual(len(aws.s3_client().calls), 2)
+
+        response = self.upload()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(len(aws.s3_client().calls), 2)
+        # Neither the failed uploads nor the refused one left a row behind
+        self.assertFalse(ProductImage.objects.exists())
+        self.assertEqual(self.client.get(reverse("product:image_create", kwargs={"id": self.product.id}),
+                                         **self.auth).json(), [])
+
+    @override_settings(AWS_READ_TIMEOUTS={"s3": 0.05, "sns": 0.05})
+    def test_slow_endpoint_is_cut_off_at_read_timeout(self):
+        aws.s3_client().latency = 5
+        started = time.monotonic()
+        with self.assertRaises(ReadTimeoutError):
+            resilience.call("s3", "put_object", Body=b"", Bucket="test", Key="key")
+        self.assertLess(time.monotonic() - started, 1)
+
+    @override_settings(AWS_MAX_ATTEMPTS=3, AWS_RETRY_BACKOFF=0, AWS_BREAKER_FAILURES=10)
+    def test_failures_are_retried_within_budget(self):
+        aws.s3_client().error_rate = 1
+        with self.assertRaises(ClientError):
+            resilience.call("s3", "delete_object", Bucket="test", Key="key")
+        self.assertEqual(len(aws.s3_client().calls), 3)
+
+        resilience.retry_budget().balance = 0
+        with self.assertRaises(ClientError):
+            resilience.call("s3", "delete_object", Bucket="test", Key="key")
+        self.assertEqual(len(aws.s3_client().calls), 4)
+
+    @override_settings(AWS_MAX_ATTEMPTS=3)
+    def test_request_errors_are_not_retried(self):
+        error = ClientError({"Error": {"Code": "NoSuchKey"}, "ResponseMetadata": {"HTTPStatusCode": 404}},
+                            "delete_object")
+        with mock.patch.object(aws.s3_client(), "delete_object", side_effect=error) as delete_object:
+            for _ in range(3):
+                with self.assertRaises(ClientError):
+                    resilience.call("s3", "delete_object", Bucket="test", Key="key")
+        self.assertEqual(delete_object.call_count, 3)
+        self.assertEqual(resilience.breaker("s3").state, resilience.CLOSED)
+
+
+@override_settings(CACHES={"default": LOCMEM, "shared": LOCMEM})
+class IdempotencyTestCase(StandInTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+
+    def create(self, key, sku="sku-2"):
+        return self.client.post(reverse("product:product_create"), content_type="application/json",
+                                HTTP_IDEMPOTENCY_KEY=key, **self.auth,
+                                data={"name": "name", "description": "description", "sku": sku,
+                                      "manufacturer": "manufacturer", "quantity": 1})
+
+    def test_retried_create_replays_the_first_response(self):
+        first = self.create("key-1")
+        retry = self.create("key-1")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Product.objects.filter(sku="sku-2").count(), 1)
+
+        # A new key is a new request
+        self.assertEqual(self.create("key-2").status_code, 400)
+
+    def test_retried_upload_does_not_reach_s3_again(self):
+        url = reverse("product:image_create", kwargs={"id": self.product.id})
+        for _ in range(2):
+            response = self.client.post(url, data={"image": png_file()}, HTTP_IDEMPOTENCY_KEY="key-1", **self.auth)
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(aws.s3_client().operations(), ["put_object"])
+        self.assertEqual(ProductImage.objects.count(), 1)
+
+    def test_key_reused_for_another_payload_gets_422(self):
+        self.assertEqual(self.create("key-1", "sku-2").status_code, 201)
+        response = self.create("key-1", "sku-3")
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Product.objects.filter(sku="sku-3").exists())
+
+    def test_retried_upload_with_a_new_multipart_boundary_is_replayed(self):
+        url = reverse("product:image_create", kwargs={"id": self.product.id})
+        for boundary in ("first-attempt", "second-attempt"):
+            body = encode_multipart(boundary, {"image": png_file()})
+            content_type = "multipart/form-data; boundary={}".format(boundary)
+            response = self.client.post(url, data=body, content_type=content_type, HTTP_IDEMPOTENCY_KEY="key-1",
+                                        **self.auth)
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(aws.s3_client().operations(), ["put_object"])
+
+    @override_settings(AWS_MAX_ATTEMPTS=1)
+    def test_failed_upload_is_not_replayed(self):
+        url = reverse("product:image_create", kwargs={"id": self.product.id})
+        aws.s3_client().error_rate = 1
+        response = self.client.post(url, data={"image": png_file()}, HTTP_IDEMPOTENCY_KEY="key-1", **self.auth)
+        self.assertEqual(response.status_code, 502)
+
+        aws.s3_client().error_rate = 0
+        response = self.client.post(url, data={"image": png_file()}, HTTP_IDEMPOTENCY_KEY="key-1", **self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(ProductImage.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT=0.1)
+    def test_duplicate_of_request_in_progress_gets_409(self):
+        request = RequestFactory().post(reverse("product:product_create"), HTTP_IDEMPOTENCY_KEY="key-1", **self.auth)
+        caches["default"].add(idempotency_key(request), IN_PROGRESS)
+
+        response = self.create("key-1")
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Product.objects.filter(sku="sku-2").exists())
+
+    def test_unavailable_cache_runs_the_view_without_idempotency(self):
+        # django_redis with IGNORE_EXCEPTIONS answers None during an outage, other backends raise
+        outcomes: Tuple[Dict[str, Any], ...] = (
+            {"return_value": None}, {"side_effect": ConnectionError("Redis is down")})
+        for sku, outcome in zip(("sku-2", "sku-3"), outcomes):
+            with mock.patch.object(caches["default"], "add", **outcome), \
+                    self.assertLogs("webapp.utils.idempotency", "WARNING"):
+                started = time.monotonic()
+                self.assertEqual(self.create("key-1", sku).status_code, 201)
+            self.assertLess(time.monotonic() - started, settings.IDEMPOTENCY_WAIT)
+        self.assertEqual(Product.objects.filter(sku__in=["sku-2", "sku-3"]).count(), 2)
+
+    async def test_async_upload_is_idempotent(self):
+        view = idempotent(image_create_view)
+        for _ in range(2):
+            request = asgi_request("post", reverse("product:image_create", kwargs={"id": self.product.id}),
+                                   data={"image": png_file()}, **self.async_auth, **{"idempotency-key": "key-1"})
+            response = await view(request, id=self.product.id)
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(aws.s3_client().operations(), ["put_object"])
+
+    async def test_async_upload_runs_without_idempotency_when_cache_is_unavailable(self):
+        view = idempotent(image_create_view)
+        with mock.patch.object(caches["default"], "aadd", return_value=None):
+            for _ in range(2):
+                request = asgi_request("post", reverse("product:image_create", kwargs={"id": self.product.id}),
+                                       data={"image": png_file()}, **self.async_auth, **{"idempotency-key": "key-1"})
+                response = await view(request, id=self.product.id)
+                self.assertEqual(response.status_code, 201)
+        self.assertEqual(aws.s3_client().operations(), ["put_object", "put_object"])
+
+
+class ProductExportTestCase(StandInTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.second = Product.objects.create(owner_user=self.owner, name="second", description="description",
+                                             sku="sku-2", manufacturer="manufacturer", quantity=2)
+        other = User.objects.create_user(username="other@example.com", password="testpassword",
+                                         first_name="other", last_name="user")
+        Product.objects.create(owner_user=other, name="other", description="description", sku="sku-3",
+                               manufacturer="manufacturer", quantity=3)
+        for product, name in [(self.product, "a.png"), (self.second, "b.png"), (self.product, "c.png")]:
+            ProductImage.objects.create(product=product, file_name=name)
+
+    def assertCatalog(self, content):
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([line["sku"] for line in lines], ["sku-1", "sku-2"])
+        self.assertEqual([[image["file_name"] for image in line["images"]] for line in lines],
+                         [["a.png", "c.png"], ["b.png"]])
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(reverse("product:product_export"), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertCatalog(response.getvalue())
+
+    def test_export_is_gzipped_when_accepted(self):
+        response = self.client.get(reverse("product:product_export"), HTTP_ACCEPT_ENCODING="gzip, br", **self.auth)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertCatalog(gzip.decompress(response.getvalue()))
+
+    def test_export_requires_credentials(self):
+        self.assertEqual(self.client.get(reverse("product:product_export")).status_code, 401)
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "products.ndjson.gz")
+            call_command("export_products", "owner@example.com", "--gzip", "--chunk-size", "1", "--output", path)
+            with gzip.open(path) as export:
+                self.assertCatalog(export.read())
+
+
+class ImportProductsTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                              first_name="owner", last_name="user")
+        Product.objects.create(owner_user=self.owner, name="name", description="description", sku="taken",
+                               manufacturer="manufacturer", quantity=1)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def row(self, sku, **overrides):
+        return dict({"name": "name", "description": "description", "sku": sku, "manufacturer": "manufacturer",
+                     "quantity": 1}, **overrides)
+
+    def run_import(self, name, content, *args):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as output:
+            output.write(content)
+        stdout = io.StringIO()
+        call_command("import_products", "owner@example.com", path, *args, stdout=stdout)
+        with open(path + ".report.ndjson") as report:
+            entries = [json.loads(line) for line in report]
+        return json.loads(stdout.getvalue()), [entry for entry in entries if entry["type"] == "reject"]
+
+    def test_batch_is_validated_column_by_column(self):
+        rows = [self.row("a"), self.row("b", quantity="7"), self.row("c", quantity=101), self.row("d", quantity=True),
+                self.row("x" * 21), self.row("e", name=""), self.row("a"), self.row("taken"), None]
+        errors = validate_batch(rows, {"taken"})
+        self.assertEqual([sorted(row_errors) for row_errors in errors],
+                         [[], [], ["quantity"], ["quantity"], ["sku"], ["name"], ["sku"], ["sku"], ["row"]])
+        self.assertEqual(rows[1]["quantity"], 7)
+
+    def test_ndjson_import_reports_rejects(self):
+        lines = [json.dumps(self.row("sku-{}".format(i))) for i in range(5)]
+        lines += [json.dumps(self.row("sku-0")), json.dumps(self.row("taken")), "{not json",
+                  json.dumps(self.row("sku-9", quantity=-1))]
+        summary, rejects = self.run_import("products.ndjson", "\n".join(lines), "--batch-size", "2")
+
+        self.assertEqual((summary["read"], summary["imported"], summary["rejected"]), (9, 5, 4))
+        self.assertEqual([reject["line"] for reject in rejects], [6, 7, 8, 9])
+        self.assertEqual(Product.objects.filter(owner_user=self.owner).count(), 6)
+
+    def test_csv_import(self):
+        content = "name,description,sku,manufacturer,quantity\nname,description,sku-1,manufacturer,5\n" \
+                  "name,description,sku-2,manufacturer,500\n"
+        summary, rejects = self.run_import("products.csv", content)
+        self.assertEqual((summary["imported"], summary["rejected"]), (1, 1))
+        self.assertEqual(rejects[0]["errors"], {"quantity": "Ensure this value is between 0 and 100."})
+        self.assertEqual(Product.objects.get(sku="sku-1").quantity, 5)
+
+    def test_copy_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            self.run_import("products.csv", "", "--method", "copy")
+
+
+class GenerateDatasetTestCase(TestCase):
+    def generate(self, *args):
+        call_command("generate_dataset", "--users", "20", "--products", "400", "--images", "200", *args,
+                     stdout=io.StringIO())
+
+    def test_rows_depend_only_on_seed(self):
+        plan = dataset.plan_dataset(20, 400, 200, 7, "hash")
+        whole = list(dataset.product_rows(plan, 0, 400))
+        self.assertEqual(list(dataset.product_rows(plan, 0, 400)), whole)
+        self.assertNotEqual(list(dataset.product_rows(dict(plan, seed=8), 0, 400)), whole)
+
+        self.generate("--seed", "7", "--chunk-size", "400")
+        first = list(Product.objects.order_by("id").values_list("owner_user__username", "name", "sku"))
+        Product.objects.all().delete()
+        User.objects.all().delete()
+        self.generate("--seed", "7", "--chunk-size", "400", "--workers", "4")
+        self.assertEqual(list(Product.objects.order_by("id").values_list("owner_user__username", "name", "sku")),
+                         first)
+
+    def test_dataset_is_skewed_and_shares_one_password(self):
+        self.generate("--seed", "1", "--password", "shared-secret", "--chunk-size", "64")
+        self.assertEqual((User.objects.count(), Product.objects.count(), ProductImage.objects.count()),
+                         (20, 400, 200))
+        per_owner = sorted(Product.objects.values("owner_user").annotate(n=Count("id")).values_list("n", flat=True),
+                           reverse=True)
+        # A quarter of the owners hold well over half the products
+        self.assertGreater(sum(per_owner[:5]), 240)
+        self.assertEqual(User.objects.values("password").distinct().count(), 1)
+        self.assertTrue(User.objects.order_by("?")[0].check_password("shared-secret"))
+        # Sequences moved past the explicit ids
+        Product.objects.create(owner_user=User.objects.all()[0], name="name", description="description",
+                               sku="after", manufacturer="manufacturer", quantity=1)
+
+    def test_copy_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            self.generate("--method", "copy")
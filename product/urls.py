@@ -1,17 +1,29 @@
 # Django imports
+from django.conf import settings
 from django.urls import path
 
 from product.views import (
     ProductCreateView,
+    ProductExportView,
     ProductGetView,
     ProductImageGetPostView,
     ProductImageGetDeleteView
 )
+from webapp.utils.idempotency import idempotent
+
+if settings.ASYNC_VIEWS:
+    # Under ASGI the S3/SNS bound methods are served by coroutines, see product.async_views
+    from product.async_views import image_create_view, image_get_view, product_get_view
+else:
+    product_get_view = ProductGetView.as_view()
+    image_create_view = ProductImageGetPostView.as_view()
+    image_get_view = ProductImageGetDeleteView.as_view()
 
 app_name = "product"
 urlpatterns = [
-    path("", view=ProductCreateView.as_view(), name="product_create"),
-    path("<int:id>", view=ProductGetView.as_view(), name="product_get"),
-    path("<int:id>/image", view=ProductImageGetPostView.as_view(), name="image_create"),
-    path("<int:id>/image/<int:image_id>", view=ProductImageGetDeleteView.as_view(), name="image_get"),
+    path("", view=idempotent(ProductCreateView.as_view()), name="product_create"),
+    path("export", view=ProductExportView.as_view(), name="product_export"),
+    path("<int:id>", view=product_get_view, name="product_get"),
+    path("<int:id>/image", view=idempotent(image_create_view), name="image_create"),
+    path("<int:id>/image/<int:image_id>", view=image_get_view, name="image_get"),
 ]
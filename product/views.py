@@ -1,23 +1,29 @@
 # Python imports
-from PIL import Image
-import boto3
-import environ
 import json
 import logging
 import os
 
 # Django imports
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from statsd.defaults.django import statsd
 
 # Rest framework imports
 from rest_framework import generics, status
-from rest_framework.authentication import BasicAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
 # Project imports
+from . import aws, resilience
+from .cache import bump_generations, cached_list, get_product_data
+from .export import buffered, export_lines, gzip_chunks
 from .models import Product, ProductImage
+from .resilience import CircuitOpen
 from .serializers import ProductSerializer, ProductUpdateSerializer, ProductImageSerializer
+from .skus import is_sku_conflict, sku_taken
+from webapp.users.authentication import CachedBasicAuthentication
 from webapp.users.utils import response
 
 logger = logging.getLogger(__name__)
@@ -25,11 +31,11 @@ logger = logging.getLogger(__name__)
 class ProductCreateView(generics.CreateAPIView):
     """
     View for creating a new Product.
-    Uses BasicAuthentication for authentication and
+    Uses CachedBasicAuthentication for authentication and
     requires the user to be authenticated.
     Uses ProductSerializer for serializing and validating data.
     """
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [CachedBasicAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ProductSerializer
 
@@ -40,8 +46,8 @@ class ProductCreateView(generics.CreateAPIView):
         """
         try:
             statsd.incr("product_create")
-            # Check if product with the same SKU already exists
-            if Product.objects.filter(sku=request.data.get("sku")).exists():
+            # Check if product with the same SKU already exists, the SKU filter skips the query for new SKUs
+            if sku_taken(request.data.get("sku")):
                 return response(False, "Product with this SKU {} already exist".format(request.data.get("sku")), status.HTTP_400_BAD_REQUEST)
 
             if type(request.data.get("quantity")) is str:
@@ -55,8 +61,15 @@ class ProductCreateView(generics.CreateAPIView):
 
             if product.is_valid():
                 # Save the product in database in an atomic transaction
-                with transaction.atomic():
-                    product.save()
+                try:
+                    with transaction.atomic():
+                        product.save()
+                        bump_generations(request.user.id, Product)
+                except IntegrityError as e:
+                    # A SKU the filter did not know about, rejected by the unique constraint
+                    if not is_sku_conflict(e):
+                        raise
+                    return response(False, "Product with this SKU {} already exist".format(request.data.get("sku")), status.HTTP_400_BAD_REQUEST)
                 # Return success response with product data
                 return response(True, "Product Created Successfully", status.HTTP_201_CREATED, product.data, log_level="info")
             else:
@@ -70,12 +83,12 @@ class ProductCreateView(generics.CreateAPIView):
 class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
     """
     View for retrieving, updating or deleting a Product.
-    Uses BasicAuthentication for authentication and
+    Uses CachedBasicAuthentication for authentication and
     requires the user to be authenticated.
     Uses ProductUpdateSerializer for updating a Product.
     """
     http_method_names = ['get', 'patch', 'delete', 'put']
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [CachedBasicAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ProductUpdateSerializer
 
@@ -100,13 +113,11 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
         """
         try:
             statsd.incr("product_get")
-            # Check if the requested Product exists in the database
-            if not Product.objects.filter(id=kwargs['id']).exists():
+            # Retrieve the Product data from the cache or the database
+            product_data = get_product_data(kwargs['id'])
+            if product_data is None:
                 return response(False, "Product {} does not exist".format(kwargs['id']), status.HTTP_404_NOT_FOUND)
 
-            # Retrieve the Product data from the database
-            product_data = Product.objects.filter(id=kwargs['id']).values().first()
-
             # Return a success response with the Product data
             return response(True, "Product data fetched successfully", status.HTTP_200_OK, data=product_data, log_level="info")
         except Exception as e:
@@ -146,7 +157,7 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
             # Check if the SKU of the Product exists in the request data, and it is different from the current SKU
             # and a Product with the new SKU already exists in the database
             if request.data.get("sku", False) and \
-                    request.data['sku'] != product.sku and Product.objects.filter(sku=request.data['sku']).exists():
+                    request.data['sku'] != product.sku and sku_taken(request.data['sku']):
                 return response(False, "Product with this SKU {} already exists".format(request.data['sku']), status.HTTP_400_BAD_REQUEST)
 
             # Get the serializer with the current product instance and request data
@@ -155,8 +166,15 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
             # Validate the serializer data
             if serializer.is_valid():
                 # Save the changes in the database using transaction
-                with transaction.atomic():
-                    serializer.save()
+                try:
+                    with transaction.atomic():
+                        serializer.save()
+                        bump_generations(product.owner_user_id, Product)
+                except IntegrityError as e:
+                    # A SKU the filter did not know about, rejected by the unique constraint
+                    if not is_sku_conflict(e):
+                        raise
+                    return response(False, "Product with this SKU {} already exists".format(request.data['sku']), status.HTTP_400_BAD_REQUEST)
                 return response(True, "Product data updated successfully", status.HTTP_204_NO_CONTENT, show_data=True, log_level="info")
             else:
                 return response(False, serializer.errors, status.HTTP_400_BAD_REQUEST)
@@ -197,7 +215,7 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
             # Check if the SKU of the Product exists in the request data and it is different from the current SKU
             # and a Product with the new SKU already exists in the database
             if request.data.get("sku", False) and \
-                    request.data['sku'] != product.sku and Product.objects.filter(sku=request.data['sku']).exists():
+                    request.data['sku'] != product.sku and sku_taken(request.data['sku']):
                 return response(False, "Product with this SKU {} already exists".format(request.data['sku']), status.HTTP_400_BAD_REQUEST)
 
             # Get the serializer with the current product instance and request data
@@ -207,8 +225,15 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
             if serializer.is_valid():
                 # Save the changes in the database using transaction
                 logger.info("Updating Product Data")
-                with transaction.atomic():
-                    serializer.save()
+                try:
+                    with transaction.atomic():
+                        serializer.save()
+                        bump_generations(product.owner_user_id, Product)
+                except IntegrityError as e:
+                    # A SKU the filter did not know about, rejected by the unique constraint
+                    if not is_sku_conflict(e):
+                        raise
+                    return response(False, "Product with this SKU {} already exists".format(request.data['sku']), status.HTTP_400_BAD_REQUEST)
                 return response(True, "Product data updated successfully", status.HTTP_204_NO_CONTENT, show_data=True, log_level="info")
             else:
                 return response(False, serializer.errors, status.HTTP_400_BAD_REQUEST)
@@ -243,24 +268,12 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
             # Extract the object keys
             keys = [obj['s3_bucket_path'] for obj in ProductImage.objects.filter(product=product).values("s3_bucket_path")]
 
-            # Delete the objects in batches of up to 1000
-            batches = [keys[i:i+1000] for i in range(0, len(keys), 1000)]
-            use_profile = environ.Env().bool("USE_PROFILE", default=False)
-
-            
-            try:
-                s3 = boto3.Session(profile_name='dev').client('s3') if use_profile else boto3.client("s3")
-                logger.error("Deleting all images from s3 realted to the image")
-                for batch in batches:
-                    delete_params = {'Bucket': environ.Env().str("S3_BUCKET"), 'Delete': {'Objects': [{'Key': obj_key} for obj_key in batch]}}
-                    s3.delete_objects(**delete_params)
-            except Exception as e:
-                logger.error("Couldn't delete Images from S3, deleteing product only : {}".format(str(e)))
-
-
-            # Delete the Product from the database
+            # Delete the Product from the database, the images go from S3 once that has committed
             logger.info("Deleting product")
-            product.delete()
+            with transaction.atomic():
+                product.delete()
+                bump_generations(product.owner_user_id, Product, ProductImage)
+                transaction.on_commit(lambda: delete_product_images(keys))
 
             # Return success message and relevant HTTP status code
             return response(True, "Product deleted successfully", status.HTTP_204_NO_CONTENT, show_data=True, log_level="info")
@@ -272,12 +285,12 @@ class ProductGetView(generics.RetrieveUpdateDestroyAPIView):
 class ProductImageGetDeleteView(generics.RetrieveDestroyAPIView):
     """
     View for retrieving and deleting a Product's Image.
-    Uses BasicAuthentication for authentication and
+    Uses CachedBasicAuthentication for authentication and
     requires the user to be authenticated.
     Uses ProductUpdateSerializer for updating a Product.
     """
     http_method_names = ['get', 'delete']
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [CachedBasicAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ProductImageSerializer
 
@@ -345,25 +358,32 @@ class ProductImageGetDeleteView(generics.RetrieveDestroyAPIView):
 
             # Retrieve the Image object from the database
             image = ProductImage.objects.get(image_id=kwargs['image_id'])
-            use_profile = environ.Env().bool("USE_PROFILE", default=False)
 
             # Delete the image from s3
             try:
                 logger.info("Deleting object from S3")
-                s3 = boto3.Session(profile_name='dev').client('s3') if use_profile else boto3.client("s3")
-                s3.delete_object(Bucket=environ.Env().str("S3_BUCKET"), Key=image.s3_bucket_path)
+                delete_image(image.s3_bucket_path)
 
+            except CircuitOpen:
+                # Nothing reached S3, leave the 503 to the handler below
+                raise
             except Exception as e:
                 send_to_sns_topic(image.s3_bucket_path, image.file_name, False, str(e), product.owner_user.username)
                 return response(False, str(e), status.HTTP_400_BAD_REQUEST)
             
-            send_to_sns_topic(image.s3_bucket_path, image.file_name, True, "Image Deleted", product.owner_user.username)
-
-            # Delete the Image from the database
-            image.delete()
+            # Delete the Image from the database and notify once that has committed
+            username = product.owner_user.username
+            with transaction.atomic():
+                image.delete()
+                bump_generations(product.owner_user_id, ProductImage)
+                transaction.on_commit(lambda: send_to_sns_topic(image.s3_bucket_path, image.file_name, True,
+                                                                "Image Deleted", username))
 
             # Return success message and relevant HTTP status code
             return response(True, "Image deleted successfully", status.HTTP_204_NO_CONTENT, show_data=True, log_level="info")
+        except CircuitOpen as e:
+            # S3 is known to be down, fail fast and tell the client when to come back
+            return response(False, str(e), status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": e.retry_after})
         except Exception as e:
             # Return failure message and relevant HTTP status code in case of an error
             return response(False, str(e), status.HTTP_408_REQUEST_TIMEOUT)
@@ -372,12 +392,12 @@ class ProductImageGetDeleteView(generics.RetrieveDestroyAPIView):
 class ProductImageGetPostView(generics.ListCreateAPIView):
     """
     View for retrieving and deleting a Product's Image.
-    Uses BasicAuthentication for authentication and
+    Uses CachedBasicAuthentication for authentication and
     requires the user to be authenticated.
     Uses ProductImageSerializer for updating a Product's Image.
     """
     http_method_names = ['get', 'post']
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [CachedBasicAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = ProductImageSerializer
 
@@ -393,18 +413,18 @@ class ProductImageGetPostView(generics.ListCreateAPIView):
         """
         try:
             statsd.incr("image_list")
-            # Check if the requested Product exists in the database
-            if not Product.objects.filter(id=kwargs['id']).exists():
+            # Retrieve the Product data from the cache or the database
+            product_data = get_product_data(kwargs['id'])
+            if product_data is None:
                 return response(False, "Product {} does not exist".format(kwargs['id']), status.HTTP_404_NOT_FOUND)
 
-            # Retrieve the Product object from the database
-            product = Product.objects.get(id=kwargs['id'])
-
             # Check if the requesting user is the owner of the Product
-            if not product.owner_user == request.user:
+            if not product_data["owner_user_id"] == request.user.id:
                 return response(False, "You are not allowed to get this product's data", status.HTTP_403_FORBIDDEN)
 
-            image_data = ProductImage.objects.filter(product=product).values()
+            # Cached until the owner's images change
+            image_data = cached_list(request.user.id, ProductImage, "product:{}".format(kwargs['id']),
+                                     lambda: list(ProductImage.objects.filter(product_id=kwargs['id']).values()))
 
             # Return a success response with the Product data
             return response(True, "Product data fetched successfully", status.HTTP_200_OK, data=image_data,
@@ -439,47 +459,134 @@ class ProductImageGetPostView(generics.ListCreateAPIView):
             if not request.FILES.get("image", False):
                 return response(False, "Please select image as form-data", status.HTTP_400_BAD_REQUEST)
 
+            # Pillow is only needed here, keep it out of process start up
+            from PIL import Image
+
             try:
                 file_stream = request.FILES["image"].read()
                 Image.open(request.FILES["image"])
             except Exception as e:
                 return response(False, "Invalid image : {}".format(str(e)), status.HTTP_400_BAD_REQUEST)
 
-            use_profile = environ.Env().bool("USE_PROFILE", default=False)
-
             logger.info("Create product and updating bucket path")
-            serializer = ProductImage(product=product, file_name=request.FILES["image"].name)
-            serializer.save()
-            serializer.s3_bucket_path = "{}/{}/{}".format(product.id, serializer.image_id, serializer.file_name)
-            serializer.save()
+            with transaction.atomic():
+                serializer = ProductImage(product=product, file_name=request.FILES["image"].name)
+                serializer.save()
+                serializer.s3_bucket_path = "{}/{}/{}".format(product.id, serializer.image_id, serializer.file_name)
+                serializer.save()
+                bump_generations(product.owner_user_id, ProductImage)
             data = ProductImage.objects.filter(image_id=serializer.image_id).values().first()
 
             try:
                 logger.info("Connecting to S3 to upload file")
-                s3 = boto3.Session(profile_name='dev').client('s3') if use_profile else boto3.client("s3")
-                s3.put_object(Body=file_stream, Bucket=environ.Env().str("S3_BUCKET"), Key=serializer.s3_bucket_path)
+                upload_image(serializer.s3_bucket_path, file_stream)
 
             except Exception as e:
+                # The row must not outlive an upload that never happened, or it would show in the image list
+                with transaction.atomic():
+                    serializer.delete()
+                    bump_generations(product.owner_user_id, ProductImage)
+                if isinstance(e, CircuitOpen):
+                    # Nothing reached S3, leave the 503 to the handler below
+                    raise
                 send_to_sns_topic(serializer.s3_bucket_path, serializer.file_name, False, str(e), product.owner_user.username)
-                return response(False, str(e), status.HTTP_400_BAD_REQUEST)
+                return response(False, str(e), upload_failure_status(e))
             
             send_to_sns_topic(serializer.s3_bucket_path, serializer.file_name, True, "Image Uploaded", product.owner_user.username)
 
             # Return success message and relevant HTTP status code
             return response(True, "Image Uploaded successfully", status.HTTP_201_CREATED, data, log_level="info")
+        except CircuitOpen as e:
+            # S3 is known to be down, fail fast and tell the client when to come back
+            return response(False, str(e), status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": e.retry_after})
         except Exception as e:
             # Return failure message and relevant HTTP status code in case of an error
             return response(False, str(e), status.HTTP_408_REQUEST_TIMEOUT)
-        
-def send_to_sns_topic(image_path, image_name, status, message, user_email):
-    
-    aws_region = os.getenv("AWS_REGION")
-    sns_topic_arn = os.getenv("SNS_TOPIC_ARN")
 
-    use_profile = environ.Env().bool("USE_PROFILE", default=False)
 
-    # Create an SNS client
-    sns_client = boto3.Session(profile_name='dev').client('sns', region_name=aws_region) if use_profile else boto3.client('sns', region_name=aws_region)
+class ProductExportView(APIView):
+    """
+    View for exporting every Product of the requesting user with its Images.
+    Uses CachedBasicAuthentication for authentication and
+    requires the user to be authenticated.
+    Streams NDJSON, gzip-compressed on the fly when the client accepts it.
+    """
+    authentication_classes = [CachedBasicAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Handle GET request to export the requesting user's catalog, one Product per line.
+
+        :param request: The incoming request
+        :return: A streaming response, read from the database while it is sent
+        """
+        statsd.incr("product_export")
+        # The rows are read after the view returns, so pick the database (replica or primary) now
+        using = router.db_for_read(Product)
+        chunks = buffered(export_lines(request.user.id, settings.EXPORT_CHUNK_SIZE, using))
+        http_response = StreamingHttpResponse(content_type="application/x-ndjson")
+        if "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+            chunks = gzip_chunks(chunks)
+            http_response["Content-Encoding"] = "gzip"
+        http_response.streaming_content = chunks
+        http_response["Content-Disposition"] = 'attachment; filename="products.ndjson"'
+        patch_vary_headers(http_response, ("Accept-Encoding",))
+        return http_response
+
+
+def upload_image(key, body):
+    """
+    Upload an image body to the bucket under the given key.
+    """
+    resilience.call("s3", "put_object", Body=body, Bucket=aws.bucket_name(), Key=key)
+
+
+def upload_failure_status(error):
+    """
+    Status for a failed upload: 502 when S3 rather than the request failed, so the client retries
+    it and an Idempotency-Key does not keep the failure around.
+    """
+    return status.HTTP_502_BAD_GATEWAY if resilience.is_retryable(error) else status.HTTP_400_BAD_REQUEST
+
+
+def delete_image(key):
+    """
+    Delete a single image from the bucket.
+    """
+    resilience.call("s3", "delete_object", Bucket=aws.bucket_name(), Key=key)
+
+
+def image_batches(keys, size=1000):
+    """
+    Split object keys into batches of up to 1000, the most delete_objects accepts.
+    """
+    return [keys[i:i + size] for i in range(0, len(keys), size)]
+
+
+def delete_image_batch(keys):
+    """
+    Delete a batch of images from the bucket with a single request.
+    """
+    resilience.call("s3", "delete_objects", Bucket=aws.bucket_name(),
+                    Delete={'Objects': [{'Key': key} for key in keys]})
+
+
+def delete_product_images(keys):
+    """
+    Delete a deleted product's images from the bucket. Failures are logged, the product is already gone.
+    """
+    try:
+        logger.info("Deleting all images from s3 related to the product")
+        for batch in image_batches(keys):
+            delete_image_batch(batch)
+    except Exception as e:
+        logger.error("Couldn't delete Images from S3, deleted product only : {}".format(str(e)))
+
+
+def send_to_sns_topic(image_path, image_name, status, message, user_email):
+
+    sns_topic_arn = os.getenv("SNS_TOPIC_ARN")
 
     # Message to be sent to the SNS topic
     notification = json.dumps({
@@ -490,11 +597,11 @@ def send_to_sns_topic(image_path, image_name, status, message, user_email):
         "user_email": user_email
     })
 
-    # Publish the message to the SNS topic
-    sns_client.publish(
-        TopicArn=sns_topic_arn,
-        Message=notification,
-        Subject='Image Action',
-    )
+    # Publish the message to the SNS topic, skipped while SNS is known to be down
+    try:
+        resilience.call("sns", "publish", TopicArn=sns_topic_arn, Message=notification, Subject='Image Action')
+    except CircuitOpen as e:
+        logger.warning("Message not published : {}".format(str(e)))
+        return
 
     logger.info("Message Published")
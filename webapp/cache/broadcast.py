@@ -0,0 +1,84 @@
+"""
+Channels that carry cache invalidations between processes.
+
+A broadcast delivers every published message to every subscriber of the same channel, including
+subscribers in the publishing process; ``TieredCache`` tags its messages with a sender id and
+skips its own.
+"""
+# Python imports
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, DefaultDict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroadcast:
+    """
+    In-process stand-in: delivers synchronously to subscribers in this process only.
+    Used by the tests and by single process deployments.
+    """
+    _subscribers: DefaultDict[str, List[Callable[[str], None]]] = defaultdict(list)
+    _lock = threading.Lock()
+
+    def __init__(self, channel, location=None):
+        self.channel = channel
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers[self.channel])
+        for callback in subscribers:
+            callback(message)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers[self.channel].append(callback)
+
+
+class RedisBroadcast:
+    """
+    Redis pub/sub. A daemon thread per process listens on the channel and reconnects after errors.
+    Publishing gives up after ``timeout`` seconds and never raises: a lost invalidation is only
+    stale for the subscriber's L1 timeout. The listener waits for messages without a read timeout
+    on its own connection, with TCP keepalive to notice a dead server.
+    """
+
+    def __init__(self, channel, location, timeout=0.1):
+        # redis is only needed where this broadcast is configured
+        import redis
+
+        self.channel = channel
+        self.client = redis.Redis.from_url(location, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.listener = redis.Redis.from_url(location, socket_connect_timeout=timeout, socket_keepalive=True)
+        self.errors = redis.RedisError
+        self.callbacks: List[Callable[[str], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, message):
+        try:
+            self.client.publish(self.channel, message)
+        except self.errors as e:
+            logger.warning("Couldn't publish cache invalidation on {} : {}".format(self.channel, str(e)))
+
+    def subscribe(self, callback):
+        with self._lock:
+            self.callbacks.append(callback)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="cache-broadcast", daemon=True)
+                self._thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.listener.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    for callback in list(self.callbacks):
+                        callback(item["data"].decode())
+            except Exception as e:
+                logger.warning("Cache invalidation listener on {} failed, reconnecting : {}".format(
+                    self.channel, str(e)))
+                time.sleep(1)
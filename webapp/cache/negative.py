@@ -0,0 +1,81 @@
+"""
+Negative caching for lookups by primary key.
+
+Ids that turned out not to exist are remembered in ``NEGATIVE_CACHE_ALIAS`` for
+``NEGATIVE_CACHE_TIMEOUT`` seconds, and ids no ``BigAutoField`` can hold are rejected without a
+cache or database round trip. Creating a row forgets its id (see the ``post_save`` receivers in
+``product.signals`` and ``webapp.users.signals``).
+
+Every 404 is counted in statsd as ``not_found.<model>.cached`` or ``not_found.<model>.db``; their
+ratio is the fraction of 404s answered without the database.
+"""
+# Django imports
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from statsd.defaults.django import statsd
+
+# BigAutoField ids are positive signed 64 bit integers
+MAX_ID = 2 ** 63 - 1
+
+
+def valid_id(pk):
+    return 0 < pk <= MAX_ID
+
+
+def missing_key(model, pk):
+    return "missing:{}:{}".format(model._meta.label_lower, pk)
+
+
+def is_known_missing(model, pk):
+    """
+    True when ``pk`` cannot exist or was recently found not to. Counts the 404 it leads to.
+    """
+    if not valid_id(pk) or caches[settings.NEGATIVE_CACHE_ALIAS].get(missing_key(model, pk)):
+        statsd.incr("not_found.{}.cached".format(model._meta.model_name))
+        return True
+    return False
+
+
+def remember_missing(model, pk):
+    """
+    Record that the database has no row ``pk``. Counts the 404 it leads to.
+    """
+    statsd.incr("not_found.{}.db".format(model._meta.model_name))
+    caches[settings.NEGATIVE_CACHE_ALIAS].set(missing_key(model, pk), True, settings.NEGATIVE_CACHE_TIMEOUT)
+
+
+def forget_missing(model, pk):
+    """
+    Drop the negative entry of a row being created: right away and again once it has committed.
+    """
+    def forget():
+        caches[settings.NEGATIVE_CACHE_ALIAS].delete(missing_key(model, pk))
+
+    forget()
+    transaction.on_commit(forget)
+
+
+def forget_missing_many(model, pks):
+    """
+    ``forget_missing`` for rows created in bulk, which send no ``post_save``.
+    """
+    keys = [missing_key(model, pk) for pk in pks if pk is not None]
+
+    def forget():
+        caches[settings.NEGATIVE_CACHE_ALIAS].delete_many(keys)
+
+    forget()
+    transaction.on_commit(forget)
+
+
+def exists(model, pk):
+    """
+    ``model.objects.filter(pk=pk).exists()`` behind the negative cache.
+    """
+    if is_known_missing(model, pk):
+        return False
+    if model.objects.filter(pk=pk).exists():
+        return True
+    remember_missing(model, pk)
+    return False
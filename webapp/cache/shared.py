@@ -0,0 +1,309 @@
+"""
+A cache backend backed by a shared memory segment, so every worker on a node shares one copy::
+
+    CACHES = {
+        "shared": {
+            "BACKEND": "webapp.cache.shared.SharedMemoryCache",
+            "LOCATION": "/dev/shm/webapp-1000/cache",
+            "OPTIONS": {"SLOTS": 4096, "SLOT_SIZE": 4096},
+        },
+    }
+
+The file at ``LOCATION`` is ``mmap``-ed by every process. It holds a fixed number of fixed size
+slots; a key may live in any of the ``PROBES`` slots after its hash, and a value that does not fit
+in a slot is not cached. Each slot starts with a sequence number (a seqlock): writers, serialised
+by a ``flock`` on the file, make it odd while they write and even again afterwards, and readers
+take no lock at all, retrying when the number was odd or changed under them. When every candidate
+slot is taken, the least recently read one is replaced; read times are updated without the lock,
+so that order is approximate.
+
+Slots are unpickled, so whoever can write the file can run code in every worker. The directory
+holding it is created private (0700) and the file 0600; either one found owned by another account
+or open to others is refused with ``ImproperlyConfigured``, and the file is never opened through a
+symlink.
+
+Entries only live on this node, so other nodes keep serving a value until it expires. Keep
+timeouts short for anything that changes. Changing ``SLOTS`` or ``SLOT_SIZE`` re-creates the
+segment, which is only safe once every process using the old one has stopped.
+"""
+# Python imports
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import stat
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Django imports
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from statsd.defaults.django import statsd
+
+_MAGIC = b"WEBAPPC1"
+_SEGMENT = struct.Struct("<8sII")  # magic, slots, slot size
+_SEGMENT_HEADER = 64
+_SEQUENCE = struct.Struct("<Q")
+_SLOT = struct.Struct("<QQddHI")  # sequence, key hash, expires at, read at, key length, value length
+_SLOT_HEADER = 40
+_READ_RETRIES = 16
+
+_segments: Dict[tuple, "Segment"] = {}
+_segments_lock = threading.Lock()
+
+
+def key_hash(key):
+    """
+    A hash that is the same in every process (``hash()`` is randomised per interpreter). 0 marks an empty slot.
+    """
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def check_private(path, status, is_type, mode):
+    if not is_type(status.st_mode) or status.st_uid != os.geteuid() or stat.S_IMODE(status.st_mode) & ~mode:
+        raise ImproperlyConfigured("{} must be owned by this user with mode {:o} or stricter".format(path, mode))
+
+
+def open_private(path):
+    """
+    Open the segment file, creating it and its directory, after checking nobody else can have
+    written it.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    check_private(directory, os.lstat(directory), stat.S_ISDIR, 0o700)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    try:
+        check_private(path, os.fstat(fd), stat.S_ISREG, 0o600)
+    except ImproperlyConfigured:
+        os.close(fd)
+        raise
+    return fd
+
+
+class Segment:
+    """
+    The mapped file and the slot table in it.
+    """
+
+    def __init__(self, path, slots, slot_size, probes):
+        if slot_size <= _SLOT_HEADER:
+            raise ValueError("SLOT_SIZE must be larger than {} bytes".format(_SLOT_HEADER))
+        self.slots = slots
+        self.slot_size = slot_size
+        self.probes = min(probes, slots)
+        self.size = _SEGMENT_HEADER + slots * slot_size
+        self.fd = open_private(path)
+        self.lock = threading.Lock()
+        with self.write_lock():
+            header = _SEGMENT.pack(_MAGIC, slots, slot_size)
+            if os.fstat(self.fd).st_size != self.size or os.pread(self.fd, _SEGMENT.size, 0) != header:
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, self.size)
+                os.pwrite(self.fd, header, 0)
+        self.map = mmap.mmap(self.fd, self.size)
+
+    @contextmanager
+    def write_lock(self):
+        # flock excludes other processes, the thread lock the other threads of this one
+        with self.lock:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def candidates(self, hashed):
+        return [_SEGMENT_HEADER + ((hashed + i) % self.slots) * self.slot_size for i in range(self.probes)]
+
+    def read(self, key, hashed):
+        """
+        Lock-free lookup. Returns ``(offset, expires_at, value bytes)`` or ``None``.
+        """
+        for offset in self.candidates(hashed):
+            for _ in range(_READ_RETRIES):
+                sequence, slot_hash, expires_at, _, key_length, value_length = _SLOT.unpack_from(self.map, offset)
+                if sequence & 1:
+                    continue
+                if slot_hash != hashed:
+                    break
+                start = offset + _SLOT_HEADER
+                data = self.map[start:start + key_length + value_length]
+                if _SEQUENCE.unpack_from(self.map, offset)[0] != sequence:
+                    continue
+                if data[:key_length] == key:
+                    return offset, expires_at, data[key_length:]
+                break
+        return None
+
+    def touch_read(self, offset):
+        # Unlocked and approximate, it only steers eviction
+        struct.pack_into("<d", self.map, offset + 24, time.time())
+
+    def find(self, key, hashed):
+        """
+        Slot holding ``key``, for use under the write lock.
+        """
+        for offset in self.candidates(hashed):
+            _, slot_hash, _, _, key_length, _ = _SLOT.unpack_from(self.map, offset)
+            start = offset + _SLOT_HEADER
+            if slot_hash == hashed and self.map[start:start + key_length] == key:
+                return offset
+        return None
+
+    def victim(self, hashed):
+        """
+        Slot to store a new key in: an empty or expired one, else the least recently read.
+        """
+        now = time.time()
+        oldest: Tuple[int, float] = (0, float("inf"))
+        for offset in self.candidates(hashed):
+            _, slot_hash, expires_at, read_at, _, _ = _SLOT.unpack_from(self.map, offset)
+            if slot_hash == 0 or (expires_at and expires_at <= now):
+                return offset
+            if read_at < oldest[1]:
+                oldest = (offset, read_at)
+        return oldest[0]
+
+    def write(self, offset, hashed, key, value, expires_at):
+        sequence = _SEQUENCE.unpack_from(self.map, offset)[0]
+        _SEQUENCE.pack_into(self.map, offset, sequence + 1)
+        _SLOT.pack_into(self.map, offset, sequence + 1, hashed, expires_at, time.time(), len(key), len(value))
+        start = offset + _SLOT_HEADER
+        self.map[start:start + len(key) + len(value)] = key + value
+        _SEQUENCE.pack_into(self.map, offset, sequence + 2)
+
+    def clear_slot(self, offset):
+        sequence = _SEQUENCE.unpack_from(self.map, offset)[0]
+        _SEQUENCE.pack_into(self.map, offset, sequence + 1)
+        _SLOT.pack_into(self.map, offset, sequence + 1, 0, 0.0, 0.0, 0, 0)
+        _SEQUENCE.pack_into(self.map, offset, sequence + 2)
+
+    def set_expiry(self, offset, expires_at):
+        sequence = _SEQUENCE.unpack_from(self.map, offset)[0]
+        _SEQUENCE.pack_into(self.map, offset, sequence + 1)
+        struct.pack_into("<d", self.map, offset + 16, expires_at)
+        _SEQUENCE.pack_into(self.map, offset, sequence + 2)
+
+    def fits(self, key, value):
+        return _SLOT_HEADER + len(key) + len(value) <= self.slot_size
+
+
+def get_segment(path, slots, slot_size, probes):
+    key = (path, slots, slot_size, probes, os.getpid())
+    segment = _segments.get(key)
+    if segment is None:
+        with _segments_lock:
+            segment = _segments.get(key)
+            if segment is None:
+                segment = _segments[key] = Segment(path, slots, slot_size, probes)
+    return segment
+
+
+class SharedMemoryCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._segment_args = (location, options.get("SLOTS", 4096), options.get("SLOT_SIZE", 4096),
+                              options.get("PROBES", 8))
+
+    @property
+    def segment(self):
+        return get_segment(*self._segment_args)
+
+    def _key(self, key, version):
+        key = self.make_and_validate_key(key, version=version).encode()
+        return key, key_hash(key)
+
+    def _expires_at(self, timeout):
+        expires_at = self.get_backend_timeout(timeout)
+        return 0.0 if expires_at is None else expires_at
+
+    def _lookup(self, key, hashed):
+        found = self.segment.read(key, hashed)
+        if found is None:
+            return None
+        offset, expires_at, value = found
+        if expires_at and expires_at <= time.time():
+            return None
+        return offset, value
+
+    def get(self, key, default=None, version=None):
+        key, hashed = self._key(key, version)
+        found = self._lookup(key, hashed)
+        if found is None:
+            statsd.incr("cache.shared.miss")
+            return default
+        statsd.incr("cache.shared.hit")
+        self.segment.touch_read(found[0])
+        return pickle.loads(found[1])
+
+    def _store(self, key, value, timeout, version, only_if_missing=False):
+        key, hashed = self._key(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        segment = self.segment
+        with segment.write_lock():
+            if only_if_missing and self._lookup(key, hashed) is not None:
+                return False
+            offset = segment.find(key, hashed)
+            if not segment.fits(key, value):
+                # Too large to cache, but never leave an older value behind
+                if offset is not None:
+                    segment.clear_slot(offset)
+                return False
+            if offset is None:
+                offset = segment.victim(hashed)
+            segment.write(offset, hashed, key, value, self._expires_at(timeout))
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, only_if_missing=True)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, hashed = self._key(key, version)
+        segment = self.segment
+        with segment.write_lock():
+            found = self._lookup(key, hashed)
+            if found is None:
+                return False
+            segment.set_expiry(found[0], self._expires_at(timeout))
+        return True
+
+    def delete(self, key, version=None):
+        key, hashed = self._key(key, version)
+        segment = self.segment
+        with segment.write_lock():
+            offset = segment.find(key, hashed)
+            if offset is None:
+                return False
+            segment.clear_slot(offset)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key, hashed = self._key(key, version)
+        segment = self.segment
+        with segment.write_lock():
+            found = self._lookup(key, hashed)
+            if found is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            offset, value = found
+            new_value = pickle.loads(value) + delta
+            _, _, expires_at, _, _, _ = _SLOT.unpack_from(segment.map, offset)
+            segment.write(offset, hashed, key, pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL), expires_at)
+        return new_value
+
+    def clear(self):
+        segment = self.segment
+        with segment.write_lock():
+            for index in range(segment.slots):
+                segment.clear_slot(_SEGMENT_HEADER + index * segment.slot_size)
@@ -0,0 +1,141 @@
+"""
+Request coalescing for cache misses.
+
+``SingleFlight.do(key, compute)`` runs ``compute`` once per key at a time in this process; callers
+arriving while it runs wait for that result instead of running it themselves. ``cached()`` builds
+cache-aside reads on top of it:
+
+* a fresh entry is returned as is;
+* a stale entry (older than ``timeout`` but within ``stale_timeout`` more) is returned right away
+  while one caller refreshes it (stale-while-revalidate);
+* on a miss one caller computes and the others wait for it.
+
+With ``lock_cache`` the refresh is also claimed across processes with ``lock_cache.add()``, e.g. on
+Redis; a worker that loses waits up to ``wait`` seconds for the winner's value before computing it
+itself, so a lost lock holder never blocks reads for longer than that. While ``lock_cache`` is
+unavailable (``add()`` answers ``None`` or raises) the refresh runs without it. ``lock_scope`` narrows
+the lock to the callers sharing ``cache``: a per-node cache takes a per-node lock, since a worker
+that lost the lock to another node would never see the winner's value in its own cache.
+"""
+# Python imports
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Django imports
+from statsd.defaults.django import statsd
+
+_MISSING = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute, wait=True, default=None):
+        """
+        Return ``compute()``, sharing one run between every concurrent caller with the same key.
+        With ``wait=False`` a caller that finds a run in progress gets ``default`` instead.
+        """
+        with self._lock:
+            leader = key not in self._calls
+            if leader:
+                self._calls[key] = _Call()
+            call = self._calls[key]
+        if not leader:
+            if not wait:
+                return default
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = compute()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+_flights = SingleFlight()
+
+
+def cached(cache, key, compute, timeout, stale_timeout=0, lock_cache=None, lock_timeout=10, wait=1.0,
+           lock_scope=None):
+    """
+    ``compute()`` cached under ``key`` for ``timeout`` seconds and served stale for
+    ``stale_timeout`` more while it is refreshed. ``None`` results are not cached.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until > time.time():
+            return value
+        # Stale: one caller refreshes, everyone else keeps the stale value meanwhile
+        return _flights.do(key, lambda: _refresh(cache, key, compute, timeout, stale_timeout, lock_cache,
+                                                 lock_timeout, lock_scope, wait=0, stale=value),
+                           wait=False, default=value)
+    return _flights.do(key, lambda: _refresh(cache, key, compute, timeout, stale_timeout, lock_cache,
+                                             lock_timeout, lock_scope, wait=wait))
+
+
+def _claim(lock_cache, lock_key, lock_timeout):
+    """
+    ``True`` when this caller holds ``lock_key``, ``False`` when another one does and ``None`` when
+    ``lock_cache`` is unavailable: django_redis with IGNORE_EXCEPTIONS answers ``None``, others raise.
+    """
+    try:
+        return lock_cache.add(lock_key, 1, lock_timeout)
+    except Exception:
+        return None
+
+
+def _refresh(cache, key, compute, timeout, stale_timeout, lock_cache, lock_timeout, lock_scope, wait,
+             stale=_MISSING):
+    if stale is _MISSING:
+        # A flight that finished between our miss and starting this one already stored it
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    lock_key: Optional[str] = ("singleflight:{}:{}".format(lock_scope, key) if lock_scope is not None
+                               else "singleflight:{}".format(key))
+    claimed = _claim(lock_cache, lock_key, lock_timeout) if lock_cache is not None else None
+    if claimed is None:
+        # No lock cache, or it is unavailable: waiting on a lock nobody can take would only add latency
+        if lock_cache is not None:
+            statsd.incr("singleflight.unlocked")
+        lock_key = None
+    elif not claimed:
+        # Another worker is computing it
+        if stale is not _MISSING:
+            statsd.incr("singleflight.stale")
+            return stale
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = cache.get(key)
+            if entry is not None:
+                statsd.incr("singleflight.waited")
+                return entry[0]
+        lock_key = None
+    try:
+        statsd.incr("singleflight.compute")
+        value = compute()
+        if value is not None:
+            cache.set(key, (value, time.time() + timeout), timeout + stale_timeout)
+        return value
+    finally:
+        if lock_key is not None:
+            lock_cache.delete(lock_key)
@@ -0,0 +1,52 @@
+# Python imports
+from unittest import mock
+
+# Django imports
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+# Project imports
+from product.models import Product
+from webapp.cache import negative
+from webapp.users.models import User
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "negative-tests"}
+
+
+@override_settings(CACHES={"default": LOCMEM, "shared": LOCMEM})
+class NegativeCacheTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+
+    def test_missing_id_is_answered_from_cache(self):
+        with mock.patch.object(negative.statsd, "incr") as incr:
+            self.assertFalse(negative.exists(User, 4242))
+            with self.assertNumQueries(0):
+                self.assertFalse(negative.exists(User, 4242))
+        self.assertEqual([call.args[0] for call in incr.call_args_list],
+                         ["not_found.user.db", "not_found.user.cached"])
+
+    def test_creating_the_row_forgets_it(self):
+        self.assertFalse(negative.exists(User, 4242))
+        User.objects.create_user(id=4242, username="new@example.com", password="testpassword",
+                                 first_name="new", last_name="user")
+        self.assertTrue(negative.exists(User, 4242))
+
+    def test_impossible_product_id_never_reaches_database(self):
+        url = reverse("product:product_get", kwargs={"id": 2 ** 64})
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_product_is_cached_until_created(self):
+        url = reverse("product:product_get", kwargs={"id": 4242})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+        owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                         first_name="owner", last_name="user")
+        Product.objects.create(id=4242, owner_user=owner, name="name", description="description", sku="sku-1",
+                               manufacturer="manufacturer", quantity=1)
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,105 @@
+# Python imports
+import multiprocessing
+import os
+import stat
+import tempfile
+import time
+from pathlib import Path
+from unittest import skipUnless
+
+# Django imports
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+# Project imports
+from webapp.cache.shared import SharedMemoryCache
+
+
+def shared_cache(path, **options):
+    return SharedMemoryCache(str(path), {"TIMEOUT": 60, "OPTIONS": {"SLOTS": 64, "SLOT_SIZE": 512, **options}})
+
+
+def set_in_child(path):
+    shared_cache(path).set("from-child", {"pid": "child"})
+
+
+class SharedMemoryCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        self.path = Path(tempfile.mkdtemp()) / "segment"
+        self.cache = shared_cache(self.path)
+
+    def test_set_get_delete(self):
+        self.cache.set("key", {"name": "product"})
+        self.assertEqual(self.cache.get("key"), {"name": "product"})
+        self.assertFalse(self.cache.add("key", "other"))
+        self.assertTrue(self.cache.delete("key"))
+        self.assertIsNone(self.cache.get("key"))
+        self.assertTrue(self.cache.add("key", "other"))
+        self.assertEqual(self.cache.get("key"), "other")
+
+    def test_incr_and_expiry(self):
+        self.cache.set("counter", 1)
+        self.assertEqual(self.cache.incr("counter", 2), 3)
+        self.assertEqual(self.cache.get("counter"), 3)
+        self.cache.set("short", "value", timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("short"))
+
+    def test_value_larger_than_slot_is_not_cached(self):
+        self.cache.set("key", "small")
+        self.cache.set("key", "x" * 1024)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_least_recently_read_entry_is_evicted(self):
+        cache = shared_cache(Path(tempfile.mkdtemp()) / "segment", SLOTS=2, PROBES=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        time.sleep(0.01)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual([cache.get(key) for key in ("a", "b", "c")], [1, None, 3])
+
+    def test_entries_are_shared_between_processes(self):
+        self.cache.get("warm up the mapping before forking")
+        child = multiprocessing.get_context("fork").Process(target=set_in_child, args=(self.path,))
+        child.start()
+        child.join(10)
+        self.assertEqual(child.exitcode, 0)
+        self.assertEqual(self.cache.get("from-child"), {"pid": "child"})
+
+
+class SegmentPermissionsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+
+    def test_segment_is_created_private(self):
+        shared_cache(self.directory / "cache" / "segment").set("key", "value")
+        self.assertEqual(stat.S_IMODE(os.stat(self.directory / "cache").st_mode), 0o700)
+        self.assertEqual(stat.S_IMODE(os.stat(self.directory / "cache" / "segment").st_mode), 0o600)
+
+    def test_file_others_can_write_is_refused(self):
+        path = self.directory / "segment"
+        path.touch(0o666)
+        os.chmod(path, 0o666)
+        with self.assertRaises(ImproperlyConfigured):
+            shared_cache(path).get("key")
+
+    def test_shared_directory_is_refused(self):
+        os.chmod(self.directory, 0o1777)
+        with self.assertRaises(ImproperlyConfigured):
+            shared_cache(self.directory / "segment").get("key")
+
+    def test_symlink_is_not_followed(self):
+        target = self.directory / "target"
+        target.touch(0o600)
+        (self.directory / "segment").symlink_to(target)
+        with self.assertRaises(OSError):
+            shared_cache(self.directory / "segment").get("key")
+
+    @skipUnless(os.geteuid() == 0, "Needs to create a file owned by another user")
+    def test_file_owned_by_another_user_is_refused(self):
+        path = self.directory / "segment"
+        path.touch(0o600)
+        os.chown(path, 65534, 65534)
+        with self.assertRaises(ImproperlyConfigured):
+            shared_cache(path).get("key")
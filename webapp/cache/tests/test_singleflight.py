@@ -0,0 +1,105 @@
+# Python imports
+import threading
+import time
+from typing import Any, Dict, Tuple
+from unittest import mock
+
+# Django imports
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+# Project imports
+from webapp.cache.singleflight import SingleFlight, cached
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        self.cache = LocMemCache("singleflight-tests", {})
+        self.cache.clear()
+        self.calls = 0
+
+    def compute(self, value="fresh", delay=0.05):
+        def run():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return run
+
+    def run_concurrently(self, target, count=20):
+        results = []
+        barrier = threading.Barrier(count)
+
+        def call():
+            barrier.wait()
+            results.append(target())
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_misses_compute_once(self):
+        results = self.run_concurrently(lambda: cached(self.cache, "key", self.compute(), timeout=60))
+        self.assertEqual(results, ["fresh"] * 20)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_refreshing(self):
+        self.cache.set("key", ("stale", time.time() - 1), 60)
+        results = self.run_concurrently(lambda: cached(self.cache, "key", self.compute(), timeout=60,
+                                                       stale_timeout=60))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), ["fresh"] + ["stale"] * 19)
+        self.assertEqual(cached(self.cache, "key", self.compute(), timeout=60), "fresh")
+
+    def test_waits_for_other_worker_holding_the_lock(self):
+        lock_cache = LocMemCache("singleflight-locks", {})
+        lock_cache.add("singleflight:key", 1)
+        threading.Timer(0.05, lambda: self.cache.set("key", ("from other worker", time.time() + 60))).start()
+        value = cached(self.cache, "key", self.compute(), timeout=60, lock_cache=lock_cache, wait=1)
+        self.assertEqual(value, "from other worker")
+        self.assertEqual(self.calls, 0)
+
+    def test_error_reaches_every_waiter(self):
+        def fail():
+            time.sleep(0.05)
+            raise RuntimeError("database unavailable")
+
+        flight = SingleFlight()
+        errors = []
+
+        def call():
+            try:
+                flight.do("key", fail)
+            except RuntimeError as e:
+                errors.append(e)
+
+        self.run_concurrently(call, count=5)
+        self.assertEqual(len(errors), 5)
+
+    def test_unavailable_lock_cache_computes_without_waiting(self):
+        # django_redis with IGNORE_EXCEPTIONS answers None during an outage, other backends raise
+        lock_cache = LocMemCache("singleflight-locks", {})
+        outcomes: Tuple[Dict[str, Any], ...] = (
+            {"return_value": None}, {"side_effect": ConnectionError("Redis is down")})
+        for outcome in outcomes:
+            self.cache.clear()
+            with mock.patch.object(lock_cache, "add", **outcome), mock.patch.object(lock_cache, "delete") as delete:
+                started = time.monotonic()
+                self.assertEqual(cached(self.cache, "key", self.compute(), timeout=60, lock_cache=lock_cache,
+                                        wait=1), "fresh")
+            self.assertLess(time.monotonic() - started, 0.5)
+            delete.assert_not_called()
+        self.assertEqual(self.calls, 2)
+
+    def test_lock_scope_separates_nodes(self):
+        lock_cache = LocMemCache("singleflight-locks", {})
+        lock_cache.clear()
+        lock_cache.add("singleflight:node-1:key", 1)
+        started = time.monotonic()
+        value = cached(self.cache, "key", self.compute(), timeout=60, lock_cache=lock_cache, wait=1,
+                       lock_scope="node-2")
+        self.assertEqual(value, "fresh")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(self.calls, 1)
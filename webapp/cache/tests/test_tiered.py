@@ -0,0 +1,108 @@
+# Python imports
+from typing import Dict
+from unittest import mock
+
+# Django imports
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+# Project imports
+from webapp.cache import tiered
+from webapp.cache.broadcast import LocalBroadcast, RedisBroadcast
+
+CACHES = {
+    "default": {
+        "BACKEND": "webapp.cache.tiered.TieredCache",
+        "LOCATION": "l2",
+        "OPTIONS": {"MAX_ENTRIES": 2, "L1_TIMEOUT": 60, "CHANNEL": "test-invalidate"},
+    },
+    "l2": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tiered-test"},
+}
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        tiered._tiers.clear()
+        self.addCleanup(tiered._tiers.clear)
+        self.addCleanup(LocalBroadcast._subscribers.clear)
+        self.cache = caches["default"]
+        self.l2 = caches["l2"]
+        self.l2.clear()
+
+    def test_second_read_is_served_from_l1(self):
+        self.l2.set("key", {"name": "product"})
+        self.assertEqual(self.cache.get("key"), {"name": "product"})
+        self.l2.delete("key")
+        self.assertEqual(self.cache.get("key"), {"name": "product"})
+        self.assertEqual(self.cache.stats()["l1"], {"hits": 1, "misses": 1, "ratio": 0.5})
+        self.assertEqual(self.cache.stats()["l2"], {"hits": 1, "misses": 0, "ratio": 1.0})
+
+    def test_cached_value_cannot_be_mutated(self):
+        value: Dict[str, list] = {"images": []}
+        self.cache.set("key", value)
+        value["images"].append("a.png")
+        self.cache.get("key")["images"].append("b.png")
+        self.assertEqual(self.cache.get("key"), {"images": []})
+
+    def test_l1_is_bounded(self):
+        for key in ("a", "b", "c"):
+            self.cache.set(key, key)
+        self.assertEqual(list(self.cache.l1.entries), [":1:b", ":1:c"])
+
+    def test_write_evicts_other_workers_copies(self):
+        self.cache.set("key", "old")
+        other_worker = tiered.LocalTier(10, LocalBroadcast("test-invalidate"))
+        other_worker.set(":1:key", "old", 60)
+
+        self.cache.set("key", "new")
+        self.assertIs(other_worker.get(":1:key"), tiered._MISSING)
+        self.assertEqual(self.cache.get("key"), "new")
+
+        other_worker.set(":1:key", "new", 60)
+        self.cache.delete("key")
+        self.assertIs(other_worker.get(":1:key"), tiered._MISSING)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_invalidation_during_l2_read_is_not_lost(self):
+        self.l2.set("key", "old")
+        other_worker = tiered.LocalTier(10, LocalBroadcast("test-invalidate"))
+        l2_get = self.l2.get
+
+        def read_then_invalidated(*args, **kwargs):
+            value = l2_get(*args, **kwargs)
+            # Another worker writes between our L2 read and the L1 fill
+            self.l2.set("key", "new")
+            other_worker.invalidate([":1:key"])
+            return value
+
+        with mock.patch.object(self.l2, "get", side_effect=read_then_invalidated):
+            self.assertEqual(self.cache.get("key"), "old")
+        self.assertEqual(self.cache.get("key"), "new")
+
+    def test_touch_evicts_other_workers_copies(self):
+        self.cache.set("key", "value")
+        other_worker = tiered.LocalTier(10, LocalBroadcast("test-invalidate"))
+        other_worker.set(":1:key", "value", 60)
+
+        self.assertTrue(self.cache.touch("key", 0))
+        self.assertIs(other_worker.get(":1:key"), tiered._MISSING)
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_hits_and_misses_sent_to_statsd(self):
+        with mock.patch.object(tiered.statsd, "incr") as incr:
+            self.cache.get("missing")
+        self.assertEqual([call.args[0] for call in incr.call_args_list], ["cache.l1.miss", "cache.l2.miss"])
+
+
+class RedisBroadcastTestCase(SimpleTestCase):
+    def test_publish_times_out_and_never_raises(self):
+        broadcast = RedisBroadcast("test-invalidate", "redis://127.0.0.1:1/0", timeout=0.2)
+        kwargs = broadcast.client.connection_pool.connection_kwargs
+        self.assertEqual((kwargs["socket_timeout"], kwargs["socket_connect_timeout"]), (0.2, 0.2))
+        # The listener blocks until a message arrives, so only its connect may time out
+        kwargs = broadcast.listener.connection_pool.connection_kwargs
+        self.assertEqual((kwargs.get("socket_timeout"), kwargs["socket_connect_timeout"]), (None, 0.2))
+
+        with self.assertLogs("webapp.cache.broadcast", "WARNING"):
+            broadcast.publish("message")
@@ -0,0 +1,230 @@
+"""
+A cache backend with a small in-process tier (L1) in front of another configured cache (L2)::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "webapp.cache.tiered.TieredCache",
+            "LOCATION": "redis",  # alias of the L2 cache
+            "OPTIONS": {
+                "MAX_ENTRIES": 1024,
+                "L1_TIMEOUT": 5,
+                "BROADCAST": "webapp.cache.broadcast.RedisBroadcast",
+                "BROADCAST_LOCATION": "redis://...",
+            },
+        },
+        "redis": {...},
+    }
+
+Reads are served from L1 when possible. Writes go to L2 and publish the key on the broadcast
+channel so every other process evicts its L1 copy; ``L1_TIMEOUT`` bounds staleness when an
+invalidation is lost. A value read from L2 while an invalidation arrives is returned but not kept. L1 holds pickled bytes, so callers always get their own copy of a value and
+mutating it never changes what the next caller sees. Hits and misses per tier are sent to statsd
+as ``cache.l1.hit``/``cache.l1.miss``/``cache.l2.hit``/``cache.l2.miss`` and kept in ``stats()``.
+"""
+# Python imports
+import json
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict
+
+# Django imports
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+from statsd.defaults.django import statsd
+
+_tiers: Dict[str, "LocalTier"] = {}
+_tiers_lock = threading.Lock()
+
+_MISSING = object()
+
+
+class LocalTier:
+    """
+    The process wide L1: an LRU of ``key -> (expires_at, pickled value)`` shared by every thread.
+    ``epoch`` counts evictions, so a value read from L2 before one is never filled in after it.
+    """
+
+    def __init__(self, max_entries, broadcast):
+        self.max_entries = max_entries
+        self.sender = uuid.uuid4().hex
+        self.pid = os.getpid()
+        self.entries = OrderedDict()
+        self.epoch = 0
+        self.counts = {"l1.hit": 0, "l1.miss": 0, "l2.hit": 0, "l2.miss": 0}
+        self.lock = threading.Lock()
+        self.broadcast = broadcast
+        broadcast.subscribe(self.receive)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(entry[1])
+
+    def set(self, key, value, timeout, epoch=None):
+        """
+        Store ``value``. With ``epoch``, only if nothing was evicted since it was read.
+        """
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            if timeout <= 0:
+                self.entries.pop(key, None)
+                return
+            self.entries[key] = (time.monotonic() + timeout, data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def evict(self, keys):
+        with self.lock:
+            self.epoch += 1
+            if keys is None:
+                self.entries.clear()
+            for key in keys or ():
+                self.entries.pop(key, None)
+
+    def invalidate(self, keys):
+        """
+        Evict here and tell every other process to evict. ``None`` clears everything.
+        """
+        self.evict(keys)
+        self.broadcast.publish(json.dumps({"sender": self.sender, "keys": keys}))
+
+    def receive(self, message):
+        message = json.loads(message)
+        if message["sender"] != self.sender:
+            self.evict(message["keys"])
+
+    def count(self, name):
+        statsd.incr("cache.{}".format(name))
+        with self.lock:
+            self.counts[name] += 1
+
+
+def get_tier(location, max_entries, broadcast_path, channel, broadcast_location):
+    """
+    Return this process's L1 for ``location``. A forked worker builds its own, since the
+    broadcast listener thread does not survive the fork.
+    """
+    tier = _tiers.get(location)
+    if tier is None or tier.pid != os.getpid():
+        with _tiers_lock:
+            tier = _tiers.get(location)
+            if tier is None or tier.pid != os.getpid():
+                broadcast = import_string(broadcast_path)(channel, broadcast_location)
+                tier = _tiers[location] = LocalTier(max_entries, broadcast)
+    return tier
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._l2_alias = location
+        self._l1_timeout = options.get("L1_TIMEOUT", 5)
+        self._tier_args = (
+            location,
+            self._max_entries,
+            options.get("BROADCAST", "webapp.cache.broadcast.LocalBroadcast"),
+            options.get("CHANNEL", "webapp-cache-invalidate"),
+            options.get("BROADCAST_LOCATION"),
+        )
+
+    @property
+    def l1(self):
+        return get_tier(*self._tier_args)
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _l1_timeout_for(self, timeout):
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self._l1_timeout if timeout is None else min(timeout, self._l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self.l1.get(l1_key)
+        if value is not _MISSING:
+            self.l1.count("l1.hit")
+            return value
+        self.l1.count("l1.miss")
+        # An invalidation arriving while L2 is read may be for the value read, don't keep that
+        epoch = self.l1.epoch
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.l1.count("l2.miss")
+            return default
+        self.l1.count("l2.hit")
+        self.l1.set(l1_key, value, self._l1_timeout, epoch=epoch)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        self.l2.set(key, value, timeout=timeout, version=version)
+        self.l1.invalidate([l1_key])
+        self.l1.set(l1_key, value, self._l1_timeout_for(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        added = self.l2.add(key, value, timeout=timeout, version=version)
+        if added:
+            self.l1.invalidate([l1_key])
+            self.l1.set(l1_key, value, self._l1_timeout_for(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        touched = self.l2.touch(key, timeout=timeout, version=version)
+        # Every L1 copy may outlive the new expiry
+        self.l1.invalidate([l1_key])
+        return touched
+
+    def delete(self, key, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        deleted = self.l2.delete(key, version=version)
+        self.l1.invalidate([l1_key])
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        l1_key = self.make_and_validate_key(key, version=version)
+        value = self.l2.incr(key, delta, version=version)
+        self.l1.invalidate([l1_key])
+        return value
+
+    def delete_many(self, keys, version=None):
+        l1_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        self.l2.delete_many(keys, version=version)
+        self.l1.invalidate(l1_keys)
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.invalidate(None)
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def stats(self):
+        """
+        Hits, misses and hit ratio per tier for this process.
+        """
+        with self.l1.lock:
+            counts = dict(self.l1.counts)
+        stats = {}
+        for tier in ("l1", "l2"):
+            hits, misses = counts[tier + ".hit"], counts[tier + ".miss"]
+            stats[tier] = {"hits": hits, "misses": misses, "ratio": hits / (hits + misses) if hits + misses else 0.0}
+        return stats
@@ -0,0 +1,18 @@
+# Django imports
+from django.db.backends.postgresql import base
+
+# Project imports
+from webapp.db.backends.pooled import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    ``django.db.backends.postgresql`` with pooled connections. Selected by ``postgrespool://`` URLs.
+    """
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # A pooled connection keeps the isolation level it was opened with, but this wrapper
+        # may not be the one that opened it.
+        self.isolation_level = self.settings_dict["OPTIONS"].get("isolation_level", connection.isolation_level)
+        return connection
@@ -0,0 +1,12 @@
+# Django imports
+from django.db.backends.sqlite3 import base
+
+# Project imports
+from webapp.db.backends.pooled import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    ``django.db.backends.sqlite3`` with pooled connections. Selected by ``sqlitepool://`` URLs,
+    mostly to exercise the pool without a Postgres server.
+    """
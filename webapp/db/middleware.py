@@ -0,0 +1,127 @@
+# Python imports
+import asyncio
+import contextvars
+from typing import List, Optional
+
+# Django imports
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Project imports
+from webapp.db.routers import replica_reads_enabled
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaMiddleware:
+    """
+    Serves safe requests to the views in ``REPLICA_READ_VIEWS`` (``app_name:url_name``) from a
+    read replica.
+
+    A successful unsafe request sets the ``REPLICA_PIN_COOKIE`` cookie for ``REPLICA_PIN_SECONDS``,
+    and requests carrying it read from the primary, so a client always sees its own writes even
+    while replicas catch up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = replica_reads_enabled.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads_enabled.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = replica_reads_enabled.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads_enabled.reset(token)
+        return self.pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS or settings.REPLICA_PIN_COOKIE in request.COOKIES:
+            return None
+        if request.resolver_match.view_name in settings.REPLICA_READ_VIEWS:
+            replica_reads_enabled.set(True)
+        return None
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and settings.DATABASE_REPLICAS:
+            response.set_cookie(settings.REPLICA_PIN_COOKIE, "1", max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite="Lax", secure=request.is_secure())
+        return response
+
+
+# [count] of the current request's queries; a list so threads running its sync_to_async parts share it
+query_count: contextvars.ContextVar[Optional[List[int]]] = contextvars.ContextVar("query_count", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = query_count.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def instrument(connection, **kwargs):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+class QueryCountMiddleware:
+    """
+    Adds the number of SQL queries a request ran, on every database, as the ``X-DB-Queries``
+    response header, for load tests (``QUERY_COUNT_HEADER``). Queries a streaming response runs
+    while it is being sent are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+    header = "X-DB-Queries"
+
+    def __init__(self, get_response):
+        if not settings.QUERY_COUNT_HEADER:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        # Connections are per thread, so each one is instrumented as it is opened
+        connection_created.connect(instrument)
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        for alias in connections:
+            instrument(connections[alias])
+        counter = [0]
+        token = query_count.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            query_count.reset(token)
+        response[self.header] = str(counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter = [0]
+        token = query_count.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_count.reset(token)
+        response[self.header] = str(counter[0])
+        return response
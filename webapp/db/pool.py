@@ -0,0 +1,208 @@
+"""
+A bounded, thread safe pool of DB-API connections shared by every thread of a worker.
+
+Django keeps one connection per thread; with gthread workers that is either a connection per
+request slot held open by ``CONN_MAX_AGE`` or a reconnect on every request. The pooled backends in
+``webapp.db.backends`` hand Django a connection from a ``ConnectionPool`` instead and give it back
+when Django closes it, so a process never holds more than ``max_size`` connections.
+"""
+# Python imports
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+# Django imports
+from statsd.defaults.django import statsd
+
+logger = logging.getLogger(__name__)
+
+_pools: Dict[Any, "ConnectionPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    """
+    No connection became free within the checkout timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    Keeps between ``min_size`` and ``max_size`` connections. ``checkout`` waits up to ``timeout``
+    seconds for a free one and, with ``check``, runs ``SELECT 1`` on it first so a connection
+    the server dropped is replaced instead of failing the request. Idle connections above
+    ``min_size`` are closed after ``max_idle`` seconds.
+    """
+
+    def __init__(self, name, min_size=0, max_size=10, timeout=5.0, check=True, max_idle=300.0):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check = check
+        self.max_idle = max_idle
+        self._idle = []  # (connection, returned_at), most recently returned last
+        self._size = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+
+    def checkout(self, connect):
+        """
+        Return a connection, opening one with ``connect()`` while the pool is below ``max_size``.
+        """
+        start = time.monotonic()
+        deadline = start + self.timeout
+        self._fill(connect)
+        while True:
+            connection = self._acquire(deadline)
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif self.check and not self._is_alive(connection):
+                statsd.incr("db.pool.{}.discarded".format(self.name))
+                self._discard(connection)
+                continue
+            break
+        statsd.timing("db.pool.{}.checkout".format(self.name), (time.monotonic() - start) * 1000)
+        self._report()
+        return connection
+
+    def checkin(self, connection):
+        """
+        Give a connection back. Anything it left uncommitted is rolled back; a connection that
+        cannot even do that is closed instead of going back to the pool.
+        """
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        now = time.monotonic()
+        with self._condition:
+            self._idle.append((connection, now))
+            expired: List[Any] = []
+            while self._size - len(expired) > self.min_size and self._idle[0][1] < now - self.max_idle:
+                expired.append(self._idle.pop(0)[0])
+            self._size -= len(expired)
+            self._condition.notify()
+        for stale in expired:
+            _close(stale)
+        self._report()
+
+    def close(self):
+        """
+        Close every idle connection. Connections still checked out are closed when returned.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self.min_size = 0
+            self.max_idle = -1
+        for connection, _ in idle:
+            _close(connection)
+
+    def stats(self):
+        with self._condition:
+            return {"size": self._size, "idle": len(self._idle), "in_use": self._size - len(self._idle),
+                    "waiting": self._waiting}
+
+    def _acquire(self, deadline):
+        """
+        Pop an idle connection, or reserve a slot for a new one and return ``None``.
+        """
+        with self._condition:
+            while True:
+                if self._idle:
+                    return self._idle.pop()[0]
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    statsd.incr("db.pool.{}.timeout".format(self.name))
+                    raise PoolTimeout("No database connection free in pool '{}' after {}s".format(
+                        self.name, self.timeout))
+                self._waiting += 1
+                try:
+                    self._condition.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+    def _fill(self, connect):
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = connect()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._condition:
+                self._idle.insert(0, (connection, time.monotonic()))
+                self._condition.notify()
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _discard(self, connection):
+        _close(connection)
+        self._release_slot()
+
+    def _is_alive(self, connection):
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT 1")
+            finally:
+                cursor.close()
+            connection.rollback()
+        except Exception as e:
+            logger.warning("Dropping dead connection from pool '{}': {}".format(self.name, str(e)))
+            return False
+        return True
+
+    def _report(self):
+        stats = self.stats()
+        for key in ("size", "idle", "in_use", "waiting"):
+            statsd.gauge("db.pool.{}.{}".format(self.name, key), stats[key])
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def get_pool(key, name, **options):
+    """
+    Return the process wide pool for ``key``, creating it with ``options`` on first use.
+    """
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(name, **options)
+    return pool
+
+
+def close_pools():
+    """
+    Close and forget every pool. Called after fork so workers never share sockets with the master.
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
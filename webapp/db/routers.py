@@ -0,0 +1,124 @@
+"""
+Send the reads of read-only requests to replicas.
+
+``ReplicaRouter`` only routes reads to a replica while ``replica_reads()`` is active, which
+``webapp.db.middleware.ReplicaMiddleware`` does for the views in ``REPLICA_READ_VIEWS``. Writes,
+and every read outside those views, go to ``default``. A replica that is more than
+``REPLICA_MAX_LAG`` seconds behind, or cannot be asked, is left out until it catches up.
+"""
+# Python imports
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+# Django imports
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from statsd.defaults.django import statsd
+
+logger = logging.getLogger(__name__)
+
+replica_reads_enabled = ContextVar("replica_reads", default=False)
+
+_lag: Dict[str, Tuple[float, Optional[float]]] = {}  # alias -> (checked_at, seconds behind or None)
+_lag_lock = threading.Lock()
+
+_LAG_QUERIES = {
+    "postgresql": "SELECT CASE WHEN pg_is_in_recovery() "
+                  "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) ELSE 0 END",
+}
+
+
+@contextmanager
+def replica_reads():
+    """
+    Let reads in this context go to a replica.
+    """
+    token = replica_reads_enabled.set(True)
+    try:
+        yield
+    finally:
+        replica_reads_enabled.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Send reads in this context to the primary, even inside ``replica_reads()``.
+    """
+    token = replica_reads_enabled.set(False)
+    try:
+        yield
+    finally:
+        replica_reads_enabled.reset(token)
+
+
+def replica_lag(alias):
+    """
+    Seconds the replica is behind the primary, or ``None`` when it cannot be measured.
+    Backends without a lag query (SQLite in tests) report 0.
+    """
+    query = _LAG_QUERIES.get(connections[alias].vendor)
+    if query is None:
+        return 0.0
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(query)
+            return float(cursor.fetchone()[0])
+    except Exception as e:
+        logger.warning("Couldn't read replication lag of {} : {}".format(alias, str(e)))
+        return None
+
+
+def healthy_replicas():
+    """
+    Replicas within ``REPLICA_MAX_LAG``. Each one's lag is measured at most once per
+    ``REPLICA_LAG_CHECK_INTERVAL`` seconds per process.
+    """
+    now = time.monotonic()
+    healthy = []
+    for alias in settings.DATABASE_REPLICAS:
+        checked_at, lag = _lag.get(alias, (None, None))
+        if checked_at is None or now - checked_at > settings.REPLICA_LAG_CHECK_INTERVAL:
+            lag = replica_lag(alias)
+            with _lag_lock:
+                _lag[alias] = (now, lag)
+            if lag is not None:
+                statsd.gauge("db.replica.{}.lag".format(alias), lag)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG:
+            healthy.append(alias)
+    return healthy
+
+
+def reset_lag():
+    with _lag_lock:
+        _lag.clear()
+
+
+class ReplicaRouter:
+    """
+    Database router for ``DATABASES`` with read replicas listed in ``DATABASE_REPLICAS``.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads_enabled.get() or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        replicas = healthy_replicas()
+        if not replicas:
+            statsd.incr("db.replica.fallback")
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
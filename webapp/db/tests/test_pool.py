@@ -0,0 +1,96 @@
+# Python imports
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+import environ
+
+# Django imports
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+# Project imports
+from webapp.db.pool import ConnectionPool, PoolTimeout, close_pools
+
+
+def connect():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def test_checkin_reuses_connection(self):
+        pool = ConnectionPool("test", max_size=2)
+        connection = pool.checkout(connect)
+        pool.checkin(connection)
+        self.assertIs(pool.checkout(connect), connection)
+        self.assertEqual(pool.stats(), {"size": 1, "idle": 0, "in_use": 1, "waiting": 0})
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = ConnectionPool("test", max_size=1, timeout=0.05)
+        pool.checkout(connect)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(connect)
+
+    def test_waiting_thread_gets_returned_connection(self):
+        pool = ConnectionPool("test", max_size=1, timeout=5)
+        connection = pool.checkout(connect)
+        received = []
+        waiter = threading.Thread(target=lambda: received.append(pool.checkout(connect)))
+        waiter.start()
+        pool.checkin(connection)
+        waiter.join(5)
+        self.assertEqual(received, [connection])
+
+    def test_dead_connection_is_replaced(self):
+        pool = ConnectionPool("test", max_size=1)
+        connection = pool.checkout(connect)
+        pool.checkin(connection)
+        connection.close()
+        replacement = pool.checkout(connect)
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_min_size_is_opened_up_front(self):
+        pool = ConnectionPool("test", min_size=2, max_size=3)
+        pool.checkout(connect)
+        self.assertEqual(pool.stats(), {"size": 2, "idle": 1, "in_use": 1, "waiting": 0})
+
+
+class PooledBackendTestCase(SimpleTestCase):
+    def setUp(self):
+        path = Path(tempfile.mkdtemp()) / "pooled.sqlite3"
+        url = "sqlitepool:///{}?pool_max_size=1&pool_timeout=0.05".format(path)
+        self.connections = ConnectionHandler({"default": environ.Env.db_url_config(url)})
+        self.addCleanup(close_pools)
+        self.addCleanup(self.connections.close_all)
+
+    def test_url_selects_pooled_backend(self):
+        settings_dict = self.connections["default"].settings_dict
+        self.assertEqual(settings_dict["ENGINE"], "webapp.db.backends.sqlite3")
+        self.assertEqual(settings_dict["CONN_MAX_AGE"], 0)
+
+    def test_closed_connection_goes_back_to_pool(self):
+        connection = self.connections["default"]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        raw = connection.connection
+        connection.close()
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
+
+    def test_exhausted_pool_raises_operational_error(self):
+        self.connections["default"].ensure_connection()
+        errors = []
+
+        def use_other_thread():
+            try:
+                self.connections["default"].ensure_connection()
+            except OperationalError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=use_other_thread)
+        thread.start()
+        thread.join(5)
+        self.assertEqual(len(errors), 1)
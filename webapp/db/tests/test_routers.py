@@ -0,0 +1,97 @@
+# Python imports
+import base64
+from typing import Any, Dict
+from unittest import mock
+
+# Django imports
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# Project imports
+from product.models import Product
+from webapp.db import routers
+from webapp.db.middleware import query_count
+from webapp.users.models import User
+
+
+@override_settings(DATABASE_REPLICAS=["default"], REPLICA_MAX_LAG=2.0, REPLICA_LAG_CHECK_INTERVAL=60)
+class ReplicaRouterTestCase(TestCase):
+    def setUp(self):
+        routers.reset_lag()
+        self.addCleanup(routers.reset_lag)
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_use_primary_outside_replica_reads(self):
+        with mock.patch.object(routers, "healthy_replicas") as healthy_replicas:
+            self.assertEqual(self.router.db_for_read(Product), "default")
+        healthy_replicas.assert_not_called()
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        with override_settings(DATABASE_REPLICAS=["replica_0"]), routers.replica_reads():
+            with mock.patch.object(routers, "replica_lag", return_value=0.5):
+                self.assertEqual(self.router.db_for_read(Product), "replica_0")
+            routers.reset_lag()
+            with mock.patch.object(routers, "replica_lag", return_value=30.0):
+                self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_lag_is_measured_once_per_interval(self):
+        with mock.patch.object(routers, "replica_lag", return_value=0.0) as replica_lag:
+            routers.healthy_replicas()
+            routers.healthy_replicas()
+        self.assertEqual(replica_lag.call_count, 1)
+
+
+@override_settings(DATABASE_REPLICAS=["default"], REPLICA_PIN_SECONDS=5)
+class ReplicaMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                              first_name="owner", last_name="user")
+        self.product = Product.objects.create(owner_user=self.owner, name="name", description="description",
+                                              sku="sku-1", manufacturer="manufacturer", quantity=1)
+        token = base64.b64encode(b"owner@example.com:testpassword").decode()
+        self.auth: Dict[str, Any] = {"HTTP_AUTHORIZATION": "Basic {}".format(token)}
+        self.client = Client()
+
+    def get_product(self):
+        with mock.patch.object(routers, "healthy_replicas", return_value=["default"]) as healthy_replicas:
+            response = self.client.get(reverse("product:product_get", kwargs={"id": self.product.id}), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return healthy_replicas.called
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertTrue(self.get_product())
+        self.assertFalse(routers.replica_reads_enabled.get())
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.patch(reverse("product:product_get", kwargs={"id": self.product.id}),
+                                     data={"quantity": 2}, content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.cookies["db_primary_pin"]["max-age"], 5)
+        self.assertFalse(self.get_product())
+
+        self.client.cookies.clear()
+        self.assertTrue(self.get_product())
+
+
+@override_settings(QUERY_COUNT_HEADER=True)
+class QueryCountMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                              first_name="owner", last_name="user")
+        token = base64.b64encode(b"owner@example.com:testpassword").decode()
+        self.auth: Dict[str, Any] = {"HTTP_AUTHORIZATION": "Basic {}".format(token)}
+
+    def test_header_counts_the_request_queries(self):
+        url = reverse("user:details", kwargs={"userId": self.owner.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-DB-Queries"], str(len(queries)))
+        self.assertGreater(len(queries), 0)
+        self.assertIsNone(query_count.get())
+
+    @override_settings(QUERY_COUNT_HEADER=False)
+    def test_off_by_default(self):
+        self.assertNotIn("X-DB-Queries", self.client.get("/healthz"))
@@ -0,0 +1,85 @@
+"""
+Token buckets for ``webapp.ratelimit.middleware``.
+
+A bucket holds up to ``limit`` tokens and refills at ``limit / period`` tokens per second; every
+request takes one. ``take`` answers ``(allowed, remaining, retry_after)``, where ``retry_after`` is
+the seconds until the next token when the request was refused.
+
+``RedisBuckets`` keeps the buckets in Redis and updates them with a single Lua script, so every
+worker on every host shares them and a take is one round trip. ``LocalBuckets`` keeps them in the
+process; it is used when no Redis is configured and for any request Redis fails to answer.
+"""
+# Python imports
+import collections
+import threading
+import time
+
+# Refill, take one token if there is one, and store the bucket until it would be full anyway.
+# Redis' clock is used, so every host agrees on how much has refilled.
+TAKE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or limit
+local at = tonumber(bucket[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - at) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((limit - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+def retry_after(tokens, rate):
+    return (1 - tokens) / rate if tokens < 1 else 0.0
+
+
+class LocalBuckets:
+    """
+    Buckets in a bounded, least recently used dict of this process.
+    """
+
+    def __init__(self, max_entries=10000, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, limit, period):
+        rate = limit / period
+        now = self.clock()
+        with self._lock:
+            tokens, at = self._buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + max(0.0, now - at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, int(tokens), retry_after(tokens, rate)
+
+
+class RedisBuckets:
+    """
+    Buckets in Redis, taken from atomically by ``TAKE_SCRIPT``.
+    """
+
+    def __init__(self, location, timeout=0.05):
+        # redis is only needed where this backend is configured
+        import redis
+
+        self.client = redis.Redis.from_url(location, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, limit, period):
+        rate = limit / period
+        allowed, tokens = self.script(keys=[key], args=[limit, rate])
+        tokens = float(tokens)
+        return bool(allowed), int(tokens), retry_after(tokens, rate)
@@ -0,0 +1,158 @@
+# Python imports
+import asyncio
+import base64
+import binascii
+import logging
+import math
+import threading
+import time
+
+# Django imports
+from django.conf import settings
+from statsd.defaults.django import statsd
+
+# Rest framework imports
+from rest_framework import status
+from rest_framework.authentication import get_authorization_header
+
+# Project imports
+from webapp.ratelimit.buckets import LocalBuckets, RedisBuckets
+from webapp.users.authentication import cached_login
+from webapp.users.utils import json_response
+
+logger = logging.getLogger(__name__)
+
+_local = None
+_redis = None
+# Redis is skipped until this time.monotonic() value once it failed
+_redis_down_until = 0.0
+_lock = threading.Lock()
+
+
+def local_buckets():
+    global _local
+    with _lock:
+        if _local is None:
+            _local = LocalBuckets(settings.RATELIMIT_LOCAL_MAX_ENTRIES)
+        return _local
+
+
+def redis_buckets():
+    global _redis
+    if not settings.RATELIMIT_REDIS_URL:
+        return None
+    with _lock:
+        if _redis is None:
+            _redis = RedisBuckets(settings.RATELIMIT_REDIS_URL, settings.RATELIMIT_REDIS_TIMEOUT)
+        return _redis
+
+
+def reset_buckets():
+    """
+    Drop the process' buckets and Redis connection. Called after fork and between tests.
+    """
+    global _local, _redis, _redis_down_until
+    with _lock:
+        _local = _redis = None
+        _redis_down_until = 0.0
+
+
+def take(key, limit, period):
+    """
+    Take a token from the shared bucket, or from this process' bucket while Redis is unreachable.
+    After a failure Redis is left alone for ``RATELIMIT_REDIS_COOLDOWN`` seconds, so an outage costs
+    one timeout and one warning per cooldown instead of one per request.
+    """
+    global _redis_down_until
+    buckets = redis_buckets()
+    if buckets is not None and time.monotonic() >= _redis_down_until:
+        try:
+            return buckets.take(key, limit, period)
+        except Exception as e:
+            with _lock:
+                first = time.monotonic() >= _redis_down_until
+                _redis_down_until = time.monotonic() + settings.RATELIMIT_REDIS_COOLDOWN
+            if first:
+                logger.warning("Rate limiting in process for {}s, Redis failed : {}".format(
+                    settings.RATELIMIT_REDIS_COOLDOWN, str(e)))
+    if buckets is not None:
+        statsd.incr("ratelimit.fallback")
+    return local_buckets().take(key, limit, period)
+
+
+def client_key(request):
+    """
+    ``user:<username>`` when the request's Basic credentials are a cached login, ``ip:<address>``
+    otherwise. Credentials that were never verified must not spend a real user's tokens.
+    """
+    try:
+        auth = get_authorization_header(request).split()
+        if len(auth) == 2 and auth[0].lower() == b"basic":
+            userid, _, password = base64.b64decode(auth[1]).decode("utf-8").partition(":")
+            if cached_login(userid, password) is not None:
+                return "user:{}".format(userid)
+    except (binascii.Error, UnicodeDecodeError):
+        pass
+    address = request.META.get(settings.RATELIMIT_IP_HEADER, "")
+    # The last entry of X-Forwarded-For is the one our own proxy added
+    return "ip:{}".format(address.split(",")[-1].strip())
+
+
+class RateLimitMiddleware:
+    """
+    Token bucket rate limits per client and per view, for the views in ``RATELIMITS``
+    (``app_name:url_name`` mapped to ``{"limit": tokens, "period": seconds}``, optionally limited
+    to some ``methods``).
+
+    A refused request gets a 429 with ``Retry-After``. Every limited response carries
+    ``RateLimit-Limit``, ``RateLimit-Remaining``, ``RateLimit-Reset`` and ``RateLimit-Policy``
+    headers, and statsd counts ``ratelimit.<url_name>.allowed`` and ``ratelimit.<url_name>.limited``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_headers(request, await self.get_response(request))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATELIMIT_ENABLED:
+            return None
+        view_name = request.resolver_match.view_name
+        rule = settings.RATELIMITS.get(view_name)
+        if rule is None or request.method not in rule.get("methods", (request.method,)):
+            return None
+
+        limit, period = rule["limit"], rule["period"]
+        allowed, remaining, retry_after = take("ratelimit:{}:{}".format(view_name, client_key(request)),
+                                               limit, period)
+        request.ratelimit = {
+            "RateLimit-Limit": limit,
+            "RateLimit-Remaining": remaining,
+            # Seconds until the bucket is full again
+            "RateLimit-Reset": math.ceil((limit - remaining) * period / limit),
+            "RateLimit-Policy": "{};w={}".format(limit, period),
+        }
+        statsd.incr("ratelimit.{}.{}".format(view_name.replace(":", "."), "allowed" if allowed else "limited"))
+        if allowed:
+            return None
+        # Counted in statsd rather than logged, a flood must not become a flood of log lines
+        return json_response(False, "Too many requests, retry in {} seconds".format(math.ceil(retry_after)),
+                             status.HTTP_429_TOO_MANY_REQUESTS,
+                             headers={"Retry-After": math.ceil(retry_after)}, log_level=None)
+
+    def add_headers(self, request, response):
+        for name, value in getattr(request, "ratelimit", {}).items():
+            response[name] = value
+        return response
@@ -0,0 +1,106 @@
+# Python imports
+import base64
+import time
+from unittest import mock
+
+# Django imports
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import ResolverMatch, reverse
+
+# Project imports
+from webapp.ratelimit import middleware
+from webapp.ratelimit.buckets import LocalBuckets
+from webapp.users.models import User
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "ratelimit-tests"}
+
+
+class LocalBucketsTestCase(SimpleTestCase):
+    def test_bucket_empties_and_refills(self):
+        now = [0.0]
+        buckets = LocalBuckets(clock=lambda: now[0])
+        self.assertEqual([buckets.take("key", 2, 10)[:2] for _ in range(3)], [(True, 1), (True, 0), (False, 0)])
+        self.assertAlmostEqual(buckets.take("key", 2, 10)[2], 5)
+
+        now[0] = 5
+        self.assertTrue(buckets.take("key", 2, 10)[0])
+        self.assertTrue(buckets.take("other", 2, 10)[0])
+
+    def test_least_recently_used_buckets_are_dropped(self):
+        buckets = LocalBuckets(max_entries=2)
+        for key in ("a", "b", "c"):
+            buckets.take(key, 1, 60)
+        self.assertEqual(list(buckets._buckets), ["b", "c"])
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMITS={"user:login": {"limit": 2, "period": 60}},
+                   CACHES={"default": LOCMEM, "shared": LOCMEM})
+class RateLimitMiddlewareTestCase(TestCase):
+    def setUp(self):
+        middleware.reset_buckets()
+        self.addCleanup(middleware.reset_buckets)
+        caches["default"].clear()
+
+    def login(self, **extra):
+        return self.client.post(reverse("user:login"), data={"username": "nobody@example.com", "password": "x"},
+                                content_type="application/json", **extra)
+
+    def test_requests_over_the_limit_get_429(self):
+        first, second, third = self.login(), self.login(), self.login()
+        self.assertEqual([first.status_code, second.status_code], [401, 401])
+        self.assertEqual(first["RateLimit-Limit"], "2")
+        self.assertEqual(first["RateLimit-Remaining"], "1")
+        self.assertEqual(first["RateLimit-Policy"], "2;w=60")
+        self.assertEqual(third.status_code, 429)
+        self.assertEqual(third["Retry-After"], "30")
+        self.assertEqual(third["RateLimit-Remaining"], "0")
+
+        # Another client has its own bucket
+        self.assertEqual(self.login(REMOTE_ADDR="10.0.0.2").status_code, 401)
+
+    def test_views_without_a_limit_are_untouched(self):
+        response = self.client.get(reverse("user:details", kwargs={"userId": 1}))
+        self.assertFalse(response.has_header("RateLimit-Limit"))
+
+    @override_settings(RATELIMIT_REDIS_URL="redis://127.0.0.1:1/0")
+    def test_unreachable_redis_falls_back_to_process_buckets(self):
+        self.assertEqual([self.login().status_code for _ in range(3)], [401, 401, 429])
+
+    @override_settings(RATELIMIT_REDIS_URL="redis://127.0.0.1:1/0", RATELIMIT_REDIS_COOLDOWN=60)
+    def test_failed_redis_is_skipped_for_the_cooldown(self):
+        with mock.patch.object(middleware.redis_buckets(), "take", side_effect=ConnectionError("timed out")) as take, \
+                self.assertLogs("webapp.ratelimit.middleware", "WARNING") as logs:
+            for _ in range(5):
+                middleware.take("key", 10, 60)
+        self.assertEqual(take.call_count, 1)
+        self.assertEqual(len(logs.records), 1)
+
+        with mock.patch.object(middleware.time, "monotonic", return_value=time.monotonic() + 61), \
+                mock.patch.object(middleware.redis_buckets(), "take", return_value=(True, 9, 0)) as take:
+            self.assertEqual(middleware.take("key", 10, 60), (True, 9, 0))
+        self.assertEqual(take.call_count, 1)
+
+    def test_cached_logins_are_limited_per_user(self):
+        user = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                        first_name="owner", last_name="user")
+        token = base64.b64encode(b"owner@example.com:testpassword").decode()
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Basic {}".format(token))
+        self.assertEqual(middleware.client_key(request), "ip:127.0.0.1")
+
+        self.client.get(reverse("user:details", kwargs={"userId": user.id}), HTTP_AUTHORIZATION=request.META[
+            "HTTP_AUTHORIZATION"])
+        self.assertEqual(middleware.client_key(request), "user:owner@example.com")
+
+        wrong = base64.b64encode(b"owner@example.com:wrong").decode()
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Basic {}".format(wrong))
+        self.assertEqual(middleware.client_key(request), "ip:127.0.0.1")
+
+    def test_overhead_is_well_under_a_millisecond(self):
+        request = RequestFactory().post(reverse("user:login"))
+        request.resolver_match = ResolverMatch(lambda request: None, (), {}, url_name="login", namespaces=["user"])
+        limiter = middleware.RateLimitMiddleware(lambda request: None)
+        started = time.perf_counter()
+        for _ in range(1000):
+            limiter.process_view(request, None, (), {})
+        self.assertLess((time.perf_counter() - started) / 1000, 0.0002)
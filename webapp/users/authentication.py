@@ -0,0 +1,96 @@
+# Python imports
+import hashlib
+import hmac
+import logging
+import uuid
+
+# Django imports
+from django.conf import settings
+from django.core.cache import caches
+from statsd.defaults.django import statsd
+
+# Rest framework imports
+from rest_framework.authentication import BasicAuthentication
+
+logger = logging.getLogger(__name__)
+
+
+def credentials_key(userid, password):
+    """
+    Cache key for a username/password pair. Keyed with SECRET_KEY so the cache never holds
+    anything that can be checked against a guessed password.
+    """
+    digest = hmac.new(settings.SECRET_KEY.encode(), "{}:{}".format(userid, password).encode(), hashlib.sha256)
+    return "auth:{}".format(digest.hexdigest())
+
+
+def generation_key(userid):
+    return "auth-generation:{}".format(hashlib.sha256(str(userid).encode()).hexdigest())
+
+
+def credentials_generation(userid):
+    """
+    The user's current credentials generation, started afresh when missing. A cached login is
+    only valid for the generation it was stored under. Generations live in the cluster wide
+    ``AUTH_GENERATION_CACHE_ALIAS``, so a change on one node retires the logins every node cached.
+    ``None`` while that cache is unavailable, which leaves every login uncached.
+    """
+    cache = caches[settings.AUTH_GENERATION_CACHE_ALIAS]
+    key = generation_key(userid)
+    try:
+        generation = cache.get(key)
+        if generation is None:
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            generation = cache.get(key)
+    except Exception as e:
+        logger.warning("Not caching logins, the generation cache is unavailable : {}".format(e))
+        return None
+    return generation
+
+
+def cached_login(userid, password):
+    """
+    The user a cached login of these credentials belongs to, or ``None`` when there is none.
+    Never touches the database or hashes the password.
+    """
+    cached = caches[settings.AUTH_CACHE_ALIAS].get(credentials_key(userid, password))
+    if cached is None:
+        return None
+    try:
+        generation = caches[settings.AUTH_GENERATION_CACHE_ALIAS].get(generation_key(userid))
+    except Exception:
+        return None
+    if generation is not None and cached[0] == generation:
+        return cached[1]
+    return None
+
+
+def invalidate_credentials(userid):
+    """
+    Forget every cached login of the user, e.g. after a password change.
+    """
+    caches[settings.AUTH_GENERATION_CACHE_ALIAS].delete(generation_key(userid))
+
+
+class CachedBasicAuthentication(BasicAuthentication):
+    """
+    ``BasicAuthentication`` that remembers successful logins in ``AUTH_CACHE_ALIAS`` for
+    ``AUTH_CACHE_TIMEOUT`` seconds, so repeated requests skip the user lookup and the password hash.
+    Saving the user starts a new generation in ``AUTH_GENERATION_CACHE_ALIAS``, which drops every
+    login cached before it on every node.
+    """
+
+    def authenticate_credentials(self, userid, password, request=None):
+        cache = caches[settings.AUTH_CACHE_ALIAS]
+        key = credentials_key(userid, password)
+        generation = credentials_generation(userid)
+        cached = cache.get(key)
+        if generation is not None and cached is not None and cached[0] == generation:
+            statsd.incr("auth.cache.hit")
+            return cached[1], None
+
+        statsd.incr("auth.cache.miss")
+        user, auth = super().authenticate_credentials(userid, password, request)
+        if generation is not None:
+            cache.set(key, (generation, user), settings.AUTH_CACHE_TIMEOUT)
+        return user, auth
@@ -0,0 +1,38 @@
+# Django imports
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+# Project imports
+from .authentication import invalidate_credentials
+from .models import User
+from webapp.cache import negative
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, **kwargs):
+    """
+    Keep the stored username, so logins cached under it are dropped even if it changes.
+    """
+    if instance.pk is not None:
+        instance._stored_username = User.objects.filter(pk=instance.pk).values_list("username", flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def forget_missing_user(sender, instance, created, **kwargs):
+    if created:
+        negative.forget_missing(User, instance.id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_logins(sender, instance, **kwargs):
+    usernames = {instance.username, getattr(instance, "_stored_username", None)} - {None}
+
+    def invalidate():
+        for username in usernames:
+            invalidate_credentials(username)
+
+    # Once now, and again after commit in case a request cached the old row in between
+    invalidate()
+    transaction.on_commit(invalidate)
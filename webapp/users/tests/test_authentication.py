@@ -0,0 +1,69 @@
+# Python imports
+import base64
+from unittest import mock
+
+# Django imports
+from django.core.cache import caches
+from django.test import RequestFactory, TestCase, override_settings
+
+# Rest framework imports
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+# Project imports
+from webapp.users.authentication import CachedBasicAuthentication, generation_key
+from webapp.users.models import User
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "authentication-tests"}
+NODE = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "authentication-tests-node"}
+
+
+@override_settings(CACHES={"default": LOCMEM, "shared": NODE})
+class CachedBasicAuthenticationTestCase(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        caches["shared"].clear()
+        self.user = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                             first_name="owner", last_name="user")
+        self.authentication = CachedBasicAuthentication()
+
+    def authenticate(self, password):
+        token = base64.b64encode("owner@example.com:{}".format(password).encode()).decode()
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Basic {}".format(token))
+        return self.authentication.authenticate(Request(request))
+
+    def test_repeated_login_skips_database(self):
+        self.assertEqual(self.authenticate("testpassword")[0], self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate("testpassword")[0], self.user)
+
+    def test_wrong_password_is_not_cached(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate("wrong")
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate("wrong")
+
+    def test_password_change_drops_cached_login(self):
+        self.authenticate("testpassword")
+        self.user.set_password("newpassword")
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate("testpassword")
+        self.assertEqual(self.authenticate("newpassword")[0], self.user)
+
+    def test_password_change_on_another_node_drops_cached_login(self):
+        self.authenticate("testpassword")
+        self.assertIsNone(caches["shared"].get(generation_key("owner@example.com")))
+        # Another node saves the user: only the cluster wide generation changes
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        caches["default"].delete(generation_key("owner@example.com"))
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate("testpassword")
+
+    def test_unavailable_generation_cache_authenticates_against_the_database(self):
+        with mock.patch.object(caches["default"], "get", side_effect=ConnectionError("Redis is down")), \
+                self.assertLogs("webapp.users.authentication", "WARNING"):
+            self.assertEqual(self.authenticate("testpassword")[0], self.user)
+        self.assertEqual(self.authenticate("testpassword")[0], self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate("testpassword")[0], self.user)
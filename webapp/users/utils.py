@@ -1,8 +1,12 @@
 # Python Imports
 import logging
 
+# Django imports
+from django.http import HttpResponse, JsonResponse
+
 # Rest framework imports
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.utils.serializer_helpers import ReturnDict
 
 logger = logging.getLogger(__name__)
@@ -22,6 +26,27 @@ def response(status: bool, message: str, status_code: int, data=None, headers=No
     if headers is None:
         headers = {}
 
+    return Response(_payload(message, status_code, data, show_data, log_level), status=status_code, headers=headers)
+
+
+def json_response(status: bool, message: str, status_code: int, data=None, headers=None, show_data=False,
+                  log_level="error"):
+    """
+    Same as ``response`` for views that run outside rest framework (the async views),
+    rendered straight to JSON with rest framework's encoder.
+    """
+    payload = _payload(message, status_code, data, show_data, log_level)
+    if payload is None:
+        # Rest framework renders an empty body for a None payload
+        http_response = HttpResponse(status=status_code, content_type="application/json")
+    else:
+        http_response = JsonResponse(payload, status=status_code, encoder=JSONEncoder, safe=False)
+    for name, value in (headers or {}).items():
+        http_response[name] = value
+    return http_response
+
+
+def _payload(message, status_code, data, show_data, log_level):
     if log_level == "error":
         logger.error("{} - {}".format(message, status_code))
     elif log_level == "info":
@@ -29,4 +54,4 @@ def response(status: bool, message: str, status_code: int, data=None, headers=No
 
     message = message if type(message) in [ReturnDict, list] else {"message": message}
 
-    return Response(data if data or show_data else message, status=status_code, headers=headers)
+    return data if data or show_data else message
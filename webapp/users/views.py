@@ -5,21 +5,21 @@ import logging
 # Django imports
 from django.contrib.auth import authenticate
 from django.db import transaction
-from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
 from statsd.defaults.django import statsd
 
 # Rest framework Imports
 from rest_framework import status, generics
-from rest_framework.authentication import BasicAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
 # Project Imports
+from .authentication import CachedBasicAuthentication
 from .models import User
 from .serializers import UserCreateSerializer, UserUpdateSerializer, LoginSerializer, CreateSwaggerSerializer, \
     LoginSwaggerSerializer
 from .utils import response
+from webapp.cache import negative
+from webapp.utils.swagger import openapi, swagger_auto_schema
 
 # To log the messages
 logger = logging.getLogger(__name__)
@@ -126,7 +126,7 @@ class Users(generics.GenericAPIView):
     """
 
     serializer_class = UserUpdateSerializer
-    authentication_classes = [BasicAuthentication]
+    authentication_classes = [CachedBasicAuthentication]
     permission_classes = [IsAuthenticated]
 
     @staticmethod
@@ -144,7 +144,8 @@ class Users(generics.GenericAPIView):
 
         try:
             statsd.incr("user_get")
-            if not User.objects.filter(id=kwargs['userId']).exists():
+            # The requesting user exists, any other id goes through the negative cache
+            if not kwargs['userId'] == request.user.id and not negative.exists(User, kwargs['userId']):
                 return response(False, "User {} does not exist".format(kwargs['userId']), status.HTTP_404_NOT_FOUND)
 
             if not kwargs['userId'] == request.user.id:
@@ -0,0 +1,82 @@
+"""
+Counts what a request costs, for the per-endpoint budgets in webapp/utils/tests/test_budgets.py.
+
+``measure()`` records every SQL query on every database, every S3/SNS call made through the
+stand-ins from product.standins and every password hash computed or checked, and
+``check_budget()`` fails with the offending queries and calls when a request goes over its budget.
+"""
+# Python imports
+import contextlib
+from typing import Callable, List
+from unittest import mock
+
+# Django imports
+from django.contrib.auth.hashers import get_hashers
+from django.db import connections
+
+# Project imports
+from product.standins import StandInClient
+
+
+class Usage:
+    def __init__(self):
+        self.queries = []
+        self.external = []
+        self.hashes = 0
+
+    def counts(self):
+        return {"queries": len(self.queries), "external": len(self.external), "hashes": self.hashes}
+
+
+@contextlib.contextmanager
+def measure():
+    usage = Usage()
+
+    def record_query(execute, sql, params, many, context):
+        usage.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    call = StandInClient._call
+
+    def record_call(client, operation, **params):
+        usage.external.append("{}.{}".format(client.service_name, operation))
+        return call(client, operation, **params)
+
+    hashing: List[Callable] = []
+
+    def counted(method):
+        def hash_password(*args, **kwargs):
+            # Hashers verify by encoding again, which is the same hash
+            if not hashing:
+                usage.hashes += 1
+            hashing.append(method)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                hashing.pop()
+        return hash_password
+
+    with contextlib.ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(record_query))
+        stack.enter_context(mock.patch.object(StandInClient, "_call", record_call))
+        # get_hashers() caches its instances, so identify_hasher() and get_hasher() hand out these
+        for hasher in get_hashers():
+            stack.enter_context(mock.patch.object(hasher, "encode", counted(hasher.encode)))
+            stack.enter_context(mock.patch.object(hasher, "verify", counted(hasher.verify)))
+        yield usage
+
+
+def check_budget(name, usage, budget):
+    """
+    Raise ``AssertionError`` listing what ``name`` did when ``usage`` is over any limit in
+    ``budget`` (``{"queries": n, "external": n, "hashes": n}``).
+    """
+    counts = usage.counts()
+    over = ["{} {} > {}".format(key, counts[key], limit) for key, limit in budget.items() if counts[key] > limit]
+    if not over:
+        return
+    lines = ["{} is over budget: {}".format(name, ", ".join(over))]
+    lines.extend("  {}. {}".format(number, sql) for number, sql in enumerate(usage.queries, 1))
+    lines.extend("  {}".format(call) for call in usage.external)
+    raise AssertionError("\n".join(lines))
@@ -0,0 +1,166 @@
+# Python imports
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import socket
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Optional
+
+# Django imports
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+
+def shape(value, redacted=()):
+    """
+    The structure of a decoded body without its values: strings become ``"str:<length>"``, other
+    scalars their type name, lists the shape of their first item. Keys in ``redacted`` become
+    ``"redacted"`` so not even their length is kept.
+    """
+    if isinstance(value, dict):
+        return {str(key): "redacted" if key in redacted else shape(item, redacted) for key, item in value.items()}
+    if isinstance(value, list):
+        return [shape(value[0], redacted)] if value else []
+    if isinstance(value, str):
+        return "str:{}".format(len(value))
+    if value is None:
+        return "null"
+    return type(value).__name__
+
+
+def client_id(username):
+    """
+    A stable pseudonym for a user, so a capture keeps who made which requests without their name.
+    """
+    if not username:
+        return None
+    return hmac.new(settings.SECRET_KEY.encode(), username.encode(), hashlib.sha256).hexdigest()[:16]
+
+
+def basic_username(request):
+    auth = request.META.get("HTTP_AUTHORIZATION", "").split()
+    if len(auth) != 2 or auth[0].lower() != "basic":
+        return None
+    try:
+        return base64.b64decode(auth[1]).decode().partition(":")[0]
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+
+
+class CaptureMiddleware:
+    """
+    Writes a sanitized record of sampled API requests (``CAPTURE_SAMPLE_RATE``) to
+    ``CAPTURE_DIR/<host>-<pid>.ndjson``, rotated at ``CAPTURE_MAX_BYTES``, for benchmarks/replay.py.
+
+    A record holds the time, method, URL name, path parameters, the shape of the query string and
+    body (see ``shape``), the response status and how long it took. Credentials are never written:
+    the user is a keyed hash of the Basic auth (or login) username, fields in
+    ``CAPTURE_REDACTED_FIELDS`` lose even their length, and uploads are kept as content type and
+    size only. Only views in the ``CAPTURE_NAMESPACES`` URL namespaces are captured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.CAPTURE_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = settings.CAPTURE_SAMPLE_RATE
+        self.namespaces = set(settings.CAPTURE_NAMESPACES)
+        self.redacted = set(settings.CAPTURE_REDACTED_FIELDS)
+        self.handler: Optional[RotatingFileHandler] = None
+        self.pid = None
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        started, timestamp = time.perf_counter(), time.time()
+        data = self.json_body(request)
+        response = self.get_response(request)
+        self.record(request, response, data, timestamp, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+        started, timestamp = time.perf_counter(), time.time()
+        data = self.json_body(request)
+        response = await self.get_response(request)
+        self.record(request, response, data, timestamp, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def json_body(request):
+        """
+        The decoded JSON body, read before the view so it can still parse it from the cached copy.
+        """
+        if request.content_type != "application/json":
+            return None
+        try:
+            if int(request.META.get("CONTENT_LENGTH") or 0) > settings.CAPTURE_MAX_BODY:
+                return None
+            return json.loads(request.body)
+        except ValueError:
+            return None
+
+    def body_shape(self, request, data):
+        if data is not None:
+            return shape(data, self.redacted)
+        # Form bodies are left for the view to parse; DRF hands what it parsed back to the request
+        files = getattr(request, "_files", None)
+        form = getattr(request, "_post", None)
+        if not files and not form:
+            return None
+        body = shape(dict(form.items()), self.redacted) if form else {}
+        for field, upload in (files or {}).items():
+            body[field] = {"file": upload.content_type, "size": upload.size}
+        return body
+
+    def record(self, request, response, data, timestamp, elapsed):
+        match = getattr(request, "resolver_match", None)
+        if match is None or match.namespace not in self.namespaces:
+            return
+        username = basic_username(request)
+        if username is None and isinstance(data, dict) and isinstance(data.get("username"), str):
+            username = data["username"]
+        entry = {
+            "ts": round(timestamp, 6),
+            "method": request.method,
+            "view": match.view_name,
+            "params": match.kwargs,
+            "query": shape(dict(request.GET.items()), self.redacted) if request.GET else None,
+            "body": self.body_shape(request, data),
+            "client": client_id(username),
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 2),
+        }
+        try:
+            self.write(json.dumps(entry))
+        except (OSError, TypeError, ValueError) as e:
+            logger.error("Couldn't capture request : {}".format(str(e)))
+
+    def write(self, line):
+        # gunicorn forks workers from a preloaded app, so each process opens its own file
+        if self.handler is None or self.pid != os.getpid():
+            directory = Path(settings.CAPTURE_DIR)
+            directory.mkdir(parents=True, exist_ok=True)
+            self.pid = os.getpid()
+            self.handler = RotatingFileHandler(
+                directory / "{}-{}.ndjson".format(socket.gethostname(), self.pid),
+                maxBytes=settings.CAPTURE_MAX_BYTES, backupCount=settings.CAPTURE_BACKUP_COUNT, delay=True)
+        self.handler.handle(logging.makeLogRecord({"msg": line}))
@@ -0,0 +1,195 @@
+"""
+``Idempotency-Key`` support for POST views.
+
+A POST carrying the header runs once per key: its response is stored in ``IDEMPOTENCY_CACHE_ALIAS``
+for ``IDEMPOTENCY_TIMEOUT`` seconds and a retry with the same key gets that response back, marked
+``Idempotent-Replayed: true``, without running the view again. While the first request is still in
+progress a duplicate waits up to ``IDEMPOTENCY_WAIT`` seconds for its response, then gives up with
+a 409. When the cache cannot be reached the view runs without idempotency rather than failing.
+
+Keys are scoped by the Authorization header and the path, so clients cannot replay each other's
+responses, and the stored response remembers a digest of the request body: reusing a key for a
+different payload gets a 422 instead of the other payload's response. Responses worth retrying
+(401, 408, 409, 429 and 5xx) are not stored; a retry after one of them runs the view again.
+"""
+# Python imports
+import asyncio
+import functools
+import hashlib
+import hmac
+import logging
+import time
+
+# Django imports
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from rest_framework import status
+from statsd.defaults.django import statsd
+
+# Project imports
+from webapp.users.utils import json_response
+
+logger = logging.getLogger(__name__)
+
+HEADER = "HTTP_IDEMPOTENCY_KEY"
+IN_PROGRESS = "in-progress"
+POLL_INTERVAL = 0.05
+RETRYABLE_STATUSES = {401, 408, 409, 429}
+
+
+def idempotency_key(request):
+    """
+    Cache key of the request's ``Idempotency-Key``, or ``None`` when it has none.
+    """
+    key = request.META.get(HEADER)
+    if request.method != "POST" or not key:
+        return None
+    scope = "{}\n{}\n{}".format(request.META.get("HTTP_AUTHORIZATION", ""), request.path, key)
+    return "idempotency:{}".format(hmac.new(settings.SECRET_KEY.encode(), scope.encode(), hashlib.sha256).hexdigest())
+
+
+def fingerprint(request):
+    """
+    Digest of the request body. A multipart boundary is left out, clients pick a new one per attempt.
+    """
+    body = request.body
+    boundary = request.content_params.get("boundary") if request.content_type == "multipart/form-data" else None
+    if boundary:
+        body = body.replace(boundary.encode(), b"")
+    return hashlib.sha256(body).hexdigest()
+
+
+def stored(response):
+    """
+    What is kept of a response worth replaying, ``None`` for one worth retrying.
+    """
+    if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+        return None
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+    return {"status": response.status_code, "content": response.content,
+            "content_type": response.get("Content-Type")}
+
+
+def unavailable(reason):
+    statsd.incr("idempotency.unavailable")
+    logger.warning("Running without idempotency, the cache is unavailable : {}".format(reason))
+
+
+def claim(cache, key):
+    """
+    ``True`` when the in-progress marker was added for this request, ``False`` when another request
+    holds the key and ``None`` when the cache is unavailable: django_redis answers ``None`` instead
+    of raising when ``IGNORE_EXCEPTIONS`` is on.
+    """
+    try:
+        added = cache.add(key, IN_PROGRESS, settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    except Exception as e:
+        return unavailable(str(e))
+    return bool(added) if added is not None else unavailable("add returned None")
+
+
+async def aclaim(cache, key):
+    try:
+        added = await cache.aadd(key, IN_PROGRESS, settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    except Exception as e:
+        return unavailable(str(e))
+    return bool(added) if added is not None else unavailable("add returned None")
+
+
+def replay(entry):
+    statsd.incr("idempotency.replayed")
+    response = HttpResponse(entry["content"], status=entry["status"], content_type=entry["content_type"])
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def mismatch():
+    statsd.incr("idempotency.mismatch")
+    return json_response(False, "This Idempotency-Key was already used for a different request",
+                         status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+def answer(entry, digest):
+    """
+    The stored response when it was made for this request body, a 422 otherwise.
+    """
+    return replay(entry) if entry.get("fingerprint") == digest else mismatch()
+
+
+def conflict():
+    statsd.incr("idempotency.conflict")
+    return json_response(False, "A request with this Idempotency-Key is still in progress",
+                         status.HTTP_409_CONFLICT, headers={"Retry-After": 1})
+
+
+def idempotent(view):
+    """
+    Make the POSTs a view function handles idempotent. Works for sync and async views.
+    """
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            key = idempotency_key(request)
+            if key is None:
+                return await view(request, *args, **kwargs)
+            digest = fingerprint(request)
+            cache = caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+            deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+            added = await aclaim(cache, key)
+            while added is False:
+                entry = await cache.aget(key)
+                if isinstance(entry, dict):
+                    return answer(entry, digest)
+                if time.monotonic() > deadline:
+                    return conflict()
+                await asyncio.sleep(POLL_INTERVAL)
+                added = await aclaim(cache, key)
+            if added is None:
+                return await view(request, *args, **kwargs)
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                await cache.adelete(key)
+                raise
+            entry = stored(response)
+            if entry is None:
+                await cache.adelete(key)
+            else:
+                entry["fingerprint"] = digest
+                await cache.aset(key, entry, settings.IDEMPOTENCY_TIMEOUT)
+            return response
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = idempotency_key(request)
+            if key is None:
+                return view(request, *args, **kwargs)
+            digest = fingerprint(request)
+            cache = caches[settings.IDEMPOTENCY_CACHE_ALIAS]
+            deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+            added = claim(cache, key)
+            while added is False:
+                entry = cache.get(key)
+                if isinstance(entry, dict):
+                    return answer(entry, digest)
+                if time.monotonic() > deadline:
+                    return conflict()
+                time.sleep(POLL_INTERVAL)
+                added = claim(cache, key)
+            if added is None:
+                return view(request, *args, **kwargs)
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                cache.delete(key)
+                raise
+            entry = stored(response)
+            if entry is None:
+                cache.delete(key)
+            else:
+                entry["fingerprint"] = digest
+                cache.set(key, entry, settings.IDEMPOTENCY_TIMEOUT)
+            return response
+    return wrapper
@@ -0,0 +1,116 @@
+# Python imports
+import logging
+import os
+import random
+import resource
+import signal
+import threading
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+# Django imports
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from statsd.defaults.django import statsd
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_previous_snapshot = None
+
+
+def current_rss():
+    """
+    Return the resident set size of this process in bytes.
+    Reads /proc on Linux and falls back to the peak RSS reported by getrusage elsewhere.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMiddleware:
+    """
+    Exports per-request RSS deltas (and the tracemalloc peak, when tracing is on) for a sampled
+    fraction of requests as statsd timers, which statsd aggregates as histograms:
+
+    - ``memory.rss_delta_kb.<endpoint>``
+    - ``memory.peak_alloc_kb.<endpoint>``
+
+    The tracemalloc peak is process wide, so concurrent requests in threaded workers can inflate it.
+    """
+
+    def __init__(self, get_response):
+        # On-demand snapshots work whether or not requests are sampled
+        install_snapshot_handler()
+        self.sample_rate = getattr(settings, "MEMORY_SAMPLE_RATE", 0.0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+        rss_before = current_rss()
+        response = self.get_response(request)
+        rss_delta = current_rss() - rss_before
+
+        match = getattr(request, "resolver_match", None)
+        endpoint = match.view_name.replace(":", ".") if match and match.view_name else "unresolved"
+        statsd.timing("memory.rss_delta_kb.{}".format(endpoint), rss_delta // 1024)
+        if tracing:
+            statsd.timing("memory.peak_alloc_kb.{}".format(endpoint), tracemalloc.get_traced_memory()[1] // 1024)
+        return response
+
+
+def take_snapshot(signum=None, frame=None):
+    """
+    Signal handler that drives tracemalloc in a running worker.
+
+    The first signal starts tracing; every following one takes a snapshot, dumps it to
+    ``MEMORY_SNAPSHOT_DIR`` and logs the allocation sites that grew the most since the previous one.
+    Send it with ``kill -<MEMORY_SNAPSHOT_SIGNAL> <worker pid>``.
+    """
+    global _previous_snapshot
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(getattr(settings, "MEMORY_TRACEMALLOC_FRAMES", 10))
+        logger.info("tracemalloc started in process {}".format(os.getpid()))
+        return
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    directory = Path(getattr(settings, "MEMORY_SNAPSHOT_DIR", "memory-snapshots"))
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        name = "{}-{}-{}.tracemalloc".format(os.getpid(), time.strftime("%Y%m%dT%H%M%S"), uuid.uuid4().hex[:8])
+        snapshot.dump(str(directory / name))
+    except OSError as e:
+        logger.error("Couldn't dump tracemalloc snapshot : {}".format(str(e)))
+
+    if _previous_snapshot is not None:
+        top = getattr(settings, "MEMORY_SNAPSHOT_TOP", 25)
+        for stat in snapshot.compare_to(_previous_snapshot, "lineno")[:top]:
+            logger.info("tracemalloc diff: {}".format(stat))
+    _previous_snapshot = snapshot
+
+
+def install_snapshot_handler():
+    """
+    Install ``take_snapshot`` for ``MEMORY_SNAPSHOT_SIGNAL``.
+    Signal handlers can only be set from the main thread, so this is a no-op anywhere else.
+    """
+    signum = getattr(settings, "MEMORY_SNAPSHOT_SIGNAL", None)
+    if not signum or threading.current_thread() is not threading.main_thread():
+        return
+    signal.signal(signum, take_snapshot)
@@ -0,0 +1,114 @@
+# Python imports
+import asyncio
+from typing import Callable, List
+
+# Django imports
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.base import BaseHandler
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+class MiddlewareChain:
+    """
+    A middleware stack wrapped around ``get_response``, loaded the way
+    ``BaseHandler.load_middleware`` loads ``settings.MIDDLEWARE``.
+    """
+
+    def __init__(self, middleware_paths, get_response, is_async):
+        adapter = BaseHandler()
+        self.view_middleware: List[Callable] = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        handler = get_response
+        handler_is_async = is_async
+        for middleware_path in reversed(middleware_paths):
+            middleware = import_string(middleware_path)
+            middleware_can_sync = getattr(middleware, "sync_capable", True)
+            middleware_can_async = getattr(middleware, "async_capable", False)
+            if not handler_is_async and middleware_can_sync:
+                middleware_is_async = False
+            else:
+                middleware_is_async = middleware_can_async
+            try:
+                adapted_handler = adapter.adapt_method_mode(middleware_is_async, handler, handler_is_async)
+                mw_instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+            if mw_instance is None:
+                raise ImproperlyConfigured("Middleware factory %s returned None." % middleware_path)
+
+            # RoutedMiddleware runs these hooks from its own synchronous hook methods
+            if hasattr(mw_instance, "process_view"):
+                self.view_middleware.insert(0, adapter.adapt_method_mode(False, mw_instance.process_view))
+            if hasattr(mw_instance, "process_template_response"):
+                self.template_response_middleware.append(
+                    adapter.adapt_method_mode(False, mw_instance.process_template_response))
+            if hasattr(mw_instance, "process_exception"):
+                self.exception_middleware.append(adapter.adapt_method_mode(False, mw_instance.process_exception))
+
+            handler = convert_exception_to_response(mw_instance)
+            handler_is_async = middleware_is_async
+
+        self.handler = adapter.adapt_method_mode(is_async, handler, handler_is_async)
+
+
+class RoutedMiddleware:
+    """
+    Runs a different middleware stack below it depending on the request path.
+
+    ``ROUTED_MIDDLEWARE`` is a list of ``(path_prefixes, middleware_paths)``; the first route whose
+    prefix matches ``request.path_info`` wins, and every other path gets ``ROUTED_MIDDLEWARE_DEFAULT``.
+    That lets the Basic-auth JSON API skip sessions, CSRF and messages while the account and swagger
+    pages keep them. ``process_view``/``process_exception``/``process_template_response`` of the
+    selected stack run exactly where Django would have run them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+        self.routes = [
+            (tuple(prefixes), MiddlewareChain(middleware_paths, get_response, self.is_async))
+            for prefixes, middleware_paths in getattr(settings, "ROUTED_MIDDLEWARE", [])
+        ]
+        self.default = MiddlewareChain(getattr(settings, "ROUTED_MIDDLEWARE_DEFAULT", []), get_response,
+                                       self.is_async)
+
+    def chain_for(self, request):
+        for prefixes, chain in self.routes:
+            if request.path_info.startswith(prefixes):
+                return chain
+        return self.default
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request.middleware_chain = chain = self.chain_for(request)
+        return chain.handler(request)
+
+    async def __acall__(self, request):
+        request.middleware_chain = chain = self.chain_for(request)
+        return await chain.handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for middleware_method in request.middleware_chain.view_middleware:
+            response = middleware_method(request, view_func, view_args, view_kwargs)
+            if response:
+                return response
+
+    def process_template_response(self, request, response):
+        for middleware_method in request.middleware_chain.template_response_middleware:
+            response = middleware_method(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for middleware_method in request.middleware_chain.exception_middleware:
+            response = middleware_method(request, exception)
+            if response:
+                return response
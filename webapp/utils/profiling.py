@@ -0,0 +1,133 @@
+# Python imports
+import collections
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Counter
+
+# Django imports
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from statsd.defaults.django import statsd
+
+logger = logging.getLogger(__name__)
+
+SIGNING_SALT = "webapp.profiling"
+
+
+def make_profile_token():
+    """
+    Create a signed value for the profiling header.
+    Run it from ``manage.py shell`` and send it as ``X-Profile: <token>`` to force a profile.
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign("profile")
+
+
+class StackSampler:
+    """
+    Samples the stack of a single thread at a fixed interval from a background thread.
+    Stacks are kept in collapsed form (``outer;inner count``) ready for flamegraph.pl/speedscope.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append("{}:{}".format(os.path.basename(code.co_filename), code.co_name))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def collapsed(self):
+        return "".join("{} {}\n".format(stack, count) for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """
+    Runs a sampled fraction of requests, or requests carrying a signed ``X-Profile`` header,
+    under a stack sampler and writes one collapsed-stack file per request into
+    ``PROFILING_DIR/<endpoint>/``. Only the newest ``PROFILING_MAX_FILES`` files are kept per endpoint.
+
+    Unsampled requests only pay for a header lookup and, if a sample rate is set, one ``random()`` call.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        self.interval = getattr(settings, "PROFILING_INTERVAL", 0.005)
+        self.directory = Path(getattr(settings, "PROFILING_DIR", "profiles"))
+        self.max_files = getattr(settings, "PROFILING_MAX_FILES", 20)
+        self.signer = signing.TimestampSigner(salt=SIGNING_SALT)
+        self.token_max_age = getattr(settings, "PROFILING_TOKEN_MAX_AGE", 300)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            return self.get_response(request)
+        finally:
+            sampler.stop()
+            try:
+                self.save(request, sampler, time.perf_counter() - started)
+            except OSError as e:
+                logger.error("Couldn't write profile : {}".format(str(e)))
+
+    def should_profile(self, request):
+        token = request.META.get("HTTP_X_PROFILE")
+        if token is not None:
+            try:
+                self.signer.unsign(token, max_age=self.token_max_age)
+                return True
+            except signing.BadSignature:
+                # Anyone can send the header, so this must not reach the error logs
+                statsd.incr("profiling.bad_token")
+                logger.debug("Invalid profiling token")
+                return False
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, request, sampler, elapsed):
+        match = getattr(request, "resolver_match", None)
+        endpoint = match.view_name.replace(":", ".") if match and match.view_name else "unresolved"
+        directory = self.directory / endpoint
+        directory.mkdir(parents=True, exist_ok=True)
+
+        path = directory / "{}-{}-{}-{}ms.folded".format(time.strftime("%Y%m%dT%H%M%S"), os.getpid(),
+                                                         uuid.uuid4().hex[:8], int(elapsed * 1000))
+        path.write_text(sampler.collapsed())
+        logger.info("Profile written to {}".format(path))
+
+        profiles = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+        for old in profiles[:-self.max_files]:
+            old.unlink(missing_ok=True)
@@ -0,0 +1,124 @@
+# Python imports
+import asyncio
+import threading
+import time
+
+# Django imports
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from statsd.defaults.django import statsd
+
+# Rest framework imports
+from rest_framework import status
+
+# Project imports
+from webapp.users.utils import json_response
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def queue_time(header, now):
+    """
+    Seconds since the proxy accepted the request, from an ``X-Request-Start`` value like
+    ``t=1700000000.123`` (nginx ``$msec``), or the same in milli or microseconds.
+    ``None`` when the header is missing or unreadable.
+    """
+    try:
+        started = float(header.strip().removeprefix("t="))
+    except (AttributeError, ValueError):
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    # Clocks of the proxy and the app server are never perfectly in step
+    return max(now - started, 0.0)
+
+
+class InFlight:
+    """
+    Requests this process is currently serving.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        with self._lock:
+            self.count += 1
+            return self.count
+
+    def leave(self):
+        with self._lock:
+            self.count -= 1
+
+
+class LoadSheddingMiddleware:
+    """
+    Turns requests away with a cheap 503 before any work is done when they already waited too long
+    in the proxy and server queues, or when this process is serving too many requests at once.
+
+    Reads are shed once they queued for ``SHED_MAX_QUEUE_TIME`` seconds or ``SHED_MAX_IN_FLIGHT``
+    requests are in progress; writes get the higher ``SHED_MAX_WRITE_QUEUE_TIME`` and
+    ``SHED_MAX_WRITE_IN_FLIGHT`` limits, so under overload reads give way to them. Paths in
+    ``SHED_EXEMPT_PATHS`` (the health check) are never shed, so the load balancer keeps an overloaded
+    but working instance.
+
+    statsd gets ``shed.queue_time`` and ``shed.in_flight`` for every 503, ``admitted`` for every
+    other request and the queue time of every request as the ``request.queue_time`` timer.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SHED_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.in_flight = InFlight()
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, like MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # type: ignore[attr-defined]
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if request.path_info in settings.SHED_EXEMPT_PATHS:
+            return self.get_response(request)
+        try:
+            shed = self.admit(request, self.in_flight.enter())
+            return shed or self.get_response(request)
+        finally:
+            self.in_flight.leave()
+
+    async def __acall__(self, request):
+        if request.path_info in settings.SHED_EXEMPT_PATHS:
+            return await self.get_response(request)
+        try:
+            shed = self.admit(request, self.in_flight.enter())
+            return shed or await self.get_response(request)
+        finally:
+            self.in_flight.leave()
+
+    def admit(self, request, in_flight):
+        """
+        ``None`` to serve the request, or the 503 to send instead.
+        """
+        write = request.method not in SAFE_METHODS
+        waited = queue_time(request.META.get(settings.SHED_REQUEST_START_HEADER), time.time())
+        if waited is not None:
+            statsd.timing("request.queue_time", waited * 1000)
+            if waited > (settings.SHED_MAX_WRITE_QUEUE_TIME if write else settings.SHED_MAX_QUEUE_TIME):
+                return self.shed("queue_time")
+        if in_flight > (settings.SHED_MAX_WRITE_IN_FLIGHT if write else settings.SHED_MAX_IN_FLIGHT):
+            return self.shed("in_flight")
+        statsd.incr("admitted")
+        return None
+
+    @staticmethod
+    def shed(reason):
+        # Counted in statsd rather than logged, an overloaded server has no time for log lines
+        statsd.incr("shed.{}".format(reason))
+        return json_response(False, "Server is overloaded, please retry", status.HTTP_503_SERVICE_UNAVAILABLE,
+                             headers={"Retry-After": settings.SHED_RETRY_AFTER}, log_level=None)
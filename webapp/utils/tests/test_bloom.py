@@ -0,0 +1,21 @@
+# Django imports
+from django.test import SimpleTestCase
+
+# Project imports
+from webapp.utils.bloom import BloomFilter
+
+
+class BloomFilterTestCase(SimpleTestCase):
+    def test_added_items_are_always_found(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add("sku-{}".format(i))
+        self.assertTrue(all("sku-{}".format(i) in bloom for i in range(1000)))
+        self.assertEqual(bloom.count, 1000)
+
+    def test_false_positive_rate_stays_near_target(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add("sku-{}".format(i))
+        false_positives = sum("other-{}".format(i) in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
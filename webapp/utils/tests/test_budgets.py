@@ -0,0 +1,131 @@
+# Python imports
+import base64
+import io
+import os
+from typing import Any, Dict
+from unittest import mock
+
+# Django imports
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import get_resolver, reverse
+from PIL import Image
+
+# Project imports
+from product import aws, resilience
+from product.models import Product, ProductImage
+from webapp.users.models import User
+from webapp.utils.budgets import check_budget, measure
+
+# Most SQL queries, S3/SNS calls and password hashes one request may cost, per URL name and method.
+# Measured with nothing cached (the test settings use DummyCache), so they are worst cases. Lower a
+# budget when a view gets cheaper; raising one needs a reason in the commit.
+BUDGETS = {
+    "user:register": {"POST": {"queries": 6, "external": 0, "hashes": 1}},
+    "user:login": {"POST": {"queries": 2, "external": 0, "hashes": 1}},
+    "user:details": {
+        "GET": {"queries": 2, "external": 0, "hashes": 1},
+        "PUT": {"queries": 6, "external": 0, "hashes": 1},
+    },
+    "product:product_create": {"POST": {"queries": 7, "external": 0, "hashes": 1}},
+    "product:product_export": {"GET": {"queries": 3, "external": 0, "hashes": 1}},
+    "product:product_get": {
+        "GET": {"queries": 2, "external": 0, "hashes": 1},
+        "PATCH": {"queries": 7, "external": 0, "hashes": 1},
+        "PUT": {"queries": 7, "external": 0, "hashes": 1},
+        "DELETE": {"queries": 9, "external": 0, "hashes": 1},
+    },
+    "product:image_create": {
+        "GET": {"queries": 3, "external": 0, "hashes": 1},
+        "POST": {"queries": 9, "external": 2, "hashes": 1},
+    },
+    "product:image_get": {
+        "GET": {"queries": 6, "external": 0, "hashes": 1},
+        "DELETE": {"queries": 9, "external": 2, "hashes": 1},
+    },
+}
+BUDGETED_NAMESPACES = ("user", "product")
+
+
+def png_file():
+    stream = io.BytesIO()
+    Image.new("RGB", (2, 2)).save(stream, "PNG")
+    return SimpleUploadedFile("image.png", stream.getvalue(), content_type="image/png")
+
+
+@override_settings(AWS_CLIENT_FACTORY="product.standins.client")
+class EndpointBudgetTestCase(TestCase):
+    def setUp(self):
+        aws.reset_clients()
+        self.addCleanup(aws.reset_clients)
+        resilience.reset()
+        self.addCleanup(resilience.reset)
+        environment = mock.patch.dict(os.environ, {"S3_BUCKET": "test", "SNS_TOPIC_ARN": "test"})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+        self.owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                              first_name="owner", last_name="user")
+        self.product, self.deleted_product = [
+            Product.objects.create(owner_user=self.owner, name="name", description="description", sku=sku,
+                                   manufacturer="manufacturer", quantity=1) for sku in ("sku-1", "sku-2")]
+        self.image, self.deleted_image = [
+            ProductImage.objects.create(product=self.product, file_name="image.png",
+                                        s3_bucket_path="{}/{}/image.png".format(self.product.id, index))
+            for index in range(2)]
+        token = base64.b64encode(b"owner@example.com:testpassword").decode()
+        self.auth: Dict[str, Any] = {"HTTP_AUTHORIZATION": "Basic {}".format(token)}
+
+    def requests(self):
+        """
+        ``(url name, method, path, client kwargs)`` for every budgeted endpoint, deletes last.
+        """
+        json = {"content_type": "application/json"}
+        product = {"id": self.product.id}
+        return [
+            ("user:register", "POST", reverse("user:register"), dict(json, data={
+                "first_name": "new", "last_name": "user", "username": "new@example.com",
+                "password": "newpassword"})),
+            ("user:login", "POST", reverse("user:login"), dict(json, data={
+                "username": "owner@example.com", "password": "testpassword"})),
+            ("user:details", "GET", reverse("user:details", kwargs={"userId": self.owner.id}), self.auth),
+            ("user:details", "PUT", reverse("user:details", kwargs={"userId": self.owner.id}), dict(
+                json, data={"first_name": "renamed"}, **self.auth)),
+            ("product:product_create", "POST", reverse("product:product_create"), dict(json, data={
+                "name": "name", "description": "description", "sku": "sku-3", "manufacturer": "manufacturer",
+                "quantity": 1}, **self.auth)),
+            ("product:product_export", "GET", reverse("product:product_export"), self.auth),
+            ("product:product_get", "GET", reverse("product:product_get", kwargs=product), self.auth),
+            ("product:product_get", "PATCH", reverse("product:product_get", kwargs=product), dict(
+                json, data={"quantity": 2}, **self.auth)),
+            ("product:product_get", "PUT", reverse("product:product_get", kwargs=product), dict(json, data={
+                "name": "name", "description": "description", "sku": "sku-1", "manufacturer": "manufacturer",
+                "quantity": 3}, **self.auth)),
+            ("product:image_create", "GET", reverse("product:image_create", kwargs=product), self.auth),
+            ("product:image_create", "POST", reverse("product:image_create", kwargs=product), dict(
+                data={"image": png_file()}, **self.auth)),
+            ("product:image_get", "GET", reverse("product:image_get", kwargs={
+                "id": self.product.id, "image_id": self.image.image_id}), self.auth),
+            ("product:image_get", "DELETE", reverse("product:image_get", kwargs={
+                "id": self.product.id, "image_id": self.deleted_image.image_id}), self.auth),
+            ("product:product_get", "DELETE", reverse("product:product_get", kwargs={
+                "id": self.deleted_product.id}), self.auth),
+        ]
+
+    def test_every_endpoint_has_a_budget(self):
+        names = {"{}:{}".format(namespace, name)
+                 for namespace in BUDGETED_NAMESPACES
+                 for name in get_resolver().namespace_dict[namespace][1].reverse_dict if isinstance(name, str)}
+        self.assertEqual(names - set(BUDGETS), set())
+        self.assertEqual({(name, method) for name, methods in BUDGETS.items() for method in methods},
+                         {(name, method) for name, method, _, _ in self.requests()})
+
+    def test_endpoints_stay_within_budget(self):
+        for name, method, path, kwargs in self.requests():
+            with self.subTest(name=name, method=method):
+                with measure() as usage, self.captureOnCommitCallbacks(execute=True):
+                    response = getattr(self.client, method.lower())(path, **kwargs)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                self.assertLess(response.status_code, 300, response.content if not response.streaming else "")
+                check_budget("{} {}".format(method, name), usage, BUDGETS[name][method])
@@ -0,0 +1,71 @@
+# Python imports
+import base64
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+# Django imports
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+# Project imports
+from webapp.users.models import User
+from webapp.utils.capture import client_id, shape
+
+
+class ShapeTestCase(SimpleTestCase):
+    def test_values_are_dropped(self):
+        self.assertEqual(shape({"name": "abc", "quantity": 3, "tags": ["x", "y"], "none": None, "ok": True,
+                                "password": "secret"}, redacted={"password"}),
+                         {"name": "str:3", "quantity": "int", "tags": ["str:1"], "none": "null", "ok": "bool",
+                          "password": "redacted"})
+
+
+class CaptureMiddlewareTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings = override_settings(CAPTURE_ENABLED=True, CAPTURE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.owner = User.objects.create_user(username="owner@example.com", password="testpassword",
+                                              first_name="owner", last_name="user")
+        token = base64.b64encode(b"owner@example.com:testpassword").decode()
+        self.auth: Dict[str, Any] = {"HTTP_AUTHORIZATION": "Basic {}".format(token)}
+
+    def records(self):
+        return [json.loads(line) for path in sorted(self.directory.glob("*.ndjson*")) for line in path.open()]
+
+    def test_login_is_captured_without_credentials(self):
+        response = self.client.post(reverse("user:login"), {"username": "owner@example.com",
+                                                            "password": "testpassword"},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        [record] = self.records()
+        self.assertEqual((record["method"], record["view"], record["status"]), ("POST", "user:login", 200))
+        self.assertEqual(record["body"], {"username": "str:17", "password": "redacted"})
+        self.assertEqual(record["client"], client_id("owner@example.com"))
+        self.assertNotIn("testpassword", json.dumps(record))
+        self.assertNotIn("owner@example.com", json.dumps(record))
+
+    def test_uploads_are_captured_as_type_and_size(self):
+        self.client.post(reverse("product:product_create"), {
+            "name": "name", "image": SimpleUploadedFile("image.png", b"x" * 100, content_type="image/png"),
+        }, **self.auth)
+        self.client.get(reverse("user:details", kwargs={"userId": self.owner.id}), **self.auth)
+        create, details = self.records()
+        self.assertEqual(create["body"], {"name": "str:4", "image": {"file": "image/png", "size": 100}})
+        self.assertEqual(details["params"], {"userId": self.owner.id})
+        self.assertEqual(create["client"], details["client"])
+
+    def test_only_api_views_are_captured_and_files_rotate(self):
+        self.client.get("/healthz")
+        self.assertEqual(self.records(), [])
+        with override_settings(CAPTURE_MAX_BYTES=200, CAPTURE_BACKUP_COUNT=5):
+            for _ in range(4):
+                self.client.get(reverse("user:details", kwargs={"userId": self.owner.id}), **self.auth)
+        self.assertGreater(len(list(self.directory.glob("*.ndjson.*"))), 0)
+        self.assertEqual(len(self.records()), 4)
@@ -0,0 +1,39 @@
+# Python imports
+import tempfile
+import tracemalloc
+from pathlib import Path
+from unittest import mock
+
+# Django imports
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+# Project imports
+from webapp.utils import memory
+
+
+class MemoryMiddlewareTestCase(TestCase):
+    def test_sampled_request_exports_rss_delta(self):
+        with override_settings(MEMORY_SAMPLE_RATE=1.0, MEMORY_SNAPSHOT_SIGNAL=None), \
+                mock.patch.object(memory.statsd, "timing") as timing:
+            response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("memory.rss_delta_kb.health", [call.args[0] for call in timing.call_args_list])
+
+    def test_snapshot_handler_is_installed_without_sampling(self):
+        with override_settings(MEMORY_SAMPLE_RATE=0.0, MEMORY_SNAPSHOT_SIGNAL=42), \
+                mock.patch.object(memory.signal, "signal") as install:
+            with self.assertRaises(MiddlewareNotUsed):
+                memory.MemoryMiddleware(lambda request: None)
+        install.assert_called_once_with(42, memory.take_snapshot)
+
+    def test_snapshot_handler_starts_tracing_then_dumps(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(tracemalloc.stop)
+        with override_settings(MEMORY_SNAPSHOT_DIR=directory):
+            memory.take_snapshot()
+            self.assertTrue(tracemalloc.is_tracing())
+            memory.take_snapshot()
+            memory.take_snapshot()
+        self.assertEqual(len(list(Path(directory).glob("*.tracemalloc"))), 2)
@@ -0,0 +1,31 @@
+# Django imports
+from django.test import TestCase, Client
+from django.test.client import AsyncClient
+from django.urls import reverse
+
+
+class RoutedMiddlewareTestCase(TestCase):
+    def test_api_skips_full_stack(self):
+        response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Frame-Options", response.headers)
+        # LocaleMiddleware would have added Accept-Language
+        self.assertNotIn("Accept-Language", response.headers.get("Vary", ""))
+
+    def test_pages_keep_full_stack(self):
+        response = Client().get(reverse('schema-redoc'))
+        self.assertEqual(response.headers["X-Frame-Options"], "DENY")
+
+    def test_view_hooks_of_full_stack_run(self):
+        # CsrfViewMiddleware.process_view rejects the form post
+        response = Client(enforce_csrf_checks=True).post("/accounts/login/", {"login": "a", "password": "b"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_api_has_no_csrf_check(self):
+        response = Client(enforce_csrf_checks=True).post(reverse('users:login'), {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_handler(self):
+        response = await AsyncClient().get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("X-Frame-Options", response.headers)
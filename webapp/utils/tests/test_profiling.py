@@ -0,0 +1,42 @@
+# Python imports
+import tempfile
+from pathlib import Path
+
+# Django imports
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+# Project imports
+from webapp.utils.profiling import make_profile_token
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def profiles(self):
+        return list(Path(self.directory).rglob("*.folded"))
+
+    def test_unsampled_request_writes_nothing(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0.0, PROFILING_DIR=self.directory):
+            response = Client().get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profiles(), [])
+
+    def test_signed_header_writes_capped_profiles(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory, PROFILING_MAX_FILES=2,
+                               PROFILING_INTERVAL=0.0001):
+            client = Client()
+            for _ in range(3):
+                response = client.get(reverse('health'), HTTP_X_PROFILE=make_profile_token())
+                self.assertEqual(response.status_code, 200)
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0].parent.name, "health")
+
+    def test_bad_token_is_ignored(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory), \
+                self.assertNoLogs("webapp.utils.profiling", "ERROR"):
+            response = Client().get(reverse('health'), HTTP_X_PROFILE="forged")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profiles(), [])
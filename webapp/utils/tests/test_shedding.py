@@ -0,0 +1,57 @@
+# Python imports
+import time
+from typing import Dict
+
+# Django imports
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+# Project imports
+from webapp.utils.shedding import LoadSheddingMiddleware, queue_time
+
+
+class QueueTimeTestCase(SimpleTestCase):
+    def test_units_are_detected(self):
+        self.assertAlmostEqual(queue_time("t=1700000000.5", 1700000001.0), 0.5)
+        self.assertAlmostEqual(queue_time("1700000000500", 1700000001.0), 0.5)
+        self.assertAlmostEqual(queue_time("t=1700000000500000", 1700000001.0), 0.5)
+
+    def test_bad_or_future_values(self):
+        self.assertIsNone(queue_time(None, 1.0))
+        self.assertIsNone(queue_time("soon", 1.0))
+        self.assertEqual(queue_time("t=1700000002", 1700000001.0), 0.0)
+
+
+@override_settings(SHED_MAX_QUEUE_TIME=1, SHED_MAX_WRITE_QUEUE_TIME=5, SHED_MAX_IN_FLIGHT=1,
+                   SHED_MAX_WRITE_IN_FLIGHT=2)
+class LoadSheddingMiddlewareTestCase(TestCase):
+    def started(self, seconds_ago):
+        return {"HTTP_X_REQUEST_START": "t={:.3f}".format(time.time() - seconds_ago)}
+
+    def test_requests_that_queued_too_long_are_shed(self):
+        url = reverse("user:details", kwargs={"userId": 1})
+        response = self.client.get(url, **self.started(2))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(self.client.get(url, **self.started(0)).status_code, 401)
+        # Writes wait longer before they are given up
+        self.assertEqual(self.client.put(url, **self.started(2)).status_code, 401)
+
+    def test_health_check_is_never_shed(self):
+        self.assertEqual(self.client.get(reverse("health"), **self.started(60)).status_code, 200)
+
+    def test_reads_give_way_to_writes_when_busy(self):
+        inner_statuses: Dict[str, int] = {}
+
+        def view(request):
+            if request.path == "/outer":
+                # Arrive while the outer request is still in progress
+                for method in ("GET", "POST"):
+                    inner_statuses[method] = shedding(RequestFactory().generic(method, "/inner")).status_code
+            return HttpResponse()
+
+        shedding = LoadSheddingMiddleware(view)
+        self.assertEqual(shedding(RequestFactory().get("/outer")).status_code, 200)
+        self.assertEqual(inner_statuses, {"GET": 503, "POST": 200})
+        self.assertEqual(shedding.in_flight.count, 0)